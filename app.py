@@ -4,8 +4,23 @@ from meal_ai import (
     init_db,
     add_default_korean_menus,
     make_plan,
+    plan_menus,
     export_plan,
+    analyze_menu_plan,
+    ingest_menu_board,
     get_all_menus,
+    get_menus_version,
+    search_menus,
+    set_error_sink,
+    get_metrics,
+    submit_job,
+    list_jobs,
+    start_job_workers,
+    JOB_POLL_INTERVAL,
+    save_plan,
+    PLAN_DEFAULT_SITE,
+    find_duplicate_menus,
+    merge_menus,
     add_menu,
     delete_menu,
     update_menu_nutrition,
@@ -17,32 +32,99 @@ from meal_ai import (
     manage_menu_diversity,
     generate_monthly_report,
     auto_update_menu_db,
+    prune_menus,
+    restore_menus,
+    get_archived_menus,
+    MENU_PRUNE_UNUSED_DAYS,
+    EXCEL_MIME,
 )
+from datetime import datetime
+import json
 import os
-import google.generativeai as genai
+import time
 
 # 페이지 설정
 st.set_page_config(
     page_title="식단 계획 및 영양 분석 시스템", page_icon="🍱", layout="wide"
 )
 
-# 데이터베이스 초기화
+# 데이터베이스 초기화 및 오류 메시지를 화면에 표시
 init_db()
+set_error_sink(st.error)
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_menus(version):
+    """
+    메뉴 목록 캐시 (세션 간 공유, DB 버전이 바뀌면 다시 조회)
+    """
+    return get_all_menus()
+
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def load_duplicate_menus(version):
+    """
+    중복 메뉴 후보 캐시 (DB 버전이 바뀌면 다시 계산)
+    """
+    return find_duplicate_menus()
+
 
 # 사이드바 - API 키 확인
 st.sidebar.title("API 키 확인")
 api_key = st.sidebar.text_input("Google API 키", type="password")
 if api_key:
-    os.environ["GOOGLE_API_KEY"] = api_key
-    genai.configure(api_key=api_key)
+    os.environ["GOOGLE_API_KEY"] = api_key  # Gemini 모델은 처음 사용할 때 이 키로 생성
     st.sidebar.success("API 키가 설정되었습니다.")
 else:
     st.sidebar.warning("Google API 키를 입력해주세요.")
 
-# 기본 한식 메뉴 추가 버튼
+# 식단 이력에 기록할 사업장
+site = st.sidebar.text_input("사업장", value=PLAN_DEFAULT_SITE) or PLAN_DEFAULT_SITE
+
+# 백그라운드 작업 실행 스레드 시작 (서버 프로세스당 한 번)
+start_job_workers()
+
+# 기본 한식 메뉴 추가 / 자동 업데이트 버튼 (백그라운드 작업으로 등록)
 if st.sidebar.button("기본 한식 메뉴 추가"):
-    added_count = add_default_korean_menus()
-    st.sidebar.success(f"{added_count}개의 새로운 한식 메뉴가 추가되었습니다.")
+    job_id = submit_job("default_menus")
+    st.sidebar.info(
+        f"작업 #{job_id}이(가) 등록되었습니다. 진행 상황은 아래에서 확인하세요."
+    )
+if st.sidebar.button("메뉴 DB 자동 업데이트"):
+    job_id = submit_job("auto_update")
+    st.sidebar.info(
+        f"작업 #{job_id}이(가) 등록되었습니다. 진행 상황은 아래에서 확인하세요."
+    )
+
+# 사용하지 않는 메뉴 정리: 대상을 먼저 보여 주고 확인한 메뉴만 보관 후 삭제
+with st.sidebar.expander("사용하지 않는 메뉴 정리"):
+    if st.button("정리 대상 찾기"):
+        st.session_state.prune_candidates = prune_menus(dry_run=True)
+    candidates = st.session_state.get("prune_candidates")
+    if candidates is not None and not candidates:
+        st.info("정리할 메뉴가 없습니다.")
+    elif candidates:
+        st.write(
+            f"{MENU_PRUNE_UNUSED_DAYS}일 넘게 제공하지 않은 메뉴 {len(candidates)}개"
+        )
+        st.dataframe(pd.DataFrame({"메뉴": candidates}), hide_index=True)
+        confirmed = st.checkbox(
+            "위 메뉴를 보관 목록으로 옮기고 메뉴 DB에서 삭제하는 것을 확인했습니다."
+        )
+        if st.button("보관 후 삭제", disabled=not confirmed):
+            job_id = submit_job("prune_menus", params={"names": candidates})
+            del st.session_state.prune_candidates
+            st.info(
+                f"작업 #{job_id}이(가) 등록되었습니다. 진행 상황은 아래에서 확인하세요."
+            )
+
+    # 보관한 메뉴 되돌리기
+    archived = get_archived_menus()
+    if not archived.empty:
+        restore_names = st.multiselect("되돌릴 보관 메뉴", archived["name"].tolist())
+        if st.button("선택한 메뉴 되돌리기", disabled=not restore_names):
+            restored = restore_menus(restore_names)
+            st.success(f"{len(restored)}개 메뉴를 메뉴 DB로 되돌렸습니다.")
 
 # 메인 탭
 tab1, tab2, tab3 = st.tabs(["홈 / 식단 계획", "메뉴 DB", "메뉴판 분석"])
@@ -60,24 +142,40 @@ with tab1:
     with col2:
         meal_type = st.radio("식사 유형", ["점심", "점심저녁"], horizontal=True)
 
+    # 생성한 식단은 미리보기로만 보관하고, 저장 버튼을 눌렀을 때만 식단 이력에 기록
     if st.button("식단표 생성"):
-        plan_df = make_plan(meal_type=meal_type, days=days)
+        plan_df, plan_score = plan_menus(meal_type=meal_type, days=days)
+        st.session_state.generated_plan = (plan_df, plan_score)
+        # Excel 파일은 한 번만 만들어 두고 다시 실행될 때 재사용 (메모리에서 바로 전달)
+        st.session_state.generated_plan_xlsx = export_plan(
+            plan_df, "식단_계획", to_disk=False
+        )
+        st.session_state.generated_plan_id = None
+
+    if "generated_plan" in st.session_state:
+        plan_df, plan_score = st.session_state.generated_plan
         st.dataframe(plan_df)
-
-        # Excel 파일로 내보내기
-        filepath = export_plan(plan_df, "식단_계획")
-        with open(filepath, "rb") as f:
-            st.download_button(
-                label="Excel 파일 다운로드",
-                data=f,
-                file_name=filepath.split("/")[-1],
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            )
+        st.caption(f"영양 목표 편차 점수: {plan_score:.3f} (낮을수록 균형적)")
+
+        st.download_button(
+            label="Excel 파일 다운로드",
+            data=st.session_state.generated_plan_xlsx,
+            file_name=f"식단_계획_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+            mime=EXCEL_MIME,
+        )
+
+        plan_id = st.session_state.get("generated_plan_id")
+        if plan_id is not None:
+            st.success(f"'{site}' 식단 이력에 저장되었습니다. (계획 #{plan_id})")
+        elif st.button("식단 이력에 저장", key="save_generated_plan"):
+            plan_id = save_plan(plan_df, site)
+            st.session_state.generated_plan_id = plan_id
+            st.success(f"'{site}' 식단 이력에 저장되었습니다. (계획 #{plan_id})")
 
 # 메뉴 DB 탭
 with tab2:
     st.header("메뉴 데이터베이스 관리")
-    db_tabs = st.tabs(["메뉴 추가", "메뉴 목록"])
+    db_tabs = st.tabs(["메뉴 추가", "메뉴 목록", "중복 메뉴"])
 
     with db_tabs[0]:
         st.subheader("새 메뉴 추가")
@@ -100,9 +198,14 @@ with tab2:
             try:
                 df = pd.read_excel(uploaded_file)
                 if "name" in df.columns:
-                    menu_names = df["name"].tolist()
-                    bulk_add(menu_names)
-                    st.success(f"{len(menu_names)}개의 메뉴가 추가되었습니다.")
+                    menu_names = df["name"].dropna().astype(str).tolist()
+                    st.write(f"메뉴 {len(menu_names)}개")
+                    if st.button("일괄 추가 작업 등록"):
+                        job_id = submit_job("bulk_add", items=menu_names)
+                        st.info(
+                            f"작업 #{job_id}이(가) 등록되었습니다. "
+                            "진행 상황은 사이드바에서 확인하세요."
+                        )
                 else:
                     st.error("엑셀 파일에 'name' 열이 필요합니다.")
             except Exception as e:
@@ -114,14 +217,17 @@ with tab2:
         # 메뉴 검색
         search_query = st.text_input("메뉴 검색")
 
-        # 모든 메뉴 가져오기
-        all_menus = get_all_menus()
-
-        # 검색어가 있는 경우 필터링
         if search_query:
-            all_menus = all_menus[
-                all_menus["name"].str.contains(search_query, case=False)
-            ]
+            # 검색 인덱스로 순위가 매겨진 결과를 페이지 단위로 가져오기
+            page_size = 50
+            page = st.number_input("페이지", min_value=1, value=1, step=1)
+            all_menus, total = search_menus(
+                search_query, limit=page_size, offset=(page - 1) * page_size
+            )
+            st.caption(f"검색 결과 {total}개")
+        else:
+            # 모든 메뉴 가져오기 (DB 버전이 같으면 캐시 사용)
+            all_menus = load_menus(get_menus_version())
 
         # 메뉴 목록 표시
         if not all_menus.empty:
@@ -131,6 +237,7 @@ with tab2:
             selected_menu = st.selectbox(
                 "수정/삭제할 메뉴 선택", all_menus["name"].tolist()
             )
+            selected_row = all_menus[all_menus["name"] == selected_menu].iloc[0]
 
             col1, col2 = st.columns(2)
             with col1:
@@ -144,35 +251,12 @@ with tab2:
                 st.subheader("영양 정보 수정")
                 nutrition = {
                     "calories": st.number_input(
-                        "칼로리",
-                        value=all_menus[all_menus["name"] == selected_menu][
-                            "calories"
-                        ].iloc[0],
-                    ),
-                    "protein": st.number_input(
-                        "단백질",
-                        value=all_menus[all_menus["name"] == selected_menu][
-                            "protein"
-                        ].iloc[0],
-                    ),
-                    "fat": st.number_input(
-                        "지방",
-                        value=all_menus[all_menus["name"] == selected_menu]["fat"].iloc[
-                            0
-                        ],
-                    ),
-                    "carbs": st.number_input(
-                        "탄수화물",
-                        value=all_menus[all_menus["name"] == selected_menu][
-                            "carbs"
-                        ].iloc[0],
-                    ),
-                    "sodium": st.number_input(
-                        "나트륨",
-                        value=all_menus[all_menus["name"] == selected_menu][
-                            "sodium"
-                        ].iloc[0],
+                        "칼로리", value=selected_row["calories"]
                     ),
+                    "protein": st.number_input("단백질", value=selected_row["protein"]),
+                    "fat": st.number_input("지방", value=selected_row["fat"]),
+                    "carbs": st.number_input("탄수화물", value=selected_row["carbs"]),
+                    "sodium": st.number_input("나트륨", value=selected_row["sodium"]),
                 }
 
                 if st.button("영양 정보 업데이트"):
@@ -186,9 +270,7 @@ with tab2:
                     "새 카테고리",
                     ["국/수프", "메인", "사이드", "밥"],
                     index=["국/수프", "메인", "사이드", "밥"].index(
-                        all_menus[all_menus["name"] == selected_menu]["category"].iloc[
-                            0
-                        ]
+                        selected_row["category"]
                     ),
                 )
 
@@ -199,6 +281,50 @@ with tab2:
         else:
             st.info("등록된 메뉴가 없습니다.")
 
+    with db_tabs[2]:
+        st.subheader("이름이 비슷한 중복 메뉴")
+        # 메뉴 수에 따라 오래 걸리므로 버튼을 눌렀을 때만 계산
+        if st.button("중복 메뉴 찾기"):
+            st.session_state.show_duplicates = True
+        if not st.session_state.get("show_duplicates"):
+            st.caption("버튼을 누르면 이름이 거의 같은 메뉴를 찾습니다.")
+        else:
+            with st.spinner("중복 메뉴를 찾는 중..."):
+                duplicates = load_duplicate_menus(get_menus_version())
+            if duplicates.empty:
+                st.info("중복으로 보이는 메뉴가 없습니다.")
+            else:
+                # 합칠 쌍은 사용자가 직접 고름 (기본값은 아무것도 합치지 않음)
+                edited = st.data_editor(
+                    duplicates.assign(merge=False),
+                    column_config={
+                        "name": "중복 메뉴 (삭제)",
+                        "keep": "남길 메뉴",
+                        "similarity": st.column_config.NumberColumn(
+                            "유사도", format="%.2f"
+                        ),
+                        "merge": st.column_config.CheckboxColumn("합치기"),
+                    },
+                    disabled=["name", "keep", "similarity"],
+                    hide_index=True,
+                    key="duplicate_menus_editor",
+                )
+                selected = edited[edited["merge"]]
+                confirmed = st.checkbox(
+                    f"선택한 {len(selected)}개 메뉴를 메뉴 DB에서 삭제하고 "
+                    "남길 메뉴로 합치는 것을 확인했습니다."
+                )
+                if st.button(
+                    "선택한 메뉴 합치기", disabled=selected.empty or not confirmed
+                ):
+                    merged = sum(
+                        merge_menus(keep, group["name"])
+                        for keep, group in selected.groupby("keep")
+                    )
+                    st.session_state.show_duplicates = False
+                    st.success(f"{merged}개의 중복 메뉴를 합쳤습니다.")
+                    st.rerun()
+
 # 메뉴판 분석 탭
 with tab3:
     st.header("메뉴판 분석")
@@ -215,137 +341,150 @@ with tab3:
 
     if uploaded_file:
         try:
-            # 엑셀 파일 파싱
-            excel_file = pd.ExcelFile(uploaded_file)
-            sheet_names = excel_file.sheet_names
-
-            if not any(sheet in sheet_names for sheet in ["점심", "저녁"]):
-                st.error("'점심' 또는 '저녁' 시트가 필요합니다.")
+            # 메뉴판 파싱 (가로형/세로형 자동 감지, 점심/저녁 병합)
+            merged_df, diagnostics = ingest_menu_board(uploaded_file)
+
+            for sheet_name, layout in diagnostics["layouts"].items():
+                if layout == "가로형":
+                    st.info(
+                        f"{sheet_name} 시트가 가로형이어서 세로형으로 변환했습니다."
+                    )
+            for warning in diagnostics["warnings"]:
+                st.warning(warning)
+            if diagnostics["missing_columns"]:
+                st.warning(f"누락된 컬럼: {diagnostics['missing_columns']}")
+
+            if not merged_df.empty:
+                st.write("병합된 데이터:")
+                st.dataframe(merged_df)
+                if st.button("식단 이력에 저장"):
+                    plan_id = save_plan(merged_df, site, source="menu_board")
+                    st.success(f"'{site}' 식단 이력에 저장되었습니다. (계획 #{plan_id})")
+                if st.button("영양 정보 분석"):
+                    progress_bar = st.progress(0.0, text="메뉴 분류 중...")
+                    nutrition_df = analyze_menu_plan(
+                        merged_df,
+                        progress_callback=lambda done, total: progress_bar.progress(
+                            done / total if total else 1.0,
+                            text=f"메뉴 분류 중... ({done}/{total})",
+                        ),
+                    )
+                    progress_bar.empty()
+                    st.success("영양 정보 분석이 완료되었습니다.")
+                    st.dataframe(nutrition_df)
+                    st.download_button(
+                        label="Excel 파일 다운로드",
+                        data=export_plan(merged_df, "식단_계획", to_disk=False),
+                        file_name=f"식단_계획_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                        mime=EXCEL_MIME,
+                    )
             else:
-                # 데이터 병합을 위한 준비
-                final_columns = [
-                    "요일",
-                    "잡곡밥",
-                    "국/수프",
-                    "메인",
-                    "사이드1",
-                    "사이드2",
-                    "저녁_잡곡밥",
-                    "저녁_국/수프",
-                    "저녁_메인",
-                    "저녁_사이드1",
-                    "저녁_사이드2",
-                ]
-
-                valid_days = ["월", "화", "수", "목", "금", "토", "일"]
-                merged_df = pd.DataFrame(columns=final_columns)
-
-                # 각 시트 처리
-                for sheet_name in ["점심", "저녁"]:
-                    if sheet_name in sheet_names:
-                        try:
-                            df = pd.read_excel(uploaded_file, sheet_name=sheet_name)
-                            st.write(f"{sheet_name} 시트 데이터 미리보기:")
-                            st.dataframe(df.head())
-                            st.write(f"{sheet_name} 시트 컬럼명:", df.columns.tolist())
-
-                            # 만약 '요일' 컬럼이 없고, '월'~'일'이 컬럼명에 있다면 전치
-                            if "요일" not in df.columns and set(
-                                ["월", "화", "수", "목", "금", "토", "일"]
-                            ).issubset(set(df.columns)):
-                                df = df.set_index(df.columns[0]).T.reset_index()
-                                df = df.rename(columns={"index": "요일"})
-                                st.info(
-                                    f"{sheet_name} 시트가 가로형이어서 세로형으로 변환했습니다."
-                                )
-                                st.dataframe(df.head())
-
-                            # 컬럼명 정리
-                            if sheet_name == "저녁":
-                                df = df.rename(
-                                    columns={
-                                        "잡곡밥": "저녁_잡곡밥",
-                                        "국/수프": "저녁_국/수프",
-                                        "메인": "저녁_메인",
-                                        "사이드1": "저녁_사이드1",
-                                        "사이드2": "저녁_사이드2",
-                                    }
-                                )
-
-                            # 요일 필터링
-                            if "요일" not in df.columns:
-                                st.error(f"{sheet_name} 시트에 '요일' 컬럼이 없습니다.")
-                                continue
-
-                            df = df[df["요일"].isin(valid_days)]
-
-                            if df.empty:
-                                st.warning(
-                                    f"{sheet_name} 시트에 유효한 요일 데이터가 없습니다."
-                                )
-                                continue
-
-                            # 데이터 병합
-                            for _, row in df.iterrows():
-                                try:
-                                    day = row["요일"]
-                                    if day not in merged_df["요일"].values:
-                                        merged_df = pd.concat(
-                                            [merged_df, pd.DataFrame([row])],
-                                            ignore_index=True,
-                                        )
-                                    else:
-                                        idx = merged_df[merged_df["요일"] == day].index[
-                                            0
-                                        ]
-                                        for col in df.columns:
-                                            if pd.isna(merged_df.at[idx, col]):
-                                                merged_df.at[idx, col] = row[col]
-                                except Exception as e:
-                                    st.error(f"행 처리 중 오류 발생: {str(e)}")
-                                    st.write("문제가 된 행:", row)
-                                    continue
-                        except Exception as e:
-                            st.error(f"{sheet_name} 시트 처리 중 오류 발생: {str(e)}")
-                            continue
-
-                # NaN 값 처리 및 컬럼 정렬
-                merged_df = merged_df.fillna("")
-
-                # 최종 컬럼 확인
-                st.write("최종 데이터프레임 컬럼:", merged_df.columns.tolist())
-
-                # 누락된 컬럼 확인
-                missing_columns = [
-                    col for col in final_columns if col not in merged_df.columns
-                ]
-                if missing_columns:
-                    st.warning(f"누락된 컬럼: {missing_columns}")
-                    for col in missing_columns:
-                        merged_df[col] = ""
-
-                merged_df = merged_df[final_columns]
-
-                if not merged_df.empty:
-                    st.write("병합된 데이터:")
-                    st.dataframe(merged_df)
-                    if st.button("영양 정보 분석"):
-                        nutrition_df = analyze_menu_plan(merged_df)
-                        st.success("영양 정보 분석이 완료되었습니다.")
-                        st.dataframe(nutrition_df)
-                        filepath = export_plan(merged_df, "식단_계획")
-                        with open(filepath, "rb") as f:
-                            st.download_button(
-                                label="Excel 파일 다운로드",
-                                data=f,
-                                file_name=os.path.basename(filepath),
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                            )
-                else:
-                    st.error("유효한 데이터가 없습니다.")
+                st.error("유효한 데이터가 없습니다.")
 
         except Exception as e:
             st.error(f"파일 처리 중 오류 발생: {str(e)}")
             import traceback
 
             st.error(f"상세 오류: {traceback.format_exc()}")
+
+# 사이드바 - 백그라운드 작업 현황 (새로고침해도 DB에서 다시 조회)
+JOB_KIND_LABELS = {
+    "bulk_add": "메뉴 일괄 추가",
+    "default_menus": "기본 한식 메뉴 추가",
+    "auto_update": "메뉴 DB 자동 업데이트",
+    "prune_menus": "사용하지 않는 메뉴 정리",
+}
+JOB_STATUS_LABELS = {
+    "queued": "대기 중",
+    "running": "실행 중",
+    "done": "완료",
+    "failed": "실패",
+}
+recent_jobs = list_jobs(limit=5)
+if recent_jobs:
+    st.sidebar.subheader("작업 현황")
+    for job in recent_jobs:
+        processed = job["done"] + job["failed"]
+        st.sidebar.progress(
+            processed / job["total"] if job["total"] else 1.0,
+            text=f"#{job['id']} {JOB_KIND_LABELS.get(job['kind'], job['kind'])} - "
+            f"{JOB_STATUS_LABELS.get(job['status'], job['status'])} "
+            f"({processed}/{job['total']})",
+        )
+        if job["status"] == "done" and job["result"]:
+            result = job["result"]
+            if "inserted" in result:
+                st.sidebar.caption(
+                    f"추가 {result['inserted']}개, 갱신 {result.get('updated', 0)}개, "
+                    f"건너뜀 {result.get('skipped', 0)}개"
+                )
+            elif "pruned" in result:
+                st.sidebar.caption(f"보관 후 삭제 {result['pruned']}개")
+            elif "prune_candidates" in result:
+                st.sidebar.caption(
+                    f"오래 제공하지 않은 메뉴 {result['prune_candidates']}개 "
+                    "('사용하지 않는 메뉴 정리'로 삭제)"
+                )
+        elif job["status"] == "failed":
+            st.sidebar.caption(
+                f"오류: {job['error']} (같은 작업을 다시 등록하면 이어서 실행)"
+            )
+
+# 사이드바 - 성능 지표 (디버그, 이번 실행까지 누적된 값)
+with st.sidebar.expander("성능 지표 (디버그)"):
+    metrics = get_metrics()
+    snapshot = metrics.snapshot()
+
+    def format_labels(labels):
+        return ", ".join(f"{key}={value}" for key, value in labels.items())
+
+    if snapshot["counters"]:
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "지표": counter["name"],
+                        "레이블": format_labels(counter["labels"]),
+                        "값": counter["value"],
+                    }
+                    for counter in snapshot["counters"]
+                ]
+            ),
+            hide_index=True,
+        )
+    if snapshot["histograms"]:
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "지표": histogram["name"],
+                        "레이블": format_labels(histogram["labels"]),
+                        "횟수": histogram["count"],
+                        "합계": round(histogram["sum"], 3),
+                        "평균": round(histogram["sum"] / histogram["count"], 3),
+                    }
+                    for histogram in snapshot["histograms"]
+                ]
+            ),
+            hide_index=True,
+        )
+    st.download_button(
+        "Prometheus 형식 다운로드",
+        data=metrics.to_prometheus(),
+        file_name="meal_metrics.prom",
+        mime="text/plain",
+    )
+    st.download_button(
+        "JSON 다운로드",
+        data=json.dumps(snapshot, ensure_ascii=False, indent=2),
+        file_name="meal_metrics.json",
+        mime="application/json",
+    )
+    if st.button("지표 초기화"):
+        metrics.reset()
+        st.rerun()
+
+# 실행 중인 작업이 있으면 잠시 후 화면을 다시 그려 진행 상황 갱신
+if any(job["status"] in ("queued", "running") for job in recent_jobs):
+    time.sleep(JOB_POLL_INTERVAL)
+    st.rerun()
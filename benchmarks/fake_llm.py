@@ -0,0 +1,268 @@
+"""
+벤치마크/부하 테스트용 가짜 Gemini 모델
+
+FakeModel은 네트워크 없이 같은 입력에 항상 같은 응답을 돌려주는 결정적 모델이고,
+StandInModel은 여기에 지연 시간 분포, 오류, 429(할당량 초과), 잘못된 응답을
+확률적으로 섞습니다. 응답 형식은 meal_ai의 프롬프트 종류에 맞춥니다.
+
+- 여러 메뉴 분류 ("1. \"메뉴\"" 목록): id/name을 포함한 JSON 배열
+- 단일 메뉴 분류 ("메뉴: 이름"): JSON 객체
+- 그 밖의 메뉴 추천 프롬프트: ```json 블록으로 감싼 메뉴 배열
+
+stream=True로 호출하면 응답을 chunk_chars 글자씩 나눈 조각으로 돌려줍니다.
+
+설치 방법:
+
+    meal_ai.set_model(FakeModel(latency=0.05))
+    MEAL_MODEL_BACKEND=benchmarks.fake_llm:standin_from_env streamlit run app.py
+"""
+
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import zlib
+
+CATEGORY_KEYWORDS = [
+    ("국/수프", ["국", "탕", "찌개", "수프", "전골"]),
+    ("밥", ["밥", "죽", "덮밥"]),
+    ("메인", ["볶음", "구이", "조림", "찜", "불고기", "갈비", "까스", "스테이크"]),
+]
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+def fake_menu_info(name: str) -> dict:
+    """
+    메뉴 이름으로부터 결정적인 카테고리와 영양 정보 생성
+    """
+    seed = zlib.crc32(name.encode("utf-8"))
+    category = "사이드"
+    for candidate, keywords in CATEGORY_KEYWORDS:
+        if any(keyword in name for keyword in keywords):
+            category = candidate
+            break
+    return {
+        "name": name,
+        "category": category,
+        "calories": 50 + seed % 700,
+        "protein": (seed >> 3) % 45,
+        "fat": (seed >> 7) % 35,
+        "carbs": (seed >> 11) % 90,
+        "sodium": (seed >> 13) % 1800,
+    }
+
+
+def stream_chunks(text: str, chunk_chars: int):
+    """
+    응답 텍스트를 chunk_chars 글자씩 나눈 스트리밍 응답 조각
+    """
+    for i in range(0, len(text), chunk_chars):
+        yield FakeResponse(text[i : i + chunk_chars])
+
+
+class FakeModel:
+    """
+    generate_content(prompt, stream=False) 인터페이스를 흉내 내는 가짜 모델
+
+    Args:
+        latency (float): 호출마다 기다릴 시간 (초)
+        chunk_chars (int): stream=True일 때 응답 조각 크기 (글자 수)
+    """
+
+    def __init__(self, latency: float = 0.0, chunk_chars: int = 64):
+        self.latency = latency
+        self.chunk_chars = chunk_chars
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        response = self._generate(prompt)
+        return stream_chunks(response.text, self.chunk_chars) if stream else response
+
+    def _generate(self, prompt: str) -> FakeResponse:
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        batch = re.findall(r"^\s*(\d+)\. (\".*\")\s*$", prompt, re.MULTILINE)
+        if batch:
+            return FakeResponse(
+                json.dumps(
+                    [
+                        {"id": int(i), **fake_menu_info(json.loads(name))}
+                        for i, name in batch
+                    ],
+                    ensure_ascii=False,
+                )
+            )
+
+        single = re.search(r"^\s*메뉴: (.+?)\s*$", prompt, re.MULTILINE)
+        if single:
+            return FakeResponse(
+                json.dumps(fake_menu_info(single.group(1)), ensure_ascii=False)
+            )
+
+        seed = zlib.crc32(prompt.encode("utf-8"))
+        menus = [fake_menu_info(f"추천 메뉴 {seed % 1000}-{i}") for i in range(5)]
+        return FakeResponse(
+            "```json\n" + json.dumps(menus, ensure_ascii=False, indent=2) + "\n```"
+        )
+
+
+class ResourceExhausted(Exception):
+    """
+    Gemini 할당량 초과 오류 흉내 (meal_ai가 429로 인식)
+    """
+
+
+class ServiceUnavailable(Exception):
+    """
+    Gemini 일시적 서버 오류 흉내
+    """
+
+
+def parse_latency(spec: str):
+    """
+    지연 시간 분포 설정을 해석하여 샘플링 함수 반환
+
+    형식: "0.05" (고정), "uniform:최소,최대", "lognormal:중앙값,sigma",
+    "exp:평균" (초 단위)
+    """
+    kind, _, params = str(spec).partition(":")
+    if not params:
+        value = float(kind)
+        return lambda rng: value
+    values = [float(value) for value in params.split(",")]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    if kind == "exp":
+        return lambda rng: rng.expovariate(1 / values[0])
+    raise ValueError(f"알 수 없는 지연 시간 분포입니다: {spec}")
+
+
+class StandInModel(FakeModel):
+    """
+    지연 시간 분포와 장애를 주입할 수 있는 Gemini 대역 모델
+
+    Args:
+        latency (str): 지연 시간 분포 (parse_latency 형식)
+        error_rate (float): 일반 오류(503) 확률
+        quota_error_rate (float): 할당량 초과(429) 확률
+        malformed_rate (float): 잘못된 응답(잘린 JSON, 설명문, 필드 누락 등) 확률
+        fenced_rate (float): 정상 응답을 ```json 블록으로 감쌀 확률
+        seed (Optional[int]): 난수 시드
+    """
+
+    MALFORMED_KINDS = ["truncated", "prose", "missing_field", "wrong_type"]
+
+    def __init__(
+        self,
+        latency: str = "0",
+        error_rate: float = 0.0,
+        quota_error_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        fenced_rate: float = 0.5,
+        seed=None,
+    ):
+        super().__init__(latency=0.0)
+        self._sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.quota_error_rate = quota_error_rate
+        self.malformed_rate = malformed_rate
+        self.fenced_rate = fenced_rate
+        self._rng = random.Random(seed)
+        self.stats = {"ok": 0, "errors": 0, "quota_errors": 0, "malformed": 0}
+        self.latencies = []
+
+    def _record(self, outcome: str, latency: float):
+        with self._lock:
+            self.stats[outcome] += 1
+            self.latencies.append(latency)
+
+    def _generate(self, prompt: str) -> FakeResponse:
+        with self._lock:
+            roll = self._rng.random()
+            latency = max(0.0, self._sample_latency(self._rng))
+            kind = self._rng.choice(self.MALFORMED_KINDS)
+            fenced = self._rng.random() < self.fenced_rate
+        time.sleep(latency)
+
+        if roll < self.quota_error_rate:
+            self._record("quota_errors", latency)
+            raise ResourceExhausted("429 Resource has been exhausted (check quota).")
+        roll -= self.quota_error_rate
+        if roll < self.error_rate:
+            self._record("errors", latency)
+            raise ServiceUnavailable("503 The service is currently unavailable.")
+        roll -= self.error_rate
+
+        text = super()._generate(prompt).text
+        if roll < self.malformed_rate:
+            self._record("malformed", latency)
+            return FakeResponse(self._malform(text, kind))
+
+        self._record("ok", latency)
+        if fenced and not text.startswith("```"):
+            text = "```json\n" + text + "\n```"
+        return FakeResponse(text)
+
+    def _malform(self, text: str, kind: str) -> str:
+        if kind == "truncated":
+            return text[: max(1, len(text) // 2)]
+        if kind == "prose":
+            return "죄송합니다. 요청하신 메뉴 정보를 지금은 제공할 수 없습니다."
+        payload = json.loads(re.sub(r"^```json\n|\n```$", "", text))
+        items = payload if isinstance(payload, list) else [payload]
+        for item in items:
+            if kind == "missing_field":
+                item.pop("sodium", None)
+            else:
+                item["calories"] = "많음"
+        return json.dumps(payload, ensure_ascii=False)
+
+    def summary(self) -> dict:
+        """
+        호출 결과 집계와 지연 시간 백분위수 (초)
+        """
+        with self._lock:
+            latencies = sorted(self.latencies)
+            stats = dict(self.stats)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))]
+
+        return {
+            "calls": len(latencies),
+            **stats,
+            "latency_p50": percentile(50),
+            "latency_p95": percentile(95),
+            "latency_p99": percentile(99),
+        }
+
+
+def standin_from_env() -> StandInModel:
+    """
+    MEAL_STANDIN_* 환경 변수로 StandInModel 생성 (MEAL_MODEL_BACKEND 팩토리)
+    """
+    seed = os.getenv("MEAL_STANDIN_SEED")
+    return StandInModel(
+        latency=os.getenv("MEAL_STANDIN_LATENCY", "lognormal:0.3,0.5"),
+        error_rate=float(os.getenv("MEAL_STANDIN_ERROR_RATE", "0")),
+        quota_error_rate=float(os.getenv("MEAL_STANDIN_QUOTA_ERROR_RATE", "0")),
+        malformed_rate=float(os.getenv("MEAL_STANDIN_MALFORMED_RATE", "0")),
+        fenced_rate=float(os.getenv("MEAL_STANDIN_FENCED_RATE", "0.5")),
+        seed=int(seed) if seed else None,
+    )
@@ -0,0 +1,70 @@
+"""
+meal_ai import 시간 예산 검사 (python -X importtime 사용)
+
+    python benchmarks/import_time.py [--budget-ms 150]
+
+meal_ai의 누적 import 시간이 예산을 넘거나, 처음 사용할 때 로드해야 하는
+무거운 모듈(streamlit, google.generativeai, pandas, numpy, xlsxwriter)이
+import 시점에 로드되면 종료 코드 1을 반환합니다.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+IMPORT_TIME_BUDGET_MS = float(os.getenv("MEAL_IMPORT_TIME_BUDGET_MS", "150"))
+LAZY_MODULES = ["streamlit", "google.generativeai", "pandas", "numpy", "xlsxwriter"]
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import_time(runs: int = 3) -> dict:
+    """
+    새 인터프리터에서 meal_ai를 import하여 누적 import 시간과 로드된 모듈 측정
+
+    Args:
+        runs (int): 측정 횟수 (가장 짧은 시간 사용)
+
+    Returns:
+        dict: cumulative_ms, loaded_lazy_modules
+    """
+    timings = []
+    loaded = set()
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import meal_ai"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:"):
+                continue
+            _, cumulative, module = line[len("import time:") :].split("|")
+            name = module.strip()
+            if name == "meal_ai":
+                timings.append(int(cumulative) / 1000)
+            elif name in LAZY_MODULES:
+                loaded.add(name)
+    return {"cumulative_ms": min(timings), "loaded_lazy_modules": sorted(loaded)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="meal_ai import 시간 예산 검사")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_TIME_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    result = measure_import_time(args.runs)
+    result["budget_ms"] = args.budget_ms
+    result["ok"] = (
+        result["cumulative_ms"] <= args.budget_ms and not result["loaded_lazy_modules"]
+    )
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0 if result["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
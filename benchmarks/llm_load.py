@@ -0,0 +1,94 @@
+"""
+메뉴 분류 파이프라인 부하 테스트 (오프라인, StandInModel 사용)
+
+    python benchmarks/llm_load.py --menus 2000 --latency lognormal:0.3,0.5 \\
+        --quota-error-rate 0.05 --malformed-rate 0.02 --rpm 6000
+
+빈 임시 DB에서 합성 메뉴 이름을 classify_menus로 분류하여 처리량(메뉴/초),
+모델 호출 지연 시간 백분위수, 오류/429/잘못된 응답 수, 분류 성공률을
+JSON으로 출력합니다. 성공률은 모델 응답으로 분류된 메뉴의 비율이며,
+끝내 응답을 받지 못해 기본값으로 대신한 메뉴(meal_classify_fallbacks_total)는
+실패로 셉니다.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="메뉴 분류 부하 테스트")
+    parser.add_argument("--menus", type=int, default=1000, help="분류할 메뉴 수")
+    parser.add_argument("--batch-size", type=int, help="배치 크기")
+    parser.add_argument("--workers", type=int, help="동시 요청 수")
+    parser.add_argument("--latency", default="lognormal:0.3,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--quota-error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, default=6000, help="분당 요청 한도")
+    parser.add_argument("--backoff-base", type=float, default=0.1, help="백오프 (초)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="결과 JSON 파일 (기본값 표준 출력)")
+    args = parser.parse_args()
+
+    # 호출 한도는 meal_ai import 시점에 읽으므로 먼저 설정
+    os.environ["GEMINI_REQUESTS_PER_MINUTE"] = str(args.rpm)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import meal_ai
+    from fake_llm import StandInModel
+
+    meal_ai.GEMINI_BACKOFF_BASE = args.backoff_base
+
+    model = StandInModel(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        quota_error_rate=args.quota_error_rate,
+        malformed_rate=args.malformed_rate,
+        seed=args.seed,
+    )
+    meal_ai.set_model(model)
+
+    names = [f"부하 테스트 메뉴 {i}" for i in range(args.menus)]
+    with tempfile.TemporaryDirectory(prefix="meal_llm_load_") as workdir:
+        meal_ai.set_db_path(os.path.join(workdir, "meal.db"))
+        meal_ai.init_db()
+        meal_ai.get_metrics().reset()
+        started = time.perf_counter()
+        try:
+            results = meal_ai.classify_menus(
+                names, batch_size=args.batch_size, max_workers=args.workers
+            )
+        finally:
+            meal_ai.close_db_connection()
+        elapsed = time.perf_counter() - started
+    fallbacks = sum(
+        counter["value"]
+        for counter in meal_ai.get_metrics().snapshot()["counters"]
+        if counter["name"] == "meal_classify_fallbacks_total"
+    )
+    classified = len(results) - fallbacks
+
+    report = {
+        "menus": args.menus,
+        "classified": classified,
+        "fallbacks": fallbacks,
+        "success_rate": round(classified / args.menus, 4) if args.menus else 1.0,
+        "elapsed_s": round(elapsed, 3),
+        "menus_per_s": round(len(results) / elapsed, 1) if elapsed else 0.0,
+        "model": model.summary(),
+        "args": vars(args),
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
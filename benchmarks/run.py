@@ -0,0 +1,303 @@
+"""
+meal_ai 벤치마크 (합성 메뉴 카탈로그 + 가짜 LLM)
+
+    python benchmarks/run.py --sizes 100 10000 100000 --output bench.json
+    python benchmarks/run.py --compare bench.json   # 이전 결과와 비교
+
+카탈로그 크기마다 임시 meal.db를 만들고 make_plan, analyze_menu_plan,
+export_plan, optimize_nutrition_balance, manage_menu_diversity,
+generate_monthly_report, ingest_menu_board(메뉴판 분석 탭)의 실행 시간
+(최소/중앙값), 최대 메모리(tracemalloc), DB 쿼리 수(meal_ai 성능 지표)를
+JSON으로 저장합니다.
+--compare로 이전 결과를 주면 허용 범위를 넘게 느려진 항목이 있을 때 종료 코드 1을
+반환합니다.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import meal_ai  # noqa: E402
+from fake_llm import FakeModel  # noqa: E402
+
+# 합성 메뉴 이름 재료 (카테고리별 접미어)
+NAME_PREFIXES = ["매콤", "순한", "들깨", "버섯", "해물", "두부", "돼지", "소고기", "닭"]
+NAME_INGREDIENTS = [
+    "김치",
+    "된장",
+    "미역",
+    "감자",
+    "애호박",
+    "콩나물",
+    "어묵",
+    "시금치",
+]
+CATEGORY_SUFFIXES = {
+    "국/수프": ["국", "찌개", "탕", "수프"],
+    "메인": ["볶음", "구이", "조림", "찜"],
+    "사이드": ["무침", "나물", "전", "샐러드"],
+    "밥": ["덮밥", "볶음밥", "비빔밥"],
+}
+CATEGORY_WEIGHTS = {"국/수프": 0.3, "메인": 0.3, "사이드": 0.35, "밥": 0.05}
+NOISE_FLOOR_MS = 1.0  # 이보다 작은 차이는 회귀로 보지 않음
+
+
+def build_catalog(size: int, seed: int = 0) -> list:
+    """
+    합성 메뉴 목록 생성 (add_menus 입력 형식)
+    """
+    rng = random.Random(seed)
+    categories = list(CATEGORY_WEIGHTS)
+    weights = list(CATEGORY_WEIGHTS.values())
+    menus = [
+        {
+            "name": meal_ai.PLAN_RICE,
+            "category": "밥",
+            "calories": 300,
+            "protein": 6,
+            "fat": 1,
+            "carbs": 65,
+            "sodium": 5,
+        }
+    ]
+    for i in range(size - 1):
+        category = rng.choices(categories, weights)[0]
+        name = (
+            f"{rng.choice(NAME_PREFIXES)} {rng.choice(NAME_INGREDIENTS)}"
+            f"{rng.choice(CATEGORY_SUFFIXES[category])} {i}"
+        )
+        menus.append(
+            {
+                "name": name,
+                "category": category,
+                "calories": rng.randint(50, 800),
+                "protein": rng.randint(0, 45),
+                "fat": rng.randint(0, 35),
+                "carbs": rng.randint(0, 90),
+                "sodium": rng.randint(0, 1800),
+            }
+        )
+    return menus
+
+
+def db_query_count() -> int:
+    """
+    지금까지 실행된 SQL 문 수 (meal_ai 성능 지표)
+    """
+    snapshot = meal_ai.get_metrics().snapshot()
+    return int(
+        sum(
+            counter["value"]
+            for counter in snapshot["counters"]
+            if counter["name"] == "meal_db_queries_total"
+        )
+    )
+
+
+def measure(func, repeat: int, warmup: int) -> dict:
+    """
+    func(i)를 반복 실행하여 실행 시간, 최대 메모리, DB 쿼리 수 측정
+
+    실행 시간은 추적 없이 측정하고, 메모리는 tracemalloc을 켠 별도 실행에서 측정합니다.
+    """
+    for i in range(warmup):
+        func(-1 - i)
+
+    timings, queries = [], []
+    for i in range(repeat):
+        queries_before = db_query_count()
+        started = time.perf_counter()
+        func(i)
+        timings.append((time.perf_counter() - started) * 1000)
+        queries.append(db_query_count() - queries_before)
+
+    tracemalloc.start()
+    func(repeat)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "wall_ms_min": round(min(timings), 3),
+        "wall_ms_median": round(statistics.median(timings), 3),
+        "peak_kb": round(peak / 1024, 1),
+        "db_queries": int(statistics.median(queries)),
+    }
+
+
+def run_size(size: int, args, fake_model: FakeModel) -> list:
+    """
+    카탈로그 크기 하나에 대한 벤치마크 실행 (임시 작업 디렉터리는 끝나면 삭제)
+    """
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix=f"meal_bench_{size}_") as workdir:
+        os.chdir(workdir)
+        try:
+            return _run_size(size, args, fake_model, workdir)
+        finally:
+            meal_ai.close_db_connection()
+            os.chdir(previous_cwd)
+
+
+def _run_size(size: int, args, fake_model: FakeModel, workdir: str) -> list:
+    meal_ai.set_db_path(os.path.join(workdir, "meal.db"))
+    meal_ai.init_db()
+
+    started = time.perf_counter()
+    meal_ai.add_menus(build_catalog(size, args.seed))
+    build_ms = (time.perf_counter() - started) * 1000
+    meal_ai.get_menu_catalog()
+
+    plan_kwargs = {
+        "start_date": "2025-03-03",
+        "seed": args.seed,
+        "time_budget": args.plan_time_budget,
+    }
+    plan_df = meal_ai.make_plan("점심저녁", args.days, **plan_kwargs)
+    board = meal_ai.export_plan(plan_df, to_disk=False)
+
+    def analyze_with_llm(i):
+        # 매번 새 메뉴 이름을 넣어 가짜 LLM 분류 경로까지 실행
+        df = plan_df.copy()
+        df["사이드2"] = [f"신메뉴 {size}-{i}-{day}" for day in range(len(df))]
+        meal_ai.analyze_menu_plan(df)
+
+    cases = {
+        "make_plan": lambda i: meal_ai.make_plan("점심저녁", args.days, **plan_kwargs),
+        "analyze_menu_plan": lambda i: meal_ai.analyze_menu_plan(plan_df),
+        "analyze_menu_plan_llm": analyze_with_llm,
+        "export_plan": lambda i: meal_ai.export_plan(plan_df, to_disk=False),
+        "optimize_nutrition_balance": lambda i: meal_ai.optimize_nutrition_balance(
+            plan_df.copy()
+        ),
+        "manage_menu_diversity": lambda i: meal_ai.manage_menu_diversity(
+            plan_df.copy()
+        ),
+        "generate_monthly_report": lambda i: meal_ai.generate_monthly_report(plan_df),
+        "ingest_menu_board": lambda i: meal_ai.ingest_menu_board(io.BytesIO(board)),
+    }
+
+    results = [{"size": size, "case": "build_catalog", "wall_ms_min": build_ms}]
+    for name, func in cases.items():
+        if args.cases and name not in args.cases:
+            continue
+        calls_before = fake_model.calls
+        result = measure(func, args.repeat, args.warmup)
+        result.update(size=size, case=name, llm_calls=fake_model.calls - calls_before)
+        results.append(result)
+        print(
+            f"{size:>7} {name:<28} {result['wall_ms_median']:>10.2f} ms "
+            f"{result['peak_kb']:>10.1f} KiB {result['db_queries']:>5} q",
+            file=sys.stderr,
+        )
+    return results
+
+
+def compare(results: list, baseline_path: str, tolerance: float) -> list:
+    """
+    이전 결과와 비교하여 허용 범위를 넘게 느려진 항목 반환
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {
+            (row["size"], row["case"]): row
+            for row in json.load(f)["results"]
+            if "wall_ms_median" in row
+        }
+    regressions = []
+    for row in results:
+        old = baseline.get((row["size"], row["case"]))
+        if old is None or "wall_ms_median" not in row:
+            continue
+        new_ms, old_ms = row["wall_ms_median"], old["wall_ms_median"]
+        if new_ms > old_ms * (1 + tolerance) and new_ms - old_ms > NOISE_FLOOR_MS:
+            regressions.append(
+                {
+                    "size": row["size"],
+                    "case": row["case"],
+                    "baseline_ms": old_ms,
+                    "wall_ms": new_ms,
+                    "ratio": round(new_ms / old_ms, 2),
+                }
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="meal_ai 벤치마크")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10000, 100000])
+    parser.add_argument("--cases", nargs="+", help="실행할 항목 (기본값 전체)")
+    parser.add_argument("--days", type=int, default=20, help="식단 제공일 수")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--plan-time-budget",
+        type=float,
+        default=0.0,
+        help="make_plan 최적화 시간 (초, 0이면 초기 배정만 측정)",
+    )
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.05, help="가짜 LLM 호출 지연 (초)"
+    )
+    parser.add_argument("--output", help="결과 JSON 파일 (기본값 benchmarks/results/)")
+    parser.add_argument("--compare", help="비교할 이전 결과 JSON 파일")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="허용 속도 저하 비율"
+    )
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "results",
+        f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+    )
+    output = os.path.abspath(output)
+    baseline = os.path.abspath(args.compare) if args.compare else None
+
+    fake_model = FakeModel(latency=args.llm_latency)
+    meal_ai.set_model(fake_model)
+
+    results = []
+    for size in args.sizes:
+        results.extend(run_size(size, args, fake_model))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    exit_code = 0
+    if baseline:
+        report["regressions"] = compare(results, baseline, args.tolerance)
+        for row in report["regressions"]:
+            print(
+                f"회귀: {row['size']} {row['case']} "
+                f"{row['baseline_ms']} ms → {row['wall_ms']} ms ({row['ratio']}배)",
+                file=sys.stderr,
+            )
+        exit_code = 1 if report["regressions"] else 0
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(output)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
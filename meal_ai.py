@@ -1,1063 +1,4786 @@
+from __future__ import annotations
+
+import argparse
+import functools
+import hashlib
+import heapq
+import importlib
+import logging
+import math
 import sqlite3
-import pandas as pd
 import os
 from dotenv import load_dotenv
-import google.generativeai as genai
-import streamlit as st
 import json
-from datetime import datetime
-from typing import Dict, List, Any, Optional
+import re
+import sys
+import time
+import io
+import unicodedata
+import zlib
+from collections import deque
+from datetime import date, datetime, timedelta
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Any,
+    Iterable,
+    Iterator,
+    Optional,
+    Tuple,
+    Union,
+)
 import random
-import xlsxwriter
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+
+class _LazyModule:
+    """
+    처음 사용할 때 import하는 모듈 대리 객체 (가져온 뒤에는 전역 이름을 실제 모듈로 교체)
+    """
+
+    def __init__(self, name: str, alias: str):
+        self._name = name
+        self._alias = alias
+
+    def __getattr__(self, attr: str):
+        module = importlib.import_module(self._name)
+        globals()[self._alias] = module
+        return getattr(module, attr)
+
+
+# 무거운 의존성은 처음 사용할 때 로드 (DB만 쓰는 작업의 시작 시간 단축)
+pd = _LazyModule("pandas", "pd")
+np = _LazyModule("numpy", "np")
+xlsxwriter = _LazyModule("xlsxwriter", "xlsxwriter")
 
 # 환경 변수 로드 (.env 파일에서 GOOGLE_API_KEY 로드)
 load_dotenv()
 
-# Google Gemini API 설정
-api_key = os.getenv("GOOGLE_API_KEY")
-if api_key:
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel("gemini-2.0-flash")
-else:
-    model = None
+# LLM 모델 백엔드 ("gemini" 또는 "모듈:팩토리" 형식, 예: benchmarks.fake_llm:standin_from_env)
+# 디버그 출력(LLM 원본 응답 등)은 logging DEBUG 수준에서만 기록
+logger = logging.getLogger(__name__)
+
+MODEL_BACKEND = os.getenv("MEAL_MODEL_BACKEND", "gemini")
+
+# Google Gemini 모델 (get_model()에서 처음 사용할 때 생성)
+GEMINI_MODEL_NAME = "gemini-2.0-flash"
+_gemini_model = None
+_gemini_model_key = None
+_gemini_model_lock = threading.Lock()
+_model_override = None
+
+
+def _print_error(message: str):
+    print(message, file=sys.stderr)
+
+
+# 오류 메시지 출력 대상 (UI에서는 set_error_sink(st.error)로 교체)
+_error_sink: Callable[[str], None] = _print_error
+
+# 성능 지표 히스토그램 구간
+METRIC_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+METRIC_CHARS_BUCKETS = (100, 500, 1000, 2500, 5000, 10000, 25000, 50000)
+METRIC_HELP = {
+    "meal_llm_requests_total": "LLM 요청 수 (outcome: ok, quota_error, error)",
+    "meal_llm_request_seconds": "LLM 요청 지연 시간 (초)",
+    "meal_llm_prompt_chars": "LLM 프롬프트 길이 (글자 수)",
+    "meal_llm_response_chars": "LLM 응답 길이 (글자 수)",
+    "meal_db_connections_opened_total": "새로 연 SQLite 연결 수",
+    "meal_db_queries_total": "실행한 SQL 문 수",
+    "meal_stage_seconds": "단계별 실행 시간 (초)",
+    "meal_stage_failures_total": "단계별 실패 수",
+    "meal_classify_similar_reuse_total": "비슷한 메뉴의 정보를 재사용하여 생략한 분류 수",
+    "meal_classify_fallbacks_total": "모델 응답을 받지 못해 기본값으로 대신한 분류 수",
+}
+
+
+class Metrics:
+    """
+    스레드 안전한 카운터/히스토그램 모음 (Prometheus 텍스트 또는 JSON으로 내보내기)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, tuple], float] = {}
+        self._histograms: Dict[Tuple[str, tuple], Dict[str, Any]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """
+        카운터 증가
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(
+        self,
+        name: str,
+        value: float,
+        buckets: Tuple[float, ...] = METRIC_SECONDS_BUCKETS,
+        **labels,
+    ):
+        """
+        히스토그램에 값 기록
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {
+                    "buckets": buckets,
+                    "counts": [0] * len(buckets),
+                    "count": 0,
+                    "sum": 0.0,
+                }
+            for i, bound in enumerate(histogram["buckets"]):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+                    break
+            histogram["count"] += 1
+            histogram["sum"] += value
+
+    def reset(self):
+        """
+        모든 지표 초기화
+        """
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        현재 지표를 JSON 직렬화 가능한 딕셔너리로 반환 (히스토그램 구간은 누적 개수)
+        """
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = []
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                cumulative, total = {}, 0
+                for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                    total += count
+                    cumulative[str(bound)] = total
+                histograms.append(
+                    {
+                        "name": name,
+                        "labels": dict(labels),
+                        "count": histogram["count"],
+                        "sum": histogram["sum"],
+                        "buckets": cumulative,
+                    }
+                )
+        return {"counters": counters, "histograms": histograms}
+
+    def to_prometheus(self) -> str:
+        """
+        Prometheus 텍스트 형식으로 변환
+        """
+
+        def format_labels(labels: Dict[str, Any]) -> str:
+            if not labels:
+                return ""
+            pairs = ",".join(f'{key}="{str(value)}"' for key, value in labels.items())
+            return "{" + pairs + "}"
+
+        snapshot = self.snapshot()
+        lines, described = [], set()
+
+        def describe(name: str, metric_type: str):
+            if name not in described:
+                described.add(name)
+                if name in METRIC_HELP:
+                    lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+                lines.append(f"# TYPE {name} {metric_type}")
+
+        for counter in snapshot["counters"]:
+            describe(counter["name"], "counter")
+            lines.append(
+                f"{counter['name']}{format_labels(counter['labels'])} {counter['value']}"
+            )
+        for histogram in snapshot["histograms"]:
+            name, labels = histogram["name"], histogram["labels"]
+            describe(name, "histogram")
+            for bound, count in histogram["buckets"].items():
+                bucket_labels = format_labels({**labels, "le": bound})
+                lines.append(f"{name}_bucket{bucket_labels} {count}")
+            bucket_labels = format_labels({**labels, "le": "+Inf"})
+            lines.append(f"{name}_bucket{bucket_labels} {histogram['count']}")
+            lines.append(f"{name}_sum{format_labels(labels)} {histogram['sum']}")
+            lines.append(f"{name}_count{format_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """
+    모듈 전역 성능 지표 반환 (LLM 호출, DB 연결/쿼리, 단계별 시간)
+    """
+    return _metrics
+
+
+def export_metrics(path: str, output_format: str = "prometheus"):
+    """
+    성능 지표를 파일로 저장 (Prometheus node_exporter textfile 수집기 등)
+
+    Args:
+        path (str): 저장할 파일 경로
+        output_format (str): "prometheus" 또는 "json"
+    """
+    if output_format == "json":
+        text = json.dumps(_metrics.snapshot(), ensure_ascii=False, indent=2)
+    else:
+        text = _metrics.to_prometheus()
+    # 수집기가 쓰다 만 파일을 읽지 않도록 임시 파일에 쓴 뒤 교체
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
+def _timed_stage(stage: str):
+    """
+    함수 실행 시간을 meal_stage_seconds{stage=...}에 기록하는 데코레이터
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                _metrics.inc("meal_stage_failures_total", stage=stage)
+                raise
+            finally:
+                _metrics.observe(
+                    "meal_stage_seconds", time.perf_counter() - started, stage=stage
+                )
+
+        return wrapper
+
+    return decorator
+
+
+def _count_query(statement: str):
+    # 트리거 내부 문장("-- TRIGGER ...")은 제외
+    if not statement.startswith("--"):
+        _metrics.inc("meal_db_queries_total")
+
+
+# SQLite 설정 (MEAL_DB_PATH 환경 변수로 경로 변경 가능)
+DB_PATH = os.getenv("MEAL_DB_PATH", "meal.db")
+DB_BUSY_TIMEOUT = 30.0  # 초
+DB_CACHE_SIZE = -64000  # 음수는 KiB 단위 (약 64MB)
+DB_MMAP_SIZE = 256 * 1024 * 1024
+
+_db_local = threading.local()
+# fork로 시작한 작업 프로세스가 부모에게서 물려받은 연결 (닫으면 부모의 WAL/잠금을
+# 건드리므로 닫지 않고 프로세스가 끝날 때까지 참조만 유지)
+_inherited_db_connections: List[sqlite3.Connection] = []
+
+# 영양소 필드 (DB 컬럼 순서 = 영양소 행렬의 열 순서)
+NUTRIENT_FIELDS = ["calories", "protein", "fat", "carbs", "sodium"]
+
+# 영양소 필드 → 한국어 표시명
+NUTRIENT_LABELS = {
+    "calories": "칼로리",
+    "protein": "단백질",
+    "fat": "지방",
+    "carbs": "탄수화물",
+    "sodium": "나트륨",
+}
+
+# 메뉴 카테고리
+MENU_CATEGORIES = ["국/수프", "메인", "사이드", "밥"]
+
+# 분류 실패 시 사용하는 기본 영양소 값
+DEFAULT_NUTRITION = {
+    "calories": 300,
+    "protein": 10,
+    "fat": 5,
+    "carbs": 50,
+    "sodium": 500,
+}
+
+# 분류 캐시 설정 (프롬프트를 바꾸면 버전을 올려 이전 결과를 무효화)
+CLASSIFY_PROMPT_VERSION = "v1"
+CLASSIFY_CACHE_TTL = 90 * 24 * 60 * 60  # 초
+CLASSIFY_CACHE_MAX_ENTRIES = 20000
+
+# classify_menus 요청당 메뉴 수 / 동시 요청 수
+CLASSIFY_BATCH_SIZE = 25
+CLASSIFY_MAX_WORKERS = int(os.getenv("CLASSIFY_MAX_WORKERS", "4"))
+
+# Gemini 호출 한도 (분당 요청 수 / 분당 토큰 수, 0이면 제한 없음)
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+GEMINI_TOKENS_PER_MINUTE = int(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+
+# 할당량 초과(429) 시 재시도 설정
+GEMINI_MAX_ATTEMPTS = 5
+GEMINI_BACKOFF_BASE = 1.0  # 초
+GEMINI_BACKOFF_MAX = 60.0  # 초
+
+_classification_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_classification_cache_lock = threading.Lock()
+
+# 식단표 슬롯 컬럼 (날짜가 있는 식단은 "날짜" 컬럼 포함)
+PLAN_ID_COLUMNS = ["날짜", "요일"]
+WEEKDAY_NAMES = ["월", "화", "수", "목", "금", "토", "일"]
+LUNCH_COLUMNS = ["잡곡밥", "국/수프", "메인", "사이드1", "사이드2"]
+DINNER_COLUMNS = [f"저녁_{col}" for col in LUNCH_COLUMNS]
+
+# 식단 생성 슬롯 (컬럼, 카테고리) 및 고정 밥 메뉴
+PLAN_SLOTS = [
+    ("국/수프", "국/수프"),
+    ("메인", "메인"),
+    ("사이드1", "사이드"),
+    ("사이드2", "사이드"),
+]
+PLAN_RICE = "잡곡밥"
+PLAN_DEFAULT_SITE = "기본"  # 사업장을 지정하지 않은 식단 이력의 사업장 이름
+
+# 기본 한식 메뉴 생성 시 한 번에 DB에 기록할 메뉴 수
+DEFAULT_MENUS_INSERT_BATCH = 5
+
+# 사용하지 않는 메뉴 정리 설정 (마지막 제공일/추가일 이후 경과 일수)
+MENU_PRUNE_UNUSED_DAYS = int(os.getenv("MEAL_MENU_PRUNE_UNUSED_DAYS", "180"))
+
+# 메뉴 순환 설정 (같은 사업장에서 같은 메뉴를 다시 제공하기까지 최소 간격)
+DIVERSITY_MIN_INTERVAL_DAYS = 14
+
+# 식단 영양 균형 최적화 설정
+PLAN_TIME_BUDGET = 0.5  # 초
+PLAN_CANDIDATES = 256  # 교체 시 한 번에 평가할 후보 수
+
+# Excel 내보내기 설정
+EXPORT_DIR = os.getenv("MEAL_EXPORT_DIR", "exports")
+EXPORT_MAX_FILES = int(os.getenv("MEAL_EXPORT_MAX_FILES", "100"))  # 보관할 최대 파일 수
+EXPORT_MAX_AGE_DAYS = float(os.getenv("MEAL_EXPORT_MAX_AGE_DAYS", "30"))  # 보관 기간
+EXPORT_CONSTANT_MEMORY_DAYS = 31  # 이보다 긴 식단은 constant_memory 모드로 작성
+EXCEL_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# 백그라운드 작업 큐 설정
+JOB_WORKERS = int(os.getenv("MEAL_JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = 1.0  # 초, 대기 중인 작업 확인 간격
+JOB_STALE_SECONDS = 600  # 이 시간 동안 진행 기록이 없으면 다시 대기열에 넣음
+JOB_HEARTBEAT_INTERVAL = 30  # 초, 실행 중인 작업의 진행 시각(heartbeat) 갱신 간격
+JOB_CHUNK_SIZE = 100  # bulk_add 작업에서 한 번에 분류할 메뉴 수
+
+# 비슷한 이름의 메뉴 재사용 설정 (자모 n-gram 코사인 유사도)
+# 띄어쓰기/구두점만 다른 이름(정규화 후 동일, 유사도 1.0)이나 그에 가까운 이름만
+# 분류 없이 재사용하고, 나머지는 모두 모델로 분류
+MENU_SIMILARITY_THRESHOLD = float(os.getenv("MEAL_MENU_SIMILARITY_THRESHOLD", "0.9"))
+# 중복 메뉴 찾기/합치기는 메뉴를 삭제하므로 재사용보다 더 엄격한 기준을 사용
+MENU_MERGE_THRESHOLD = float(os.getenv("MEAL_MENU_MERGE_THRESHOLD", "0.95"))
+MENU_SIMILARITY_NGRAMS = (2, 3)
+MENU_SOUP_SUFFIXES = ("국", "탕", "찌개", "전골", "수프", "스프")
+MENU_RICE_SUFFIXES = ("밥", "죽")
+
+# 메뉴 검색 설정
+SEARCH_FUZZY_CANDIDATES = 2000  # 오타 허용 검색에서 점수를 계산할 최대 후보 수
+SEARCH_FUZZY_MIN_SIMILARITY = 0.3  # 오타 허용 검색 최소 trigram 유사도
+
+# 일일 목표 영양소 기준
+TARGET_NUTRITION = {
+    "칼로리": 2000,
+    "단백질": 60,
+    "지방": 65,
+    "탄수화물": 250,
+    "나트륨": 2000,
+}
+
+
+def init_db():
+    """
+    SQLite 데이터베이스 초기화 및 menus 테이블 생성
+    """
+    with db_transaction() as conn:
+        cursor = conn.cursor()
+
+        # menus 테이블 생성 (없는 경우에만)
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS menus (
+                name TEXT PRIMARY KEY,
+                category TEXT,
+                calories REAL,
+                protein REAL,
+                fat REAL,
+                carbs REAL,
+                sodium REAL
+            )
+        """
+        )
+
+        # menus 테이블 변경 버전 (MenuCatalog 갱신 판단용)
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS db_version (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        """
+        )
+        cursor.execute(
+            "INSERT OR IGNORE INTO db_version (name, version) VALUES ('menus', 0)"
+        )
+        for event in ["INSERT", "UPDATE", "DELETE"]:
+            cursor.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS menus_version_{event.lower()}
+                AFTER {event} ON menus
+                BEGIN
+                    UPDATE db_version SET version = version + 1 WHERE name = 'menus';
+                END
+            """
+            )
+
+        # 메뉴 이름 검색 인덱스 (FTS5 trigram, 트리거로 menus와 동기화)
+        _create_menu_search_index(cursor)
+
+        # 백그라운드 작업 큐 (작업 + 항목별 상태)
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                params TEXT NOT NULL,
+                idempotency_key TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                total INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                heartbeat_at REAL
+            )
+        """
+        )
+        cursor.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id)
+        """
+        )
+        cursor.execute(
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_key
+            ON jobs (idempotency_key) WHERE status IN ('queued', 'running')
+        """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS job_items (
+                job_id INTEGER NOT NULL,
+                item TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                error TEXT,
+                PRIMARY KEY (job_id, item)
+            )
+        """
+        )
+
+        # 식단 이력 (계획 + 제공일/식사/슬롯별 메뉴)
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS plans (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                site TEXT NOT NULL,
+                source TEXT NOT NULL,
+                meal_type TEXT NOT NULL,
+                start_date TEXT NOT NULL,
+                end_date TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """
+        )
+        cursor.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_plans_site ON plans (site, start_date)
+        """
+        )
+        # 기본 키가 (site, date) 범위 조회 인덱스를 겸함
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS plan_items (
+                plan_id INTEGER NOT NULL,
+                site TEXT NOT NULL,
+                date TEXT NOT NULL,
+                meal TEXT NOT NULL,
+                slot TEXT NOT NULL,
+                menu TEXT NOT NULL,
+                PRIMARY KEY (site, date, meal, slot)
+            )
+        """
+        )
+        cursor.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_plan_items_menu_date
+            ON plan_items (menu, date)
+        """
+        )
+        cursor.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_plan_items_plan ON plan_items (plan_id)
+        """
+        )
+
+        # 메뉴별 제공 횟수/마지막 제공일 (트리거로 plan_items와 동기화) 및 보관 메뉴
+        _create_menu_usage_counters(cursor)
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS menus_archive (
+                name TEXT PRIMARY KEY,
+                category TEXT,
+                calories REAL,
+                protein REAL,
+                fat REAL,
+                carbs REAL,
+                sodium REAL,
+                serve_count INTEGER NOT NULL,
+                last_served TEXT,
+                archived_at REAL NOT NULL
+            )
+        """
+        )
+
+        # 메뉴 분류 결과 캐시 (정규화된 메뉴 이름 + 프롬프트 버전)
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS classification_cache (
+                normalized_name TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                raw_response TEXT,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                PRIMARY KEY (normalized_name, prompt_version)
+            )
+        """
+        )
+        cursor.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_classification_cache_last_used
+            ON classification_cache (last_used_at)
+        """
+        )
+
+
+def _create_menu_search_index(cursor: sqlite3.Cursor):
+    """
+    menus_fts 검색 인덱스와 동기화 트리거 생성 (FTS5를 지원하지 않으면 생략)
+    """
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'menus_fts'"
+    ).fetchone()
+    if exists:
+        return
+    try:
+        cursor.execute(
+            """
+            CREATE VIRTUAL TABLE menus_fts USING fts5(
+                name, content='menus', content_rowid='rowid', tokenize='trigram'
+            )
+        """
+        )
+    except sqlite3.OperationalError as e:
+        print(f"메뉴 검색 인덱스를 만들 수 없어 LIKE 검색을 사용합니다: {str(e)}")
+        return
+
+    triggers = {
+        "insert": """
+            AFTER INSERT ON menus BEGIN
+                INSERT INTO menus_fts (rowid, name) VALUES (new.rowid, new.name);
+            END
+        """,
+        "delete": """
+            AFTER DELETE ON menus BEGIN
+                INSERT INTO menus_fts (menus_fts, rowid, name)
+                VALUES ('delete', old.rowid, old.name);
+            END
+        """,
+        "update": """
+            AFTER UPDATE OF name ON menus BEGIN
+                INSERT INTO menus_fts (menus_fts, rowid, name)
+                VALUES ('delete', old.rowid, old.name);
+                INSERT INTO menus_fts (rowid, name) VALUES (new.rowid, new.name);
+            END
+        """,
+    }
+    for event, body in triggers.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS menus_fts_{event} {body}")
+    # 기존 메뉴로 인덱스 채우기
+    cursor.execute("INSERT INTO menus_fts (menus_fts) VALUES ('rebuild')")
+
+
+def _create_menu_usage_counters(cursor: sqlite3.Cursor):
+    """
+    menu_usage 카운터 테이블과 동기화 트리거 생성 (처음 만들 때 기존 데이터로 채움)
+
+    last_active는 마지막 제공일과 메뉴 추가일 중 늦은 날짜이며, 정리 작업이 이 컬럼의
+    인덱스로 오래 쓰이지 않은 메뉴만 찾습니다. 메뉴를 삭제해도 식단 이력에 남아 있는
+    메뉴의 카운터는 유지하므로, 다시 추가한 뒤 옛 식단을 지우거나 다시 저장해도
+    제공 횟수가 어긋나지 않습니다.
+    """
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'menu_usage'"
+    ).fetchone()
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS menu_usage (
+            menu TEXT PRIMARY KEY,
+            serve_count INTEGER NOT NULL DEFAULT 0,
+            last_served TEXT,
+            last_active TEXT NOT NULL
+        )
+    """
+    )
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_menu_usage_last_active
+        ON menu_usage (last_active)
+    """
+    )
+
+    triggers = {
+        "menu_insert": """
+            AFTER INSERT ON menus BEGIN
+                INSERT INTO menu_usage (menu, last_active)
+                VALUES (new.name, date('now', 'localtime'))
+                ON CONFLICT(menu) DO UPDATE SET
+                    last_active = max(last_active, excluded.last_active);
+            END
+        """,
+        "menu_delete": """
+            AFTER DELETE ON menus BEGIN
+                DELETE FROM menu_usage WHERE menu = old.name AND NOT EXISTS (
+                    SELECT 1 FROM plan_items WHERE menu = old.name
+                );
+            END
+        """,
+        "plan_insert": """
+            AFTER INSERT ON plan_items BEGIN
+                INSERT INTO menu_usage (menu, serve_count, last_served, last_active)
+                VALUES (new.menu, 1, new.date, new.date)
+                ON CONFLICT(menu) DO UPDATE SET
+                    serve_count = serve_count + 1,
+                    last_served = max(coalesce(last_served, ''), excluded.last_served),
+                    last_active = max(last_active, excluded.last_active);
+            END
+        """,
+        "plan_delete": """
+            AFTER DELETE ON plan_items BEGIN
+                UPDATE menu_usage SET
+                    serve_count = serve_count - 1,
+                    last_served = (
+                        SELECT MAX(date) FROM plan_items WHERE menu = old.menu
+                    )
+                WHERE menu = old.menu;
+                DELETE FROM menu_usage
+                WHERE menu = old.menu AND serve_count <= 0 AND NOT EXISTS (
+                    SELECT 1 FROM menus WHERE name = old.menu
+                );
+            END
+        """,
+    }
+    # 정의가 바뀐 트리거만 다시 생성 (init_db가 자주 호출되므로 같으면 그대로 둠)
+    existing = dict(
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master "
+            "WHERE type = 'trigger' AND name LIKE 'menu_usage_%'"
+        )
+    )
+    for event, body in triggers.items():
+        name = f"menu_usage_{event}"
+        sql = f"CREATE TRIGGER {name} {body}".rstrip()
+        if existing.get(name) != sql:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(sql)
+
+    # 처음 만들었거나, 이전 트리거로 제공 횟수가 음수가 된 경우 식단 이력으로 다시 계산
+    if not exists or cursor.execute(
+        "SELECT 1 FROM menu_usage WHERE serve_count < 0 LIMIT 1"
+    ).fetchone():
+        _rebuild_menu_usage(cursor)
+
+
+def _rebuild_menu_usage(cursor: sqlite3.Cursor):
+    """
+    menu_usage의 제공 횟수와 마지막 제공일을 plan_items로 다시 계산
+
+    last_active는 줄이지 않으며, 처음 채우는 메뉴는 추가일을 모르므로 오늘부터
+    계산합니다.
+    """
+    cursor.execute("UPDATE menu_usage SET serve_count = 0, last_served = NULL")
+    cursor.execute(
+        """
+        INSERT INTO menu_usage (menu, serve_count, last_served, last_active)
+        SELECT menu, COUNT(*), MAX(date), max(MAX(date), date('now', 'localtime'))
+        FROM plan_items WHERE true GROUP BY menu
+        ON CONFLICT(menu) DO UPDATE SET
+            serve_count = excluded.serve_count,
+            last_served = excluded.last_served,
+            last_active = max(last_active, excluded.last_served)
+    """
+    )
+    cursor.execute(
+        """
+        INSERT OR IGNORE INTO menu_usage (menu, last_active)
+        SELECT name, date('now', 'localtime') FROM menus
+    """
+    )
+    cursor.execute(
+        """
+        DELETE FROM menu_usage
+        WHERE serve_count = 0 AND menu NOT IN (SELECT name FROM menus)
+    """
+    )
+
+
+def set_db_path(path: str):
+    """
+    사용할 데이터베이스 파일 경로 변경 (이후 연결부터 적용)
+
+    Args:
+        path (str): SQLite 데이터베이스 파일 경로
+    """
+    global DB_PATH
+    DB_PATH = path
+    _menu_catalog.invalidate()
+
+
+def _open_db_connection(path: str) -> sqlite3.Connection:
+    """
+    WAL 모드와 성능 관련 PRAGMA를 적용한 새 연결 생성
+    """
+    conn = sqlite3.connect(path, timeout=DB_BUSY_TIMEOUT)
+    conn.set_trace_callback(_count_query)
+    _metrics.inc("meal_db_connections_opened_total")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size={DB_CACHE_SIZE}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def get_db_connection() -> sqlite3.Connection:
+    """
+    현재 스레드의 데이터베이스 연결 반환
+
+    연결은 스레드마다 하나씩 만들어 재사용하므로 호출한 쪽에서 닫지 않습니다.
+    쓰기 작업은 db_transaction()을 사용합니다.
+    """
+    conn = getattr(_db_local, "conn", None)
+    if conn is None or _db_local.path != DB_PATH:
+        if conn is not None:
+            conn.close()
+        conn = _open_db_connection(DB_PATH)
+        _db_local.conn = conn
+        _db_local.path = DB_PATH
+        _db_local.depth = 0
+    return conn
+
+
+def close_db_connection():
+    """
+    현재 스레드의 데이터베이스 연결 닫기
+    """
+    conn = getattr(_db_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _db_local.conn = None
+
+
+@contextmanager
+def db_transaction():
+    """
+    트랜잭션 컨텍스트 매니저 (정상 종료 시 커밋, 예외 발생 시 롤백)
+
+    중첩해서 사용하면 가장 바깥쪽 블록에서만 커밋합니다.
+
+    Yields:
+        sqlite3.Connection: 현재 스레드의 데이터베이스 연결
+    """
+    conn = get_db_connection()
+    depth = _db_local.depth
+    _db_local.depth = depth + 1
+    try:
+        yield conn
+        if depth == 0:
+            conn.commit()
+    except BaseException:
+        if depth == 0:
+            conn.rollback()
+        raise
+    finally:
+        _db_local.depth = depth
+
+
+def set_error_sink(sink: Optional[Callable[[str], None]]):
+    """
+    사용자에게 보여줄 오류 메시지 출력 함수 지정 (예: st.error)
+
+    Args:
+        sink (Optional[Callable[[str], None]]): 오류 메시지를 받을 함수 (None이면 표준 오류)
+    """
+    global _error_sink
+    _error_sink = sink or _print_error
+
+
+def add_menu(menu_info: Dict[str, Any]):
+    """
+    단일 메뉴 정보를 데이터베이스에 추가
+
+    Args:
+        menu_info (Dict[str, Any]): 메뉴 정보를 담은 딕셔너리
+    """
+    try:
+        add_menus([menu_info])
+    except Exception as e:
+        _error_sink(f"메뉴 추가 중 오류 발생: {str(e)}")
+
+
+def add_menus(
+    menu_infos: Iterable[Dict[str, Any]], replace: bool = True
+) -> Dict[str, int]:
+    """
+    여러 메뉴를 하나의 트랜잭션으로 추가/갱신
+
+    모든 행을 먼저 검증·변환한 뒤 executemany로 한 번에 기록합니다.
+    이름이 없는 행, 입력 안에서 중복된 행(마지막 행만 사용), 기존과 값이 같은 행은
+    건너뜁니다.
+
+    Args:
+        menu_infos (Iterable[Dict[str, Any]]): 메뉴 정보 딕셔너리 목록
+        replace (bool): 이미 있는 메뉴를 새 값으로 갱신할지 여부 (False면 건너뜀)
+
+    Returns:
+        Dict[str, int]: inserted, updated, skipped 개수
+    """
+    counts = {"inserted": 0, "updated": 0, "skipped": 0}
+
+    # 검증 및 변환 (같은 이름은 마지막 행 사용)
+    rows = {}
+    for menu_info in menu_infos:
+        name = menu_info.get("name") if isinstance(menu_info, dict) else None
+        if not isinstance(name, str) or not name.strip():
+            counts["skipped"] += 1
+            continue
+        if name in rows:
+            counts["skipped"] += 1
+        fields = {
+            field: menu_info.get(field) for field in ["category"] + NUTRIENT_FIELDS
+        }
+        rows[name] = _normalize_menu_fields(fields)
+
+    catalog = get_menu_catalog()
+    params = []
+    for name, fields in rows.items():
+        existing = catalog.get(name)
+        if existing is None:
+            counts["inserted"] += 1
+        elif not replace or all(
+            existing[key] == value for key, value in fields.items()
+        ):
+            counts["skipped"] += 1
+            continue
+        else:
+            counts["updated"] += 1
+        params.append(
+            (name, fields["category"]) + tuple(fields[f] for f in NUTRIENT_FIELDS)
+        )
+
+    if params:
+        with db_transaction() as conn:
+            conn.executemany(
+                """
+                INSERT INTO menus (name, category, calories, protein, fat, carbs, sodium)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    category = excluded.category,
+                    calories = excluded.calories,
+                    protein = excluded.protein,
+                    fat = excluded.fat,
+                    carbs = excluded.carbs,
+                    sodium = excluded.sodium
+            """,
+                params,
+            )
+    return counts
+
+
+class TokenBucket:
+    """
+    분당 허용량 기반 토큰 버킷
+
+    reserve()는 필요한 양을 먼저 차감하고 대기 시간을 돌려주므로, 여러 스레드가
+    동시에 요청해도 순서대로 허용량이 배분됩니다.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1) -> float:
+        """
+        허용량을 차감하고 사용 가능해질 때까지의 대기 시간(초) 반환
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return max(0.0, -self.tokens / self.rate)
+
+
+class RateLimiter:
+    """
+    분당 요청 수와 분당 토큰 수를 함께 제한하는 리미터
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def acquire(self, tokens: int = 1):
+        """
+        요청 1회와 토큰 tokens개가 허용될 때까지 대기
+        """
+        wait = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        if wait > 0:
+            time.sleep(wait)
+
+
+_gemini_rate_limiter = RateLimiter(GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE)
+
+
+def _estimate_tokens(text: str) -> int:
+    """
+    프롬프트 토큰 수 추정 (한글 기준 약 2글자당 1토큰)
+    """
+    return max(1, len(text) // 2)
+
+
+def _is_quota_error(error: Exception) -> bool:
+    """
+    할당량 초과(429 / ResourceExhausted) 오류인지 확인
+    """
+    message = str(error).lower()
+    return (
+        type(error).__name__ in ("ResourceExhausted", "TooManyRequests")
+        or "429" in message
+        or "quota" in message
+        or "rate limit" in message
+    )
+
+
+def set_model(model):
+    """
+    LLM 호출에 사용할 모델 교체 (벤치마크/테스트용 가짜 모델 등)
+
+    모델 백엔드는 generate_content(prompt: str)가 .text(str) 속성을 가진 응답을
+    반환하는 객체입니다. generate_content(prompt, stream=True)로 응답 조각의
+    iterable을 반환하면 generate_content_stream이 조각을 받는 대로 사용합니다.
+    할당량 초과는 이름이 ResourceExhausted이거나 메시지에 429가 포함된 예외로
+    알려야 재시도(백오프) 대상이 됩니다.
+
+    Args:
+        model: 모델 백엔드 객체 (None이면 MEAL_MODEL_BACKEND 설정에 따른 기본 모델)
+    """
+    global _model_override
+    _model_override = model
+
+
+def _load_model_backend(spec: str):
+    """
+    "모듈:팩토리" 형식의 백엔드 설정으로 모델 생성
+    """
+    module_name, _, factory_name = spec.partition(":")
+    if not factory_name:
+        raise ValueError(f"MEAL_MODEL_BACKEND 형식이 잘못되었습니다: {spec}")
+    factory = importlib.import_module(module_name)
+    for attr in factory_name.split("."):
+        factory = getattr(factory, attr)
+    return factory()
+
+
+def get_model():
+    """
+    LLM 모델 반환 (처음 호출할 때 생성)
+
+    우선순위는 set_model()로 지정한 모델, MEAL_MODEL_BACKEND로 지정한 백엔드,
+    Gemini 순입니다. Gemini는 google.generativeai를 이때 import하며,
+    GOOGLE_API_KEY 환경 변수가 바뀌면 새 키로 다시 생성합니다.
+
+    Returns:
+        Optional[Any]: 모델 백엔드 (Gemini API 키가 없으면 None)
+    """
+    global _model_override, _gemini_model, _gemini_model_key
+    if _model_override is not None:
+        return _model_override
+    if MODEL_BACKEND != "gemini":
+        with _gemini_model_lock:
+            if _model_override is None:
+                _model_override = _load_model_backend(MODEL_BACKEND)
+            return _model_override
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        return None
+    with _gemini_model_lock:
+        if _gemini_model is None or _gemini_model_key != api_key:
+            import google.generativeai as genai
+
+            genai.configure(api_key=api_key)
+            _gemini_model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+            _gemini_model_key = api_key
+        return _gemini_model
+
+
+def _request_content(prompt: str, stream: bool = False):
+    """
+    호출 한도와 할당량 초과 재시도를 적용하여 모델에 요청
+
+    할당량 초과 오류는 지터를 적용한 지수 백오프로 최대 GEMINI_MAX_ATTEMPTS번
+    시도하며, 그 외 오류는 그대로 발생시킵니다. stream=True를 지원하지 않는
+    모델은 전체 응답 하나를 담은 리스트를 반환합니다.
+
+    Returns:
+        Tuple[Any, float]: 모델 응답 (stream이면 응답 조각의 iterable), 요청 시작 시각
+    """
+    model = get_model()
+    if model is None:
+        raise RuntimeError(
+            "Gemini 모델이 설정되지 않았습니다. GOOGLE_API_KEY를 확인하세요."
+        )
+
+    for attempt in range(GEMINI_MAX_ATTEMPTS):
+        _gemini_rate_limiter.acquire(_estimate_tokens(prompt))
+        _metrics.observe("meal_llm_prompt_chars", len(prompt), METRIC_CHARS_BUCKETS)
+        started = time.perf_counter()
+        try:
+            if not stream:
+                response = model.generate_content(prompt)
+            else:
+                try:
+                    response = model.generate_content(prompt, stream=True)
+                except TypeError:
+                    response = [model.generate_content(prompt)]  # 스트리밍 미지원
+        except Exception as e:
+            quota_error = _is_quota_error(e)
+            _metrics.inc(
+                "meal_llm_requests_total",
+                outcome="quota_error" if quota_error else "error",
+            )
+            _metrics.observe("meal_llm_request_seconds", time.perf_counter() - started)
+            if not quota_error or attempt == GEMINI_MAX_ATTEMPTS - 1:
+                raise
+            delay = min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * 2**attempt)
+            time.sleep(random.uniform(delay / 2, delay))
+            continue
+        _metrics.inc("meal_llm_requests_total", outcome="ok")
+        return response, started
+
+
+def generate_content(prompt: str):
+    """
+    호출 한도와 재시도를 적용하여 Gemini generate_content 호출
+
+    할당량 초과 오류는 지터를 적용한 지수 백오프로 최대 GEMINI_MAX_ATTEMPTS번
+    시도하며, 그 외 오류는 그대로 발생시킵니다.
+
+    Args:
+        prompt (str): 프롬프트
+
+    Returns:
+        GenerateContentResponse: 모델 응답
+    """
+    response, started = _request_content(prompt)
+    _metrics.observe("meal_llm_request_seconds", time.perf_counter() - started)
+    try:
+        response_chars = len(response.text or "")
+    except Exception:
+        response_chars = 0  # 차단된 응답 등 text를 읽을 수 없는 경우
+    _metrics.observe("meal_llm_response_chars", response_chars, METRIC_CHARS_BUCKETS)
+    return response
+
+
+def _chunk_text(chunk: Any) -> str:
+    """
+    스트리밍 응답 조각의 텍스트 (텍스트가 없는 조각은 빈 문자열)
+
+    Gemini는 parts가 없는 조각(종료 사유만 담긴 마지막 조각 등)에서 .text에
+    접근하면 ValueError를 내므로, 이런 조각은 건너뜁니다.
+    """
+    try:
+        return chunk.text or ""
+    except (ValueError, IndexError, AttributeError):
+        logger.debug("텍스트가 없는 응답 조각을 건너뜀: %r", chunk)
+        return ""
+
+
+def generate_content_stream(prompt: str) -> Iterator[str]:
+    """
+    generate_content의 스트리밍 버전 (응답 텍스트 조각을 받는 대로 반환)
+
+    호출 한도와 재시도는 첫 요청에만 적용되며, 요청 시간 지표는 마지막 조각을
+    받은 시점까지로 기록합니다.
+
+    Args:
+        prompt (str): 프롬프트
+
+    Yields:
+        str: 응답 텍스트 조각
+    """
+    response, started = _request_content(prompt, stream=True)
+    response_chars = 0
+    for chunk in response:
+        text = _chunk_text(chunk)
+        response_chars += len(text)
+        yield text
+    _metrics.observe("meal_llm_request_seconds", time.perf_counter() - started)
+    _metrics.observe("meal_llm_response_chars", response_chars, METRIC_CHARS_BUCKETS)
+
+
+def _loads_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """
+    JSON 객체 문자열 파싱 (닫는 괄호 앞 쉼표 허용, 실패하면 None)
+    """
+    for candidate in (text, re.sub(r",\s*([}\]])", r"\1", text)):
+        try:
+            value = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        return value if isinstance(value, dict) else None
+    logger.debug("JSON 객체를 파싱할 수 없어 건너뜀: %s", text)
+    return None
+
+
+def _iter_json_objects(chunks: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    응답 텍스트 조각에서 최상위 JSON 객체를 완성되는 대로 하나씩 반환
+
+    배열 괄호, ```json 블록 표시, 설명문 등 객체 바깥 글자는 무시하고, 문자열
+    안의 중괄호와 이스케이프는 구분합니다. 이미 처리한 앞부분은 버퍼에서 버리므로
+    응답 전체를 다시 검사하지 않습니다. 파싱할 수 없는 객체는 건너뜁니다.
+
+    Args:
+        chunks (Iterable[str]): 응답 텍스트 조각 (generate_content_stream 결과 등)
+
+    Yields:
+        Dict[str, Any]: JSON 객체
+    """
+    buffer, pos, start, depth = "", 0, 0, 0
+    in_string = escaped = False
+    for chunk in chunks:
+        buffer += chunk
+        while pos < len(buffer):
+            char = buffer[pos]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = depth > 0
+            elif char == "{":
+                if depth == 0:
+                    start = pos
+                depth += 1
+            elif char == "}" and depth:
+                depth -= 1
+                if depth == 0:
+                    value = _loads_json_object(buffer[start : pos + 1])
+                    if value is not None:
+                        yield value
+            pos += 1
+        # 처리한 부분 버리기 (객체 중간이면 객체 시작부터 유지)
+        keep_from = start if depth else pos
+        buffer, pos, start = buffer[keep_from:], pos - keep_from, start - keep_from
+
+
+def normalize_menu_name(menu_name: str) -> str:
+    """
+    캐시/중복 비교용 메뉴 이름 정규화 (유니코드 정규화, 소문자화, 공백·구두점 제거)
+
+    Args:
+        menu_name (str): 메뉴 이름
+
+    Returns:
+        str: 정규화된 메뉴 이름
+    """
+    normalized = unicodedata.normalize("NFKC", str(menu_name)).lower()
+    return re.sub(r"[\W_]+", "", normalized)
+
+
+def _classification_cache_get(menu_name: str) -> Optional[Dict[str, Any]]:
+    """
+    분류 캐시에서 메뉴 정보 조회 (만료된 항목은 삭제)
+
+    Args:
+        menu_name (str): 메뉴 이름
+
+    Returns:
+        Optional[Dict[str, Any]]: 캐시된 메뉴 정보 (없으면 None)
+    """
+    key = normalize_menu_name(menu_name)
+    now = time.time()
+    try:
+        with db_transaction() as conn:
+            row = conn.execute(
+                """
+                SELECT result, created_at FROM classification_cache
+                WHERE normalized_name = ? AND prompt_version = ?
+            """,
+                (key, CLASSIFY_PROMPT_VERSION),
+            ).fetchone()
+            if row and now - row[1] > CLASSIFY_CACHE_TTL:
+                conn.execute(
+                    """
+                    DELETE FROM classification_cache
+                    WHERE normalized_name = ? AND prompt_version = ?
+                """,
+                    (key, CLASSIFY_PROMPT_VERSION),
+                )
+                row = None
+            if row:
+                conn.execute(
+                    """
+                    UPDATE classification_cache SET last_used_at = ?
+                    WHERE normalized_name = ? AND prompt_version = ?
+                """,
+                    (now, key, CLASSIFY_PROMPT_VERSION),
+                )
+    except sqlite3.OperationalError:
+        row = None
+
+    with _classification_cache_lock:
+        _classification_cache_stats["hits" if row else "misses"] += 1
+    if not row:
+        return None
+    menu_info = json.loads(row[0])
+    menu_info["name"] = menu_name
+    return menu_info
+
+
+def _classification_cache_put(
+    menu_name: str, raw_response: str, menu_info: Dict[str, Any]
+):
+    """
+    분류 결과를 캐시에 저장하고 최대 크기를 넘으면 오래 사용되지 않은 항목부터 삭제
+
+    Args:
+        menu_name (str): 메뉴 이름
+        raw_response (str): API 원본 응답 (배치 분류면 배치 전체 응답)
+        menu_info (Dict[str, Any]): 파싱된 메뉴 정보
+    """
+    now = time.time()
+    try:
+        with db_transaction() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO classification_cache
+                    (normalized_name, prompt_version, raw_response, result, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """,
+                (
+                    normalize_menu_name(menu_name),
+                    CLASSIFY_PROMPT_VERSION,
+                    raw_response,
+                    json.dumps(menu_info, ensure_ascii=False),
+                    now,
+                    now,
+                ),
+            )
+            evicted = conn.execute(
+                """
+                DELETE FROM classification_cache WHERE rowid IN (
+                    SELECT rowid FROM classification_cache
+                    ORDER BY last_used_at ASC
+                    LIMIT max((SELECT COUNT(*) FROM classification_cache) - ?, 0)
+                )
+            """,
+                (CLASSIFY_CACHE_MAX_ENTRIES,),
+            ).rowcount
+    except sqlite3.OperationalError as e:
+        print(f"분류 캐시 저장 중 오류 발생: {str(e)}")
+        evicted = 0
+
+    if evicted > 0:
+        with _classification_cache_lock:
+            _classification_cache_stats["evictions"] += evicted
+
+
+def get_classification_cache_stats() -> Dict[str, Any]:
+    """
+    분류 캐시 적중/미스 통계 반환
+
+    Returns:
+        Dict[str, Any]: hits, misses, evictions, hit_rate, size
+    """
+    with _classification_cache_lock:
+        stats = dict(_classification_cache_stats)
+    total = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / total if total else 0.0
+
+    try:
+        stats["size"] = (
+            get_db_connection()
+            .execute("SELECT COUNT(*) FROM classification_cache")
+            .fetchone()[0]
+        )
+    except sqlite3.OperationalError:
+        stats["size"] = 0
+    return stats
+
+
+def _normalize_menu_fields(menu_info: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    메뉴 정보의 카테고리와 영양소 값을 검증하고 변환 (잘못된 값은 기본값으로 대체)
+
+    Args:
+        menu_info (Dict[str, Any]): 메뉴 정보
+
+    Returns:
+        Dict[str, Any]: 검증된 메뉴 정보 (같은 객체)
+    """
+    if menu_info.get("category") not in MENU_CATEGORIES:
+        menu_info["category"] = "메인"  # 기본값 설정
+
+    for field in NUTRIENT_FIELDS:
+        try:
+            menu_info[field] = int(float(str(menu_info[field]).replace(",", "")))
+        except (KeyError, ValueError, TypeError):
+            menu_info[field] = DEFAULT_NUTRITION[field]
+    return menu_info
+
+
+def _parse_menu_info(response_text: str) -> Dict[str, Any]:
+    """
+    classify_menu 응답 텍스트에서 메뉴 정보 JSON을 추출하고 검증
+
+    Args:
+        response_text (str): API 응답 텍스트
+
+    Returns:
+        Dict[str, Any]: 검증된 메뉴 정보
+
+    Raises:
+        ValueError: JSON을 찾을 수 없거나 필수 필드가 누락된 경우
+    """
+    json_str = re.search(r"```json\n(.*?)\n```", response_text, re.DOTALL)
+    if not json_str:
+        json_str = re.search(r"\{.*\}", response_text, re.DOTALL)
+    if not json_str:
+        raise ValueError("API 응답에서 JSON을 찾을 수 없습니다.")
+
+    menu_info = json.loads(
+        json_str.group(0) if json_str.group(0).startswith("{") else json_str.group(1)
+    )
+
+    # 필수 필드 검증
+    required_fields = ["name", "category"] + NUTRIENT_FIELDS
+    if not all(field in menu_info for field in required_fields):
+        raise ValueError("API 응답에 필수 필드가 누락되었습니다.")
+
+    return _normalize_menu_fields(menu_info)
+
+
+def classify_menu(menu_name: str, fallback: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Gemini API를 사용하여 메뉴를 분류하고 영양 정보 추출
+
+    분류 결과는 정규화된 메뉴 이름과 프롬프트 버전을 키로 meal.db에 캐시되며,
+    캐시에 있는 메뉴와 DB에 이름이 거의 같은 메뉴가 있는 메뉴(find_similar_menu)는
+    API를 호출하지 않습니다.
+
+    Args:
+        menu_name (str): 분류할 메뉴 이름
+        fallback (bool): 분류에 실패하면 기본값(DEFAULT_NUTRITION)을 반환할지 여부
+
+    Returns:
+        Optional[Dict[str, Any]]: 메뉴의 카테고리와 영양 정보
+            (fallback=False이고 분류에 실패하면 None)
+    """
+    cached = _classification_cache_get(menu_name)
+    if cached:
+        return cached
+    similar = _reuse_similar_menu(menu_name)
+    if similar:
+        return similar
+
+    prompt = f"""
+    다음 메뉴의 카테고리와 영양 정보를 JSON 형식으로 반환해주세요:
+    메뉴: {menu_name}
+    
+    응답 형식:
+    {{
+        "name": "{menu_name}",
+        "category": "국/수프|메인|사이드|밥",
+        "calories": 숫자,
+        "protein": 숫자,
+        "fat": 숫자,
+        "carbs": 숫자,
+        "sodium": 숫자
+    }}
+
+    주의사항:
+    1. 모든 숫자는 정수여야 합니다.
+    2. category는 반드시 "국/수프", "메인", "사이드", "밥" 중 하나여야 합니다.
+    3. calories는 50-1000 사이의 값이어야 합니다.
+    4. protein, fat, carbs는 0-100 사이의 값이어야 합니다.
+    5. sodium은 0-2000 사이의 값이어야 합니다.
+    6. 1인분을 기준으로 합니다.
+    """
+
+    try:
+        response = generate_content(prompt)
+        menu_info = _parse_menu_info(response.text)
+        menu_info["name"] = menu_name
+        _classification_cache_put(menu_name, response.text, menu_info)
+        return menu_info
+
+    except Exception as e:
+        print(f"메뉴 분류 중 오류 발생: {str(e)}")
+        if not fallback:
+            return None
+        _metrics.inc("meal_classify_fallbacks_total")
+        # 기본값 반환
+        return {"name": menu_name, "category": "메인", **DEFAULT_NUTRITION}
+
+
+def _build_batch_classify_prompt(menu_names: List[str]) -> str:
+    """
+    여러 메뉴를 한 번에 분류하기 위한 프롬프트 생성
+
+    Args:
+        menu_names (List[str]): 분류할 메뉴 이름 리스트
+
+    Returns:
+        str: 프롬프트 문자열
+    """
+    menu_list = "\n".join(
+        f"{i}. {json.dumps(name, ensure_ascii=False)}"
+        for i, name in enumerate(menu_names, start=1)
+    )
+    return f"""
+    다음 메뉴 {len(menu_names)}개의 카테고리와 영양 정보를 JSON 배열 형식으로 반환해주세요:
+    {menu_list}
+
+    응답 형식:
+    [
+        {{
+            "id": 번호,
+            "name": "메뉴 이름 (입력과 동일하게)",
+            "category": "국/수프|메인|사이드|밥",
+            "calories": 숫자,
+            "protein": 숫자,
+            "fat": 숫자,
+            "carbs": 숫자,
+            "sodium": 숫자
+        }},
+        ...
+    ]
+
+    주의사항:
+    1. 입력된 모든 메뉴에 대해 하나씩, 입력 순서대로 응답해야 합니다.
+    2. id는 입력 목록의 번호, name은 입력된 메뉴 이름을 그대로 사용합니다.
+    3. 모든 숫자는 정수여야 합니다.
+    4. category는 반드시 "국/수프", "메인", "사이드", "밥" 중 하나여야 합니다.
+    5. calories는 50-1000 사이의 값이어야 합니다.
+    6. protein, fat, carbs는 0-100 사이의 값이어야 합니다.
+    7. sodium은 0-2000 사이의 값이어야 합니다.
+    8. 1인분을 기준으로 합니다.
+    """
+
+
+def _parse_menu_list(response_text: str) -> List[Any]:
+    """
+    응답 텍스트에서 JSON 배열 추출
+
+    Args:
+        response_text (str): API 응답 텍스트
+
+    Returns:
+        List[Any]: 파싱된 배열
+
+    Raises:
+        ValueError: JSON 배열을 찾을 수 없는 경우
+    """
+    json_str = re.search(r"```(?:json)?\s*\n(.*?)\n\s*```", response_text, re.DOTALL)
+    text = json_str.group(1) if json_str else response_text
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end <= start:
+        raise ValueError("API 응답에서 JSON 배열을 찾을 수 없습니다.")
+    items = json.loads(text[start : end + 1])
+    if not isinstance(items, list):
+        raise ValueError("API 응답이 JSON 배열이 아닙니다.")
+    return items
+
+
+def _match_batch_results(
+    menu_names: List[str], items: List[Any]
+) -> Dict[str, Dict[str, Any]]:
+    """
+    배치 응답 항목을 입력 메뉴 이름에 대응시키고 검증
+
+    이름(정규화 비교)으로 먼저 대응시키고, 이름이 바뀐 항목은 id로 대응시킵니다.
+    필수 필드가 빠진 항목은 결과에서 제외됩니다.
+
+    Args:
+        menu_names (List[str]): 요청한 메뉴 이름 리스트
+        items (List[Any]): 응답 배열
+
+    Returns:
+        Dict[str, Dict[str, Any]]: 메뉴 이름 → 검증된 메뉴 정보
+    """
+    by_key = {normalize_menu_name(name): name for name in menu_names}
+    required_fields = ["category"] + NUTRIENT_FIELDS
+    matched = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        name = by_key.get(normalize_menu_name(item.get("name", "")))
+        if name is None:
+            try:
+                name = menu_names[int(item.get("id")) - 1]
+            except (TypeError, ValueError, IndexError):
+                continue
+        if name in matched or not all(field in item for field in required_fields):
+            continue
+        menu_info = _normalize_menu_fields(dict(item))
+        menu_info.pop("id", None)
+        menu_info["name"] = name
+        matched[name] = menu_info
+    return matched
+
+
+def _classify_batch(batch: List[str]) -> Tuple[Dict[str, Dict[str, Any]], str]:
+    """
+    메뉴 한 배치를 분류하여 대응된 결과와 API 원본 응답 반환 (실패 시 빈 딕셔너리)
+    """
+    try:
+        response = generate_content(_build_batch_classify_prompt(batch))
+        matched = _match_batch_results(batch, _parse_menu_list(response.text))
+        return matched, response.text
+    except Exception as e:
+        print(f"배치 메뉴 분류 중 오류 발생: {str(e)}")
+        return {}, ""
+
+
+@_timed_stage("classify")
+def classify_menus(
+    menu_names: Iterable[str],
+    batch_size: Optional[int] = None,
+    max_retries: int = 2,
+    max_workers: Optional[int] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    fallback: bool = True,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    여러 메뉴를 배치 프롬프트로 분류
+
+    캐시에 있거나 DB에 이름이 거의 같은 메뉴가 있는 메뉴는 API를 호출하지 않고,
+    나머지는 batch_size개씩 한 번의 요청으로 분류합니다. 정규화하면 같은 이름
+    ("제육 볶음", "제육볶음")은 한 번만 분류하고 결과를 함께 사용합니다. 배치 요청은 최대
+    max_workers개까지 동시에 실행되며 호출 한도(GEMINI_REQUESTS_PER_MINUTE,
+    GEMINI_TOKENS_PER_MINUTE)를 따릅니다.
+    응답에서 빠졌거나 형식이 잘못된 메뉴만 최대 max_retries번 다시 요청하며,
+    그래도 실패한 메뉴는 classify_menu로 개별 분류합니다.
+
+    Args:
+        menu_names (Iterable[str]): 분류할 메뉴 이름 리스트
+        batch_size (Optional[int]): 요청당 메뉴 수 (기본값 CLASSIFY_BATCH_SIZE)
+        max_retries (int): 누락된 메뉴 재요청 횟수
+        max_workers (Optional[int]): 동시 요청 수 (기본값 CLASSIFY_MAX_WORKERS)
+        progress_callback (Optional[Callable[[int, int], None]]):
+            진행 상황 콜백 (완료된 메뉴 수, 전체 메뉴 수), 호출한 스레드에서 실행됨
+        fallback (bool): 끝내 분류하지 못한 메뉴에 기본값을 쓸지 여부
+            (False면 결과에서 제외)
+
+    Returns:
+        Dict[str, Dict[str, Any]]: 메뉴 이름 → 메뉴 정보 (입력 순서 유지)
+    """
+    batch_size = max(1, batch_size or CLASSIFY_BATCH_SIZE)
+    max_workers = max(1, max_workers or CLASSIFY_MAX_WORKERS)
+
+    # 중복/빈 이름 제거 (정규화 이름별로 묶어 대표 이름만 분류)
+    names = []
+    aliases: Dict[str, List[str]] = {}
+    for name in menu_names:
+        if name is None or (isinstance(name, float) and pd.isna(name)):
+            continue
+        name = str(name)
+        if name.strip() and name not in names:
+            names.append(name)
+            aliases.setdefault(normalize_menu_name(name), []).append(name)
+    representatives = [group[0] for group in aliases.values()]
+
+    results = {}
+
+    def store(name: str, menu_info: Dict[str, Any]):
+        for alias in aliases[normalize_menu_name(name)]:
+            results[alias] = dict(menu_info, name=alias)
+
+    pending = []
+    for name in representatives:
+        cached = _classification_cache_get(name) or _reuse_similar_menu(name)
+        if cached:
+            store(name, cached)
+        else:
+            pending.append(name)
+
+    def report_progress():
+        if progress_callback:
+            progress_callback(len(results), len(names))
+
+    report_progress()
+
+    for _ in range(max_retries + 1):
+        if not pending or get_model() is None:
+            break
+        batches = [
+            pending[i : i + batch_size] for i in range(0, len(pending), batch_size)
+        ]
+        missing = []
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as pool:
+            futures = {pool.submit(_classify_batch, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                matched, raw_response = future.result()
+                for name, menu_info in matched.items():
+                    store(name, menu_info)
+                    _classification_cache_put(name, raw_response, menu_info)
+                missing.extend(name for name in batch if name not in matched)
+                report_progress()
+        missing = set(missing)
+        pending = [name for name in representatives if name in missing]
+
+    # 배치로 분류하지 못한 메뉴는 개별 분류 (실패 시 기본값 또는 제외)
+    for name in pending:
+        menu_info = classify_menu(name, fallback=fallback)
+        if menu_info is not None:
+            store(name, menu_info)
+        report_progress()
+
+    return {name: results[name] for name in names if name in results}
+
+
+def add_default_korean_menus() -> int:
+    """
+    Gemini로 구내식당용 한식 메뉴를 생성하여 DB에 추가
+
+    응답을 스트리밍으로 받아 메뉴 객체가 완성될 때마다 검증하고,
+    DEFAULT_MENUS_INSERT_BATCH개씩 모아 생성이 끝나기 전부터 DB에 기록합니다.
+    이름이 없거나 이미 있는 메뉴는 건너뜁니다.
+
+    Returns:
+        int: 새로 추가된 메뉴 수
+    """
+    existing_menu_names = set(get_menu_catalog().names)
+
+    # AI를 통해 한식 메뉴 생성
+    prompt = """
+    다음 조건에 맞는 한식 메뉴 15개를 생성해주세요:
+    1. 구내식당에서 제공하는 메뉴여야 합니다.
+    2. 국/수프, 메인, 사이드, 밥 카테고리 중 하나여야 합니다.
+    3. 각 메뉴는 기존 메뉴와 중복되지 않아야 합니다.
+    4. 각 메뉴의 영양 정보(칼로리, 단백질, 지방, 탄수화물, 나트륨)를 포함해야 합니다.
+    5. JSON 형식으로 응답해주세요.
+    6. 1인분을 기준으로 합니다.
+    7. 구체적인 메뉴 이름을 작성해주세요.
+    8. 메뉴 이름은 한국어로 작성해주세요.
+    9. 김치를 활용한 음식은 괜찮지만, 김치 자체를 메뉴로 추가하지 말아주세요.
+    10. 밥종류도 제외해주세요.
+
+    응답 형식:
+    [
+        {{
+            "name": "메뉴이름",
+            "category": "국/수프|메인|사이드|밥",
+            "calories": 숫자,
+            "protein": 숫자,
+            "fat": 숫자,
+            "carbs": 숫자,
+            "sodium": 숫자
+        }},
+        ...
+    ]
+
+    주의사항:
+    1. 모든 숫자는 정수여야 합니다.
+    2. category는 반드시 "국/수프", "메인", "사이드", "밥" 중 하나여야 합니다.
+    3. calories는 50-1000 사이의 값이어야 합니다.
+    4. protein, fat, carbs는 0-100 사이의 값이어야 합니다.
+    5. sodium은 0-2000 사이의 값이어야 합니다.
+    6. 1인분을 기준으로 합니다.
+
+    기존 메뉴 목록:
+    {existing_menus}
+    """
+
+    added_count = 0
+    parsed_count = 0
+    batch = []
+    try:
+        # 메뉴 객체가 완성되는 대로 검증하고 일정 개수씩 추가
+        chunks = generate_content_stream(
+            prompt.format(existing_menus=list(existing_menu_names))
+        )
+        for menu in _iter_json_objects(chunks):
+            parsed_count += 1
+            logger.debug("생성된 메뉴: %s", menu)
+            name = menu.get("name")
+            if not isinstance(name, str) or not name.strip():
+                continue
+            if name in existing_menu_names:
+                continue  # 기존 메뉴 또는 응답 안에서 중복된 메뉴
+            existing_menu_names.add(name)
+            batch.append(menu)
+            if len(batch) >= DEFAULT_MENUS_INSERT_BATCH:
+                added_count += add_menus(batch, replace=False)["inserted"]
+                batch = []
+        if not parsed_count:
+            print("메뉴 생성 실패: JSON 형식의 응답을 찾을 수 없습니다.")
+    except Exception as e:
+        print(f"메뉴 생성 중 오류 발생: {str(e)}")
+        logger.debug("메뉴 생성 오류 상세 정보", exc_info=True)
+    # 오류가 나도 이미 검증한 메뉴는 추가
+    if batch:
+        added_count += add_menus(batch, replace=False)["inserted"]
+    return added_count
+
+
+def bulk_add(
+    menu_names: List[str],
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, int]:
+    """
+    여러 메뉴를 일괄 추가
+
+    Args:
+        menu_names (List[str]): 추가할 메뉴 이름 리스트
+        progress_callback (Optional[Callable[[int, int], None]]):
+            분류 진행 상황 콜백 (완료된 메뉴 수, 전체 메뉴 수)
+
+    Returns:
+        Dict[str, int]: inserted, updated, skipped 개수
+    """
+    classified = classify_menus(menu_names, progress_callback=progress_callback)
+    return add_menus(classified.values())
+
+
+def get_all_menus() -> pd.DataFrame:
+    """
+    데이터베이스의 모든 메뉴 정보를 DataFrame으로 반환
+    """
+    return pd.read_sql_query("SELECT * FROM menus", get_db_connection())
+
+
+def get_menus_version(conn: Optional[sqlite3.Connection] = None) -> Optional[int]:
+    """
+    menus 테이블의 변경 버전 반환 (트리거로 쓰기마다 증가)
+
+    add_menu, delete_menu, update_menu_* 등 모든 쓰기에서 증가하므로
+    캐시 키로 사용할 수 있습니다.
+
+    Args:
+        conn (Optional[sqlite3.Connection]): 데이터베이스 연결 (기본값 현재 스레드 연결)
+
+    Returns:
+        Optional[int]: 버전 번호 (버전 테이블이 없으면 None)
+    """
+    conn = conn or get_db_connection()
+    try:
+        row = conn.execute(
+            "SELECT version FROM db_version WHERE name = 'menus'"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+class MenuCatalog:
+    """
+    menus 테이블의 메모리 캐시
+
+    메뉴 이름 → 행 인덱스 딕셔너리와 영양소 행렬(float32, NUTRIENT_FIELDS 순서)을
+    유지하며, 테이블 버전이 바뀐 경우에만 다시 읽어들입니다.
+    """
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self.names: List[str] = []
+        self.index: Dict[str, int] = {}
+        # 인덱스와 영양소 행렬은 refresh()에서 구성 (import 시 pandas/numpy 로드 방지)
+        self._name_index: Optional[pd.Index] = None
+        self.categories: Optional[np.ndarray] = None
+        self.matrix: Optional[np.ndarray] = None
+        self._frame: Optional[pd.DataFrame] = None
+        self._category_names: Dict[str, List[str]] = {}
+        self._category_rows: Dict[str, np.ndarray] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # 프로세스 간 공유(피클링) 시 잠금 객체는 제외
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False) -> "MenuCatalog":
+        """
+        테이블이 변경된 경우에만 메뉴 정보를 다시 로드
+
+        Args:
+            force (bool): 버전과 관계없이 다시 로드할지 여부
+
+        Returns:
+            MenuCatalog: 자기 자신
+        """
+        with self._lock:
+            conn = get_db_connection()
+            version = get_menus_version(conn)
+            if (
+                self._loaded
+                and not force
+                and version is not None
+                and version == self.version
+            ):
+                return self
+            df = pd.read_sql_query("SELECT * FROM menus", conn)
+            self._load(df, version)
+        return self
+
+    def _load(self, df: pd.DataFrame, version: Optional[int]):
+        """
+        DataFrame으로부터 인덱스와 영양소 행렬 구성
+        """
+        df = df.reset_index(drop=True)
+        self.names = df["name"].tolist()
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self._name_index = pd.Index(self.names)
+        self.categories = df["category"].to_numpy(dtype=object)
+        self.matrix = np.ascontiguousarray(
+            df[NUTRIENT_FIELDS].fillna(0).to_numpy(dtype=np.float32)
+        )
+        self._frame = df
+        self._category_names = {}
+        for name, category in zip(self.names, self.categories):
+            self._category_names.setdefault(category, []).append(name)
+        self._category_rows = {
+            category: np.flatnonzero(self.categories == category)
+            for category in self._category_names
+        }
+        self.version = version
+        self._loaded = True
+
+    def invalidate(self):
+        """
+        다음 refresh()에서 버전과 관계없이 다시 로드하도록 표시
+        """
+        self._loaded = False
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, menu_name: Any) -> bool:
+        return menu_name in self.index
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        get_all_menus()와 같은 형식의 DataFrame 반환 (복사본)
+        """
+        if self._frame is None:
+            return pd.DataFrame(columns=["name", "category"] + NUTRIENT_FIELDS)
+        return self._frame.copy()
+
+    def get(self, menu_name: str) -> Optional[Dict[str, Any]]:
+        """
+        메뉴 하나의 정보를 딕셔너리로 반환 (없으면 None)
+        """
+        i = self.index.get(menu_name)
+        if i is None:
+            return None
+        info = {"name": menu_name, "category": self.categories[i]}
+        info.update(zip(NUTRIENT_FIELDS, self.matrix[i].tolist()))
+        return info
+
+    def category_of(self, menu_name: str) -> Optional[str]:
+        """
+        메뉴의 카테고리 반환 (없으면 None)
+        """
+        i = self.index.get(menu_name)
+        return None if i is None else self.categories[i]
+
+    def names_in_category(self, category: str) -> List[str]:
+        """
+        카테고리에 속한 메뉴 이름 리스트 반환
+        """
+        return list(self._category_names.get(category, []))
+
+    def rows_in_category(self, category: str) -> np.ndarray:
+        """
+        카테고리에 속한 메뉴의 행 인덱스 배열 반환
+        """
+        return self._category_rows.get(category, np.empty(0, dtype=np.int64))
+
+    def rows(self, menu_names: Iterable[str]) -> np.ndarray:
+        """
+        메뉴 이름 리스트를 행 인덱스 배열로 변환 (없는 메뉴는 -1)
+        """
+        if not isinstance(menu_names, (list, np.ndarray, pd.Series, pd.Index)):
+            menu_names = list(menu_names)
+        return self._name_index.get_indexer(menu_names).astype(np.int64)
+
+    def gather(self, menu_names: Iterable[str]) -> np.ndarray:
+        """
+        메뉴 이름 리스트에 대한 영양소 행렬을 일괄 조회
+
+        Args:
+            menu_names (Iterable[str]): 메뉴 이름 리스트
+
+        Returns:
+            np.ndarray: (메뉴 수, 영양소 수) 행렬, 없는 메뉴의 행은 NaN
+        """
+        rows = self.rows(menu_names)
+        result = np.full((len(rows), len(NUTRIENT_FIELDS)), np.nan, dtype=np.float32)
+        found = rows >= 0
+        result[found] = self.matrix[rows[found]]
+        return result
+
+
+_menu_catalog = MenuCatalog()
+
+
+def get_menu_catalog() -> MenuCatalog:
+    """
+    공유 MenuCatalog 반환 (테이블이 변경된 경우에만 갱신)
+    """
+    return _menu_catalog.refresh()
+
+
+def _trigrams(text: str) -> set:
+    """
+    문자열의 trigram 집합 (FTS5 trigram 토크나이저와 같은 단위)
+    """
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def _has_menu_search_index(conn: sqlite3.Connection) -> bool:
+    """
+    menus_fts 검색 인덱스 존재 여부
+    """
+    return (
+        conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'menus_fts'"
+        ).fetchone()
+        is not None
+    )
+
+
+def search_menus(
+    query: str, limit: int = 20, offset: int = 0, fuzzy: bool = True
+) -> Tuple[pd.DataFrame, int]:
+    """
+    메뉴 이름 검색 (접두어/부분 문자열/오타 허용, 순위 및 페이지 지원)
+
+    정확히 일치 → 접두어 일치 → 부분 문자열 일치 → 오타 허용(trigram 유사도)
+    순으로 정렬하며, 같은 순위 안에서는 이름이 짧은 메뉴가 먼저 나옵니다.
+    3글자 이상 검색어는 menus_fts(FTS5 trigram) 인덱스를 사용하고, 그보다 짧은
+    검색어는 LIKE로 찾습니다. 오타 허용 검색은 3글자 이상 검색어에만 적용됩니다.
+
+    Args:
+        query (str): 검색어
+        limit (int): 페이지 크기
+        offset (int): 건너뛸 결과 수
+        fuzzy (bool): 오타 허용 검색 포함 여부
+
+    Returns:
+        Tuple[pd.DataFrame, int]: 현재 페이지 메뉴 목록 (get_all_menus() 형식), 전체 결과 수
+    """
+    query = " ".join(str(query).split()).lower()
+    columns = ["name", "category"] + NUTRIENT_FIELDS
+    if not query:
+        return pd.DataFrame(columns=columns), 0
+
+    conn = get_db_connection()
+    use_index = len(query) >= 3 and _has_menu_search_index(conn)
+    rank_sql = """
+        CASE WHEN m.name = :q COLLATE NOCASE THEN 0
+             WHEN m.name LIKE :prefix ESCAPE '\\' THEN 1
+             ELSE 2 END
+    """
+    like = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    params = {"q": query, "prefix": f"{like}%", "substring": f"%{like}%"}
+
+    # 접두어/부분 문자열 일치
+    if use_index:
+        params["match"] = '"' + query.replace('"', '""') + '"'
+        sql = f"""
+            SELECT m.name, {rank_sql} AS tier FROM menus_fts
+            JOIN menus m ON m.rowid = menus_fts.rowid
+            WHERE menus_fts MATCH :match
+        """
+    else:
+        sql = f"""
+            SELECT m.name, {rank_sql} AS tier FROM menus m
+            WHERE m.name LIKE :substring ESCAPE '\\'
+        """
+    total = conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
+    page = [
+        name
+        for name, _ in conn.execute(
+            sql + " ORDER BY tier, length(m.name), m.name LIMIT :limit OFFSET :offset",
+            {**params, "limit": limit, "offset": offset},
+        )
+    ]
+
+    # 오타 허용 (검색어 trigram 중 하나라도 포함하는 후보를 유사도로 정렬)
+    if fuzzy and use_index:
+        query_grams = _trigrams(query)
+        candidates = conn.execute(
+            """
+            SELECT m.name FROM menus_fts
+            JOIN menus m ON m.rowid = menus_fts.rowid
+            WHERE menus_fts MATCH ? ORDER BY rank LIMIT ?
+        """,
+            (
+                " OR ".join('"' + g.replace('"', '""') + '"' for g in query_grams),
+                SEARCH_FUZZY_CANDIDATES,
+            ),
+        ).fetchall()
+        scored = []
+        for (name,) in candidates:
+            if query in name.lower():
+                continue  # 부분 문자열 일치 결과에 이미 포함
+            name_grams = _trigrams(name.lower())
+            similarity = (
+                2 * len(query_grams & name_grams) / (len(query_grams) + len(name_grams))
+            )
+            if similarity >= SEARCH_FUZZY_MIN_SIMILARITY:
+                scored.append((-similarity, len(name), name))
+        fuzzy_names = [name for _, _, name in sorted(scored)]
+        fuzzy_offset = max(offset - total, 0)
+        page += fuzzy_names[fuzzy_offset : fuzzy_offset + limit - len(page)]
+        total += len(fuzzy_names)
+
+    if not page:
+        return pd.DataFrame(columns=columns), total
+    placeholders = ",".join("?" * len(page))
+    page_df = pd.read_sql_query(
+        f"SELECT * FROM menus WHERE name IN ({placeholders})", conn, params=page
+    )
+    order = {name: i for i, name in enumerate(page)}
+    page_df = page_df.sort_values("name", key=lambda col: col.map(order))
+    return page_df.reset_index(drop=True), total
+
+
+def delete_menu(menu_name: str):
+    """
+    특정 메뉴 삭제
+
+    Args:
+        menu_name (str): 삭제할 메뉴 이름
+    """
+    with db_transaction() as conn:
+        conn.execute("DELETE FROM menus WHERE name = ?", (menu_name,))
+
+
+def _menu_ngrams(menu_name: str) -> Dict[str, int]:
+    """
+    정규화한 메뉴 이름을 한글 자모로 분해한 뒤 만든 n-gram 빈도
+    """
+    jamo = unicodedata.normalize("NFD", normalize_menu_name(menu_name))
+    grams: Dict[str, int] = {}
+    for n in MENU_SIMILARITY_NGRAMS:
+        for i in range(len(jamo) - n + 1):
+            gram = jamo[i : i + n]
+            grams[gram] = grams.get(gram, 0) + 1
+    if not grams and jamo:
+        grams[jamo] = 1
+    return grams
+
+
+def _guess_menu_category(menu_name: str) -> Optional[str]:
+    """
+    메뉴 이름 끝 글자로 알 수 있는 카테고리 ("국/수프", "밥", 모르면 None)
+    """
+    normalized = normalize_menu_name(menu_name)
+    if normalized.endswith(MENU_SOUP_SUFFIXES):
+        return "국/수프"
+    if normalized.endswith(MENU_RICE_SUFFIXES):
+        return "밥"
+    return None
+
+
+def _menu_numbers(menu_name: str) -> List[str]:
+    """
+    메뉴 이름에 들어 있는 숫자 목록 (숫자만 다른 메뉴는 서로 다른 메뉴로 봄)
+    """
+    return re.findall(r"\d+", str(menu_name))
+
+
+class MenuSimilarityIndex:
+    """
+    메뉴 이름 유사도 검색용 역색인 (자모 n-gram 빈도 벡터의 코사인 유사도)
+
+    n-gram마다 (행 번호, 빈도) 목록을 두고, 질의 n-gram의 목록만 모아 내적을
+    계산하므로 비용은 카탈로그 크기가 아니라 n-gram을 공유하는 메뉴 수에 비례합니다.
+    메뉴가 추가/삭제되면 전체를 다시 만들지 않고 add/remove로 바뀐 메뉴만 반영하며,
+    삭제된 행이 절반을 넘으면 색인을 압축합니다.
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.names: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.norms: List[float] = []
+        self.postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        # 질의에 쓴 목록의 배열 변환 결과 (목록이 바뀌면 버림)
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._norms = np.zeros(0)
+        self.source: Optional[List[str]] = None  # 마지막으로 동기화한 카탈로그 이름 목록
+        self._removed = 0
+        self._lock = threading.Lock()
+        for name in names:
+            self._add(name)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _add(self, name: str):
+        if name in self.rows:
+            return
+        row = len(self.names)
+        grams = _menu_ngrams(name)
+        self.names.append(name)
+        self.rows[name] = row
+        self.norms.append(math.sqrt(sum(tf * tf for tf in grams.values())))
+        for gram, tf in grams.items():
+            rows, tfs = self.postings.setdefault(gram, ([], []))
+            rows.append(row)
+            tfs.append(tf)
+            self._arrays.pop(gram, None)
+
+    def _posting(self, gram: str) -> Tuple[np.ndarray, np.ndarray]:
+        arrays = self._arrays.get(gram)
+        if arrays is None:
+            rows, tfs = self.postings[gram]
+            arrays = (np.array(rows, dtype=np.int64), np.array(tfs, dtype=np.float64))
+            self._arrays[gram] = arrays
+        return arrays
+
+    def _compact(self):
+        """
+        삭제된 행을 빼고 살아 있는 메뉴만으로 색인 재구성
+        """
+        names = list(self.rows)
+        self.names, self.rows, self.norms, self.postings = [], {}, [], {}
+        self._arrays, self._norms = {}, np.zeros(0)
+        self._removed = 0
+        for name in names:
+            self._add(name)
+
+    def sync(self, names: List[str]):
+        """
+        카탈로그 메뉴 이름 목록과 같아지도록 바뀐 메뉴만 추가/삭제
+
+        Args:
+            names (List[str]): 카탈로그의 현재 메뉴 이름 목록
+        """
+        with self._lock:
+            if names is self.source:
+                return
+            current = set(names)
+            for name in [name for name in self.rows if name not in current]:
+                del self.rows[name]
+                self._removed += 1
+            for name in names:
+                self._add(name)
+            if self._removed > len(self.rows):
+                self._compact()
+            self.source = names
+
+    def similar(
+        self, menu_name: str, threshold: float = 0.0, limit: int = 5
+    ) -> List[Tuple[str, float]]:
+        """
+        유사도가 threshold 이상인 메뉴를 유사도 순으로 반환
+
+        Args:
+            menu_name (str): 찾을 메뉴 이름
+            threshold (float): 최소 코사인 유사도
+            limit (int): 최대 결과 수
+
+        Returns:
+            List[Tuple[str, float]]: (메뉴 이름, 유사도) 목록
+        """
+        grams = _menu_ngrams(menu_name)
+        with self._lock:
+            hits = [
+                (self._posting(g), tf) for g, tf in grams.items() if g in self.postings
+            ]
+            if not hits:
+                return []
+            rows = np.concatenate([posting[0] for posting, _ in hits])
+            weights = np.concatenate([posting[1] * tf for posting, tf in hits])
+            candidates, inverse = np.unique(rows, return_inverse=True)
+            dots = np.bincount(inverse, weights=weights)
+            if len(self._norms) != len(self.norms):
+                self._norms = np.array(self.norms)
+            query_norm = math.sqrt(sum(tf * tf for tf in grams.values()))
+            scores = dots / (self._norms[candidates] * query_norm)
+            order = np.argsort(-scores, kind="stable")
+            results = []
+            for i in order:
+                if scores[i] < threshold or len(results) >= limit:
+                    break
+                name = self.names[candidates[i]]
+                # 삭제된 행은 같은 이름이 다시 추가되었더라도 현재 행이 아니면 제외
+                if self.rows.get(name) == candidates[i]:
+                    results.append((name, float(scores[i])))
+            return results
+
+
+_similarity_index: Optional[MenuSimilarityIndex] = None
+_similarity_index_lock = threading.Lock()
+
+
+def get_menu_similarity_index() -> MenuSimilarityIndex:
+    """
+    공유 카탈로그의 메뉴 유사도 색인 반환
+
+    카탈로그가 다시 로드된 경우 처음 한 번만 전체를 만들고, 이후에는 추가/삭제된
+    메뉴만 색인에 반영합니다.
+    """
+    global _similarity_index
+    catalog = get_menu_catalog()
+    with _similarity_index_lock:
+        if _similarity_index is None:
+            _similarity_index = MenuSimilarityIndex()
+        index = _similarity_index
+    index.sync(catalog.names)
+    return index
+
+
+def find_similar_menu(
+    menu_name: str, threshold: Optional[float] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    DB에서 이름이 가장 비슷한 메뉴 찾기
+
+    기본 threshold(MENU_SIMILARITY_THRESHOLD)는 띄어쓰기/구두점만 다르거나 그에
+    가까운 이름만 찾도록 높게 잡혀 있습니다.
+
+    이름 끝 글자로 국/수프나 밥임을 알 수 있는 메뉴는 같은 카테고리 메뉴만,
+    그렇지 않은 메뉴는 국/수프·밥이 아닌 메뉴만 후보로 봅니다
+    (예: 콩나물국과 콩나물무침, 잡채와 잡채밥은 서로 찾지 않음). 이름 속 숫자가
+    다른 메뉴도 후보에서 제외합니다.
+
+    Args:
+        menu_name (str): 찾을 메뉴 이름
+        threshold (Optional[float]): 최소 유사도 (기본값 MENU_SIMILARITY_THRESHOLD)
+
+    Returns:
+        Optional[Dict[str, Any]]: 찾은 메뉴 정보 + similarity (없으면 None)
+    """
+    if threshold is None:
+        threshold = MENU_SIMILARITY_THRESHOLD
+    catalog = get_menu_catalog()
+    index = get_menu_similarity_index()
+    guess = _guess_menu_category(menu_name)
+    numbers = _menu_numbers(menu_name)
+    for name, similarity in index.similar(menu_name, threshold):
+        info = catalog.get(name)
+        if info is None or _menu_numbers(name) != numbers:
+            continue
+        category = info["category"]
+        if category == guess or (guess is None and category not in ("국/수프", "밥")):
+            info["similarity"] = similarity
+            return info
+    return None
+
+
+def _reuse_similar_menu(menu_name: str) -> Optional[Dict[str, Any]]:
+    """
+    비슷한 메뉴가 있으면 그 카테고리와 영양 정보를 menu_name으로 복사하여 반환
+    """
+    match = find_similar_menu(menu_name)
+    if match is None:
+        return None
+    _metrics.inc("meal_classify_similar_reuse_total")
+    del match["similarity"]
+    match["name"] = menu_name
+    return match
+
+
+def find_duplicate_menus(threshold: Optional[float] = None) -> pd.DataFrame:
+    """
+    같은 카테고리 안에서 이름이 비슷한 메뉴 묶음 찾기
+
+    제공 횟수가 많은 메뉴(같으면 이름이 짧은 메뉴)를 남길 메뉴로 정하고, 아직 묶이지
+    않은 비슷한 메뉴를 그 중복으로 묶습니다.
+
+    찾은 묶음은 합칠 후보일 뿐이며, 실제로 합칠 쌍은 사용자가 골라 merge_menus로
+    합칩니다.
+
+    Args:
+        threshold (Optional[float]): 최소 유사도 (기본값 MENU_MERGE_THRESHOLD)
+
+    Returns:
+        pd.DataFrame: name(중복 메뉴), keep(남길 메뉴), similarity
+    """
+    if threshold is None:
+        threshold = MENU_MERGE_THRESHOLD
+    catalog = get_menu_catalog()
+    index = get_menu_similarity_index()
+    serve_counts = dict(
+        get_db_connection().execute("SELECT menu, serve_count FROM menu_usage")
+    )
+    order = sorted(
+        range(len(catalog.names)),
+        key=lambda row: (
+            -serve_counts.get(catalog.names[row], 0),
+            len(catalog.names[row]),
+            catalog.names[row],
+        ),
+    )
+    assigned = set()
+    duplicates = []
+    for row in order:
+        if row in assigned:
+            continue
+        assigned.add(row)
+        keep = catalog.names[row]
+        numbers = _menu_numbers(keep)
+        for name, similarity in index.similar(keep, threshold, limit=len(index)):
+            other = catalog.index.get(name)
+            if (
+                other is None
+                or other in assigned
+                or catalog.categories[other] != catalog.categories[row]
+                or _menu_numbers(name) != numbers
+            ):
+                continue
+            assigned.add(other)
+            duplicates.append({"name": name, "keep": keep, "similarity": similarity})
+    return pd.DataFrame(duplicates, columns=["name", "keep", "similarity"])
+
+
+def merge_menus(keep: str, duplicates: Iterable[str]) -> int:
+    """
+    중복 메뉴를 keep 하나로 합치기
+
+    식단 이력의 중복 메뉴를 keep으로 바꾸고 제공 횟수/마지막 제공일을 keep에 더한 뒤
+    중복 메뉴를 메뉴 DB에서 삭제합니다. 카테고리가 keep과 다른 메뉴는 합치지 않습니다.
+
+    Args:
+        keep (str): 남길 메뉴 이름
+        duplicates (Iterable[str]): 합칠 메뉴 이름 목록
+
+    Returns:
+        int: 삭제된 메뉴 수
+    """
+    names = [name for name in dict.fromkeys(duplicates) if name != keep]
+    catalog = get_menu_catalog()
+    if keep not in catalog:
+        raise ValueError(f"메뉴 '{keep}'이(가) 없습니다.")
+    category = catalog.get(keep)["category"]
+    for name in names:
+        if name not in catalog:
+            raise ValueError(f"메뉴 '{name}'이(가) 없습니다.")
+        if catalog.get(name)["category"] != category:
+            raise ValueError(
+                f"메뉴 '{name}'은(는) '{keep}'과(와) 카테고리가 달라 합칠 수 없습니다."
+            )
+    merged = 0
+    with db_transaction() as conn:
+        for name in names:
+            conn.execute(
+                """
+                UPDATE menu_usage SET
+                    serve_count = serve_count + coalesce(
+                        (SELECT serve_count FROM menu_usage WHERE menu = :name), 0
+                    ),
+                    last_served = max(
+                        coalesce(last_served, ''),
+                        coalesce(
+                            (SELECT last_served FROM menu_usage WHERE menu = :name), ''
+                        )
+                    ),
+                    last_active = max(
+                        last_active,
+                        coalesce(
+                            (SELECT last_active FROM menu_usage WHERE menu = :name), ''
+                        )
+                    )
+                WHERE menu = :keep
+            """,
+                {"name": name, "keep": keep},
+            )
+            conn.execute(
+                "UPDATE plan_items SET menu = ? WHERE menu = ?", (keep, name)
+            )
+            merged += conn.execute(
+                "DELETE FROM menus WHERE name = ?", (name,)
+            ).rowcount
+    return merged
+
+
+def _plan_objective(totals: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """
+    일별 영양소 합계의 목표 대비 상대 편차 제곱합 (마지막 축 기준)
+    """
+    return (((totals - target) / target) ** 2).sum(axis=-1)
+
+
+class _MenuPool:
+    """
+    카테고리별 메뉴 풀 (무작위 추출·제거 O(1))
+
+    사용한 메뉴는 재사용 대기열에 들어갔다가 반복 금지 기간이 지나면 풀로
+    돌아옵니다. 풀이 비면 대기열에서 가장 오래전에 사용한 메뉴를 꺼냅니다.
+    """
+
+    def __init__(self, rows: np.ndarray, rng: np.random.Generator):
+        self.available = rows.tolist()
+        self.cooldown = deque()
+        self.rng = rng
+
+    def pick(self, day: int, window: int) -> int:
+        """
+        day(일 단위 서수)에 사용할 메뉴 행 인덱스를 뽑고 day + window까지 대기열에 보관
+        """
+        cooldown, available = self.cooldown, self.available
+        while cooldown and cooldown[0][0] <= day:
+            available.append(cooldown.popleft()[1])
+        if available:
+            i = int(self.rng.integers(len(available)))
+            available[i], available[-1] = available[-1], available[i]
+            row = available.pop()
+        else:
+            row = cooldown.popleft()[1]
+        cooldown.append((day + window, row))
+        return row
+
+
+def _plan_dates(
+    days: int,
+    start_date: Optional[Any],
+    end_date: Optional[Any],
+    holidays: Optional[Iterable[Any]],
+    weekdays: Optional[Iterable[int]],
+) -> List[date]:
+    """
+    식단을 제공할 날짜 목록 계산 (휴일과 제공하지 않는 요일 제외)
+
+    end_date가 없으면 start_date부터 제공일 days일을 채웁니다.
+    """
+    start = pd.Timestamp(start_date).date()
+    serving_weekdays = set(range(5) if weekdays is None else weekdays)
+    if not serving_weekdays:
+        raise ValueError("식단을 제공할 요일이 없습니다.")
+    skip = {pd.Timestamp(holiday).date() for holiday in holidays or []}
+
+    dates = []
+    current = start
+    end = pd.Timestamp(end_date).date() if end_date is not None else None
+    while (current <= end) if end is not None else (len(dates) < days):
+        if current.weekday() in serving_weekdays and current not in skip:
+            dates.append(current)
+        current += timedelta(days=1)
+    return dates
+
+
+def _improve_plan(
+    assign: np.ndarray,
+    slot_categories: List[str],
+    pools: Dict[str, np.ndarray],
+    matrix: np.ndarray,
+    base: np.ndarray,
+    target: np.ndarray,
+    day_ordinals: np.ndarray,
+    window: int,
+    deadline: float,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """
+    지역 탐색으로 일별 영양소 편차를 줄임 (assign을 직접 수정)
+
+    편차가 큰 날의 슬롯을 골라, 반복 금지 기간(window일) 안에 쓰이지 않은 같은
+    카테고리 메뉴로 교체하거나 다른 날의 같은 카테고리 슬롯과 맞바꿉니다.
+    후보 평가는 영양소 행렬 연산으로 한 번에 처리하며, 개선이 멈추거나
+    deadline이 지나면 종료합니다.
+
+    Returns:
+        np.ndarray: 일별 목적 함수 값
+    """
+    n_days, n_slots = assign.shape
+    totals = base + matrix[assign].sum(axis=1)
+    day_scores = _plan_objective(totals, target)
+    if time.perf_counter() >= deadline:
+        return day_scores
+
+    # 메뉴별 사용 일자 표와 일자별 반복 금지 구간 [lo, hi)
+    occupied = np.zeros((len(matrix), n_days), dtype=np.int16)
+    np.add.at(occupied, (assign, np.arange(n_days)[:, None]), 1)
+    lo = np.searchsorted(day_ordinals, day_ordinals - window + 1)
+    hi = np.searchsorted(day_ordinals, day_ordinals + window)
+    same_category = [
+        np.array([j for j, c in enumerate(slot_categories) if c == category])
+        for category in slot_categories
+    ]
+
+    def can_move(row: int, from_day: int, to_day: int) -> bool:
+        used = occupied[row, lo[to_day] : hi[to_day]].sum()
+        return used - int(lo[to_day] <= from_day < hi[to_day]) == 0
+
+    stall, max_stall = 0, 20 * assign.size
+    while stall < max_stall and time.perf_counter() < deadline:
+        score_sum = day_scores.sum()
+        if score_sum <= 1e-12:
+            break
+        stall += 1
+        d = rng.choice(n_days, p=day_scores / score_sum)
+        k = int(rng.integers(n_slots))
+        current = assign[d, k]
+
+        if rng.random() < 0.7:
+            # 반복 금지 기간 안에 쓰이지 않은 같은 카테고리 메뉴로 교체
+            pool = pools[slot_categories[k]]
+            if len(pool) > PLAN_CANDIDATES:
+                pool = rng.choice(pool, PLAN_CANDIDATES, replace=False)
+            candidates = pool[occupied[pool, lo[d] : hi[d]].sum(axis=1) == 0]
+            if not len(candidates):
+                continue
+            scores = _plan_objective(
+                totals[d] - matrix[current] + matrix[candidates], target
+            )
+            best = int(np.argmin(scores))
+            if scores[best] >= day_scores[d] - 1e-12:
+                continue
+            new = candidates[best]
+            occupied[current, d] -= 1
+            occupied[new, d] += 1
+            assign[d, k] = new
+            totals[d] += matrix[new] - matrix[current]
+            day_scores[d] = scores[best]
+        else:
+            # 다른 날의 같은 카테고리 슬롯과 교환
+            slots = same_category[k]
+            delta = matrix[assign[:, slots]] - matrix[current]
+            new_d = _plan_objective(totals[d] + delta, target)
+            new_other = _plan_objective(totals[:, None, :] - delta, target)
+            gain = day_scores[d] + day_scores[:, None] - new_d - new_other
+            gain[d, :] = -np.inf
+            d2, j = np.unravel_index(int(np.argmax(gain)), gain.shape)
+            k2 = slots[j]
+            other = assign[d2, k2]
+            if (
+                gain[d2, j] <= 1e-12
+                or not can_move(current, d, d2)
+                or not can_move(other, d2, d)
+            ):
+                continue
+            assign[d, k], assign[d2, k2] = other, current
+            occupied[current, d] -= 1
+            occupied[current, d2] += 1
+            occupied[other, d2] -= 1
+            occupied[other, d] += 1
+            totals[d] += matrix[other] - matrix[current]
+            totals[d2] += matrix[current] - matrix[other]
+            day_scores[d] = new_d[d2, j]
+            day_scores[d2] = new_other[d2, j]
+        stall = 0
+
+    return day_scores
+
+
+@_timed_stage("plan")
+def plan_menus(
+    meal_type: str = "점심",
+    days: int = 5,
+    start_date: Optional[Any] = None,
+    end_date: Optional[Any] = None,
+    holidays: Optional[Iterable[Any]] = None,
+    weekdays: Optional[Iterable[int]] = None,
+    repeat_window: Optional[int] = None,
+    targets: Optional[Dict[str, float]] = None,
+    time_budget: Optional[float] = None,
+    seed: Optional[int] = None,
+    catalog: Optional[MenuCatalog] = None,
+) -> Tuple[pd.DataFrame, float]:
+    """
+    영양 목표를 고려하여 모든 슬롯을 한 번에 채운 식단 계획 생성
+
+    날짜를 지정하지 않으면 days일(최대 7일)의 요일별 주간 식단을, start_date를
+    지정하거나 days가 7일을 넘으면 실제 날짜 기준 식단(휴일 제외, 시작일 기본값
+    오늘)을 만듭니다. 카테고리별 슬롯
+    (국/수프, 메인, 사이드 2개)은 반복 금지 기간 안에 같은 메뉴가 다시 나오지 않도록
+    채우고(메뉴가 부족하면 가장 오래전에 쓴 메뉴 재사용), 주어진 시간 안에서
+    일별 영양소 합계가 목표에 가까워지도록 메뉴를 교체·교환합니다.
+
+    Args:
+        meal_type (str): 식사 유형 ("점심" 또는 "점심저녁")
+        days (int): 계획할 제공 일수 (end_date가 있으면 무시)
+        start_date (Optional[Any]): 시작 날짜 (date 또는 "YYYY-MM-DD")
+        end_date (Optional[Any]): 종료 날짜 (포함)
+        holidays (Optional[Iterable[Any]]): 제외할 휴일 목록
+        weekdays (Optional[Iterable[int]]): 제공 요일 (0=월 ~ 6=일, 기본값 월~금)
+        repeat_window (Optional[int]): 같은 메뉴 반복 금지 기간(일, 기본값 계획 전체)
+        targets (Optional[Dict[str, float]]): 일일 목표 영양소 (기본값 TARGET_NUTRITION)
+        time_budget (Optional[float]): 최적화 시간 한도(초, 기본값 PLAN_TIME_BUDGET,
+            0이면 최적화 없이 배정만 수행)
+        seed (Optional[int]): 난수 시드
+        catalog (Optional[MenuCatalog]): 사용할 메뉴 카탈로그 (기본값 공유 카탈로그)
+
+    Returns:
+        Tuple[pd.DataFrame, float]: 식단 계획, 목적 함수 값
+            (일별 목표 대비 상대 편차 제곱합의 평균, 낮을수록 균형적)
+    """
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    if time_budget is None:
+        time_budget = PLAN_TIME_BUDGET
+    targets = targets or TARGET_NUTRITION
+    target = np.array(
+        [targets[NUTRIENT_LABELS[field]] for field in NUTRIENT_FIELDS], dtype=np.float64
+    )
+
+    # 메뉴 카탈로그 가져오기
+    catalog = catalog or get_menu_catalog()
+    matrix = catalog.matrix.astype(np.float64)
+
+    # 제공일 목록 생성
+    if start_date is None and end_date is None and days <= 7:
+        # 요일별 주간 식단 (7일을 넘으면 아래에서 오늘부터 날짜 기준으로 생성)
+        dates = None
+        day_labels = WEEKDAY_NAMES[:days]
+        day_ordinals = np.arange(len(day_labels))
+    else:
+        dates = _plan_dates(
+            days, start_date or date.today(), end_date, holidays, weekdays
+        )
+        day_labels = [WEEKDAY_NAMES[d.weekday()] for d in dates]
+        day_ordinals = np.array([d.toordinal() for d in dates], dtype=np.int64)
+    n_days = len(day_labels)
+    span = int(day_ordinals[-1] - day_ordinals[0]) + 1 if n_days else 1
+    window = max(1, min(repeat_window or span, span))
+
+    # 식사별 슬롯 구성
+    meals = ["점심", "저녁"] if meal_type == "점심저녁" else ["점심"]
+    rice_columns, slot_columns, slot_categories = [], [], []
+    for meal in meals:
+        prefix = "저녁_" if meal == "저녁" else ""
+        rice_columns.append(f"{prefix}잡곡밥")
+        for column, category in PLAN_SLOTS:
+            slot_columns.append(f"{prefix}{column}")
+            slot_categories.append(category)
+
+    # 잡곡밥은 항상 포함
+    rice = catalog.index.get(PLAN_RICE)
+    base = (
+        matrix[rice] * len(meals)
+        if rice is not None
+        else np.zeros(len(NUTRIENT_FIELDS))
+    )
+
+    # 카테고리별 메뉴 풀에서 날짜 순으로 배정 (반복 금지 기간 적용)
+    pools, menu_pools = {}, {}
+    for category in dict.fromkeys(slot_categories):
+        pool = catalog.rows_in_category(category)
+        if not len(pool):
+            raise ValueError(f"'{category}' 카테고리 메뉴가 없습니다.")
+        pools[category] = pool
+        menu_pools[category] = _MenuPool(pool, rng)
+    slot_pools = [menu_pools[category] for category in slot_categories]
+    assign = np.empty((n_days, len(slot_columns)), dtype=np.int64)
+    for d, ordinal in enumerate(day_ordinals.tolist()):
+        for k, menu_pool in enumerate(slot_pools):
+            assign[d, k] = menu_pool.pick(ordinal, window)
+
+    # 영양 균형 최적화
+    day_scores = _improve_plan(
+        assign,
+        slot_categories,
+        pools,
+        matrix,
+        base,
+        target,
+        day_ordinals,
+        window,
+        started + time_budget,
+        rng,
+    )
+
+    # 식단 계획 데이터 구성
+    names = np.array(catalog.names, dtype=object)
+    plan_df = pd.DataFrame({"요일": day_labels})
+    if dates is not None:
+        plan_df.insert(0, "날짜", [d.isoformat() for d in dates])
+    for meal, rice_column in zip(meals, rice_columns):
+        plan_df[rice_column] = PLAN_RICE
+        for k, column in enumerate(slot_columns):
+            if column.startswith("저녁_") == (meal == "저녁"):
+                plan_df[column] = names[assign[:, k]]
+
+    return plan_df, float(day_scores.mean()) if n_days else 0.0
+
+
+def make_plan(
+    meal_type: str = "점심",
+    days: int = 5,
+    start_date: Optional[Any] = None,
+    end_date: Optional[Any] = None,
+    holidays: Optional[Iterable[Any]] = None,
+    repeat_window: Optional[int] = None,
+    site: Optional[str] = None,
+    **options: Any,
+) -> pd.DataFrame:
+    """
+    식단 계획 생성 (site를 지정하면 식단 이력에 저장)
+
+    Args:
+        meal_type (str): 식사 유형 ("점심" 또는 "점심저녁")
+        days (int): 계획할 일수 (날짜 미지정 시 7일 이하는 요일별, 넘으면 오늘부터)
+        start_date (Optional[Any]): 시작 날짜 (지정하면 실제 날짜 기준 식단 생성)
+        end_date (Optional[Any]): 종료 날짜 (포함)
+        holidays (Optional[Iterable[Any]]): 제외할 휴일 목록
+        repeat_window (Optional[int]): 같은 메뉴 반복 금지 기간(일)
+        site (Optional[str]): 식단 이력에 저장할 사업장 이름 (None이면 저장하지 않음)
+        **options: plan_menus의 나머지 옵션 (weekdays, targets, time_budget, seed)
+
+    Returns:
+        pd.DataFrame: 생성된 식단 계획
+    """
+    plan_df = plan_menus(
+        meal_type=meal_type,
+        days=days,
+        start_date=start_date,
+        end_date=end_date,
+        holidays=holidays,
+        repeat_window=repeat_window,
+        **options,
+    )[0]
+    if site is not None:
+        save_plan(plan_df, site)
+    return plan_df
+
+
+def _init_site_worker(catalog: MenuCatalog, db_path: str):
+    """
+    plan_sites 작업 프로세스 초기화 (부모 프로세스의 카탈로그와 DB 경로 공유)
+
+    fork로 시작하면 부모 스레드의 연결이 그대로 보이는데, SQLite 연결은 fork 이후
+    사용할 수 없으므로 닫지 않고 버린 뒤 이 프로세스의 연결을 새로 엽니다.
+    """
+    global _menu_catalog
+    inherited = getattr(_db_local, "conn", None)
+    if inherited is not None:
+        _inherited_db_connections.append(inherited)
+    _db_local.__dict__.clear()
+    set_db_path(db_path)
+    _menu_catalog = catalog
+
+
+def _plan_site(spec: Dict[str, Any], export: bool) -> Dict[str, Any]:
+    """
+    사업장 하나의 식단을 생성하고 (선택적으로) Excel로 내보냄
+    """
+    started = time.perf_counter()
+    plan_df, score = plan_menus(
+        meal_type=spec.get("meal_type", "점심"),
+        days=spec.get("days", 5),
+        start_date=spec.get("start_date"),
+        end_date=spec.get("end_date"),
+        holidays=spec.get("holidays"),
+        weekdays=spec.get("weekdays"),
+        repeat_window=spec.get("repeat_window"),
+        targets=spec.get("targets"),
+        time_budget=spec.get("time_budget"),
+        seed=spec["seed"],
+        catalog=_menu_catalog,
+    )
+    filepath = export_plan(plan_df, f"식단_계획_{spec['site']}") if export else ""
+    return {
+        "site": spec["site"],
+        "headcount": spec.get("headcount"),
+        "meal_type": spec.get("meal_type", "점심"),
+        "seed": spec["seed"],
+        "plan": plan_df,
+        "score": score,
+        "filepath": filepath,
+        "elapsed": time.perf_counter() - started,
+    }
+
+
+def plan_sites(
+    site_specs: List[Dict[str, Any]],
+    max_workers: Optional[int] = None,
+    export: bool = True,
+    seed: int = 0,
+    save: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    여러 사업장의 식단을 프로세스 풀에서 병렬로 생성
+
+    메뉴 카탈로그는 부모 프로세스에서 한 번만 읽어 작업 프로세스에 전달합니다.
+    사업장별 시드를 지정하지 않으면 seed와 사업장 이름으로 고정 시드를 만들어
+    같은 입력이면 같은 식단이 생성됩니다 (time_budget=0일 때 완전히 재현됨).
+    export가 True면 사업장별 식단 파일과 전체 요약 파일
+    (exports/식단_계획_요약_*.xlsx)을 함께 저장하고, save가 True면 모든 사업장의
+    식단을 하나의 트랜잭션으로 식단 이력에 기록합니다.
+
+    Args:
+        site_specs (List[Dict[str, Any]]): 사업장 설정 목록
+            (site 필수, meal_type, days, start_date, end_date, holidays, weekdays,
+            repeat_window, targets, time_budget, headcount, seed 선택)
+        max_workers (Optional[int]): 작업 프로세스 수 (기본값 CPU 수)
+        export (bool): Excel 파일 저장 여부
+        seed (int): 사업장별 시드를 만들 기본 시드
+        save (bool): 식단 이력 저장 여부
+
+    Returns:
+        List[Dict[str, Any]]: 사업장별 결과 (site, headcount, meal_type, seed, plan,
+            score, filepath, elapsed, save가 True면 plan_id), 입력 순서 유지
+    """
+    specs = []
+    for spec in site_specs:
+        if not spec.get("site"):
+            raise ValueError("사업장 설정에 'site'가 필요합니다.")
+        spec = dict(spec)
+        if spec.get("seed") is None:
+            spec["seed"] = zlib.crc32(f"{seed}:{spec['site']}".encode("utf-8"))
+        specs.append(spec)
+    if not specs:
+        return []
+
+    catalog = get_menu_catalog()
+    max_workers = min(max_workers or os.cpu_count() or 1, len(specs))
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_site_worker,
+        initargs=(catalog, DB_PATH),
+    ) as pool:
+        results = list(pool.map(_plan_site, specs, [export] * len(specs)))
+
+    if save:
+        with db_transaction():
+            for result in results:
+                result["plan_id"] = save_plan(result["plan"], result["site"])
+
+    if export:
+        summary_path = _export_path("식단_계획_요약")
+        summary = pd.DataFrame(
+            [
+                {
+                    "사업장": result["site"],
+                    "식수 인원": result["headcount"],
+                    "식사 유형": result["meal_type"],
+                    "제공일 수": len(result["plan"]),
+                    "시드": result["seed"],
+                    "영양 목표 편차 점수": round(result["score"], 4),
+                    "파일": result["filepath"],
+                }
+                for result in results
+            ]
+        )
+        summary.to_excel(summary_path, sheet_name="요약", index=False)
+        _prune_exports(keep=summary_path)
+        for result in results:
+            result["summary_path"] = summary_path
+
+    return results
+
+
+def _day_column(plan_df: pd.DataFrame) -> str:
+    """
+    식단 계획에서 하루를 구분하는 컬럼 이름 반환 (날짜가 있으면 "날짜")
+    """
+    return "날짜" if "날짜" in plan_df.columns else "요일"
+
+
+def _write_sheet(workbook, sheet_name: str, df: pd.DataFrame, header_format):
+    """
+    데이터프레임을 행 순서대로 워크시트에 기록 (constant_memory 모드 호환)
+
+    Args:
+        workbook: xlsxwriter 워크북
+        sheet_name (str): 시트 이름
+        df (pd.DataFrame): 기록할 데이터 (인덱스 포함)
+        header_format: 헤더/인덱스 셀 서식
+    """
+    worksheet = workbook.add_worksheet(sheet_name)
+    columns = df.columns
+    levels = columns.nlevels
+
+    # 열 헤더 (다중 열은 단계별로 한 행씩, 같은 값이 이어지면 첫 칸만 표시)
+    for level in range(levels):
+        labels = columns.get_level_values(level)
+        if level == levels - 1 and levels == 1:
+            worksheet.write(0, 0, df.index.name or "", header_format)
+        else:
+            worksheet.write(level, 0, columns.names[level] or "", header_format)
+        previous = None
+        for col_idx, label in enumerate(labels, start=1):
+            if level < levels - 1 and label == previous:
+                continue
+            worksheet.write(level, col_idx, label, header_format)
+            previous = label
+
+    # 다중 열 헤더 아래에는 인덱스 이름 행 추가 (pandas와 동일한 배치)
+    row = levels
+    if levels > 1:
+        worksheet.write(row, 0, df.index.name or "", header_format)
+        row += 1
+
+    for label, values in zip(df.index, df.itertuples(index=False, name=None)):
+        worksheet.write(row, 0, label, header_format)
+        for col_idx, value in enumerate(values, start=1):
+            if not pd.isna(value):
+                worksheet.write(row, col_idx, value)
+        row += 1
+
+
+def _prune_exports(keep: Optional[str] = None):
+    """
+    보관 정책에 따라 오래된 내보내기 파일 삭제
+
+    EXPORT_MAX_AGE_DAYS보다 오래된 파일과 최근 EXPORT_MAX_FILES개를 넘는 파일을
+    삭제합니다.
+
+    Args:
+        keep (Optional[str]): 삭제하지 않을 파일 경로 (방금 저장한 파일)
+    """
+    try:
+        entries = [
+            entry
+            for entry in os.scandir(EXPORT_DIR)
+            if entry.is_file() and entry.name.endswith(".xlsx")
+        ]
+    except FileNotFoundError:
+        return
+
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    cutoff = time.time() - EXPORT_MAX_AGE_DAYS * 86400
+    for rank, entry in enumerate(entries):
+        if keep and os.path.abspath(entry.path) == os.path.abspath(keep):
+            continue
+        if rank >= EXPORT_MAX_FILES or entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def _export_path(filename: str) -> str:
+    """
+    내보내기 파일 경로 생성 (exports 디렉토리, 타임스탬프 포함)
+    """
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    return os.path.join(
+        EXPORT_DIR, f"{filename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    )
+
+
+@_timed_stage("export")
+def export_plan(
+    plan_df: pd.DataFrame, filename: str = "식단_계획", to_disk: bool = True
+) -> Union[str, bytes]:
+    """
+    식단 계획을 Excel 파일로 내보내기
+
+    to_disk가 False면 파일을 만들지 않고 메모리(BytesIO)에 작성한 Excel 내용을
+    바로 반환합니다. 디스크에 저장한 경우 보관 정책(EXPORT_MAX_FILES,
+    EXPORT_MAX_AGE_DAYS)에 따라 오래된 파일을 정리합니다. 긴 식단은 xlsxwriter의
+    constant_memory 모드로 작성합니다.
+
+    Args:
+        plan_df (pd.DataFrame): 식단 계획 데이터
+        filename (str): 저장할 파일 이름
+        to_disk (bool): 디스크 저장 여부
+
+    Returns:
+        Union[str, bytes]: 저장된 파일 경로 (to_disk=False면 Excel 파일 내용)
+    """
+    day_column = _day_column(plan_df)
+    sheets = []
+
+    # 점심 시트
+    lunch_df = plan_df[[day_column] + LUNCH_COLUMNS]
+    sheets.append(("점심", lunch_df.set_index(day_column).T))  # 요일(날짜)을 열로 변경
+
+    # 저녁 시트 (있는 경우)
+    if "저녁_잡곡밥" in plan_df.columns:
+        dinner_df = plan_df[[day_column] + DINNER_COLUMNS]
+        sheets.append(("저녁", dinner_df.set_index(day_column).T))
+
+    # 영양 정보 분석 (영양소 컬럼명은 한국어)
+    nutrition_df = analyze_menu_plan(plan_df)
+    nutrients = list(NUTRIENT_LABELS.values())
+
+    # 영양 정보 피벗 테이블
+    nutrition_pivot = nutrition_df.pivot_table(
+        index="구분",
+        columns=day_column,
+        values=nutrients,
+        aggfunc="sum",
+    )
+    sheets.append(("영양 정보", nutrition_pivot))
+
+    # 일일 영양소 합계
+    daily_nutrition = nutrition_df.groupby(day_column)[nutrients].sum()
+    sheets.append(("일일 영양소 합계", daily_nutrition.T))
+
+    filepath = _export_path(filename) if to_disk else None
+    output = filepath or io.BytesIO()
+    workbook = xlsxwriter.Workbook(
+        output,
+        {"constant_memory": len(plan_df) > EXPORT_CONSTANT_MEMORY_DAYS},
+    )
+    header_format = workbook.add_format({"bold": True, "border": 1})
+    for sheet_name, sheet_df in sheets:
+        _write_sheet(workbook, sheet_name, sheet_df, header_format)
+    workbook.close()
+
+    if filepath is None:
+        return output.getvalue()
+    _prune_exports(keep=filepath)
+    return filepath
+
+
+def _plan_long_form(plan_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    식단표를 (날짜/요일, 구분, 메뉴) 형태의 긴 표로 변환 (빈 칸 제외)
+    """
+    meals = [("점심", LUNCH_COLUMNS)]
+    if "저녁_잡곡밥" in plan_df.columns:
+        meals.append(("저녁", DINNER_COLUMNS))
+
+    # 제공일 → 슬롯 순서
+    id_columns = [col for col in PLAN_ID_COLUMNS if col in plan_df.columns]
+    ids = {col: [] for col in id_columns}
+    labels, menus = [], []
+    for meal, columns in meals:
+        columns = [col for col in columns if col in plan_df.columns]
+        for col in id_columns:
+            ids[col].append(
+                np.repeat(plan_df[col].to_numpy(dtype=object), len(columns))
+            )
+        labels.append(
+            np.tile(
+                np.array([f"{meal}_{col}" for col in columns], dtype=object),
+                len(plan_df),
+            )
+        )
+        menus.append(plan_df[columns].to_numpy(dtype=object).ravel())
+    long_df = pd.DataFrame(
+        {
+            **{col: np.concatenate(values) for col, values in ids.items()},
+            "구분": np.concatenate(labels),
+            "메뉴": np.concatenate(menus),
+        }
+    )
+    # 빈 칸(NaN, 빈 문자열)은 제외
+    return long_df[
+        long_df["메뉴"].notna() & (long_df["메뉴"].astype(str).str.strip() != "")
+    ].reset_index(drop=True)
+
+
+@_timed_stage("analyze")
+def analyze_menu_plan(
+    plan_df: pd.DataFrame,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+) -> pd.DataFrame:
+    """
+    식단 계획의 영양 정보 분석
+
+    Args:
+        plan_df (pd.DataFrame): 식단 계획 데이터
+        progress_callback (Optional[Callable[[int, int], None]]):
+            DB에 없는 메뉴 분류 진행 상황 콜백 (완료된 메뉴 수, 전체 메뉴 수)
+
+    Returns:
+        pd.DataFrame: 영양 정보 분석 결과
+    """
+    # 식단표를 (요일, 구분, 메뉴) 형태의 긴 표로 변환
+    long_df = _plan_long_form(plan_df)
+
+    # DB에 없는 메뉴는 한 번에 분류하여 추가
+    catalog = get_menu_catalog()
+    rows = catalog.rows(long_df["메뉴"])
+    unknown_menus = pd.unique(long_df["메뉴"].to_numpy()[rows < 0]).tolist()
+    if unknown_menus:
+        classified = classify_menus(unknown_menus, progress_callback=progress_callback)
+        add_menus(classified.values())
+        catalog = get_menu_catalog()
+        rows = catalog.rows(long_df["메뉴"])
+
+    # 영양소 행렬과 한 번에 결합
+    nutrients = np.full((len(rows), len(NUTRIENT_FIELDS)), np.nan)
+    found = rows >= 0
+    nutrients[found] = catalog.matrix[rows[found]]
+    nutrition_df = pd.DataFrame(
+        nutrients, columns=[NUTRIENT_LABELS[field] for field in NUTRIENT_FIELDS]
+    )
+    return pd.concat([long_df, nutrition_df], axis=1)
+
+
+def _board_sheet_to_plan(df: pd.DataFrame) -> Tuple[pd.DataFrame, str]:
+    """
+    메뉴판 시트 하나를 세로형(행=제공일) 표로 변환
+
+    Args:
+        df (pd.DataFrame): 시트 원본 데이터
+
+    Returns:
+        Tuple[pd.DataFrame, str]: 세로형 데이터, 감지된 형식 ("세로형" 또는 "가로형")
+    """
+    df = df.dropna(how="all").dropna(axis=1, how="all")
+    if any(col in df.columns for col in PLAN_ID_COLUMNS):
+        return df, "세로형"
+
+    # 가로형: 첫 열이 메뉴 구분, 나머지 열 제목이 요일 또는 날짜
+    df = df.set_index(df.columns[0]).T
+    df.index = df.index.map(
+        lambda label: (
+            label.date().isoformat() if isinstance(label, datetime) else str(label)
+        )
+    )
+    is_weekday = df.index.isin(WEEKDAY_NAMES)
+    df.index.name = "요일" if is_weekday.mean() >= 0.5 else "날짜"
+    df.columns = df.columns.map(str)
+    df.columns.name = None
+    return df.reset_index(), "가로형"
+
+
+@_timed_stage("ingest")
+def ingest_menu_board(file) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    '점심'/'저녁' 시트로 된 메뉴판 엑셀 파일을 식단 계획 형식으로 변환
+
+    통합 문서는 한 번만 읽고, 시트마다 가로형(열=요일/날짜)과 세로형(행=요일/날짜)
+    형식을 자동으로 감지합니다. 저녁 시트의 메뉴 컬럼은 '저녁_' 접두어를 붙인 뒤
+    제공일 기준으로 점심과 병합하며, 같은 제공일이 여러 번 나오면 비어 있지 않은
+    첫 값을 사용합니다. export_plan으로 내보낸 파일도 그대로 읽을 수 있습니다.
+
+    Args:
+        file: 엑셀 파일 경로 또는 파일 객체 (Streamlit 업로드 파일 포함)
+
+    Returns:
+        Tuple[pd.DataFrame, Dict[str, Any]]:
+            식단 계획 (날짜/요일 + 점심/저녁 메뉴 컬럼, 빈 칸은 ""),
+            진단 정보 (sheets, layouts, rows, dropped_rows, duplicate_days,
+            missing_columns, warnings, elapsed)
+    """
+    started = time.perf_counter()
+    diagnostics = {
+        "sheets": [],
+        "layouts": {},
+        "rows": {},
+        "dropped_rows": {},
+        "duplicate_days": {},
+        "missing_columns": [],
+        "warnings": [],
+    }
+
+    with pd.ExcelFile(file) as excel_file:
+        meal_sheets = [
+            name for name in ["점심", "저녁"] if name in excel_file.sheet_names
+        ]
+        if not meal_sheets:
+            raise ValueError("'점심' 또는 '저녁' 시트가 필요합니다.")
+        raw_sheets = excel_file.parse(sheet_name=meal_sheets)
+
+    frames = []
+    for sheet_name in meal_sheets:
+        df, layout = _board_sheet_to_plan(raw_sheets[sheet_name])
+        diagnostics["layouts"][sheet_name] = layout
+        sheet_rows = len(df)
+        key = next((col for col in PLAN_ID_COLUMNS if col in df.columns), None)
+        if key is None:
+            diagnostics["warnings"].append(
+                f"{sheet_name} 시트에서 요일 또는 날짜를 찾을 수 없습니다."
+            )
+            continue
+
+        # 저녁 시트 컬럼명 정리
+        if sheet_name == "저녁":
+            df = df.rename(columns=dict(zip(LUNCH_COLUMNS, DINNER_COLUMNS)))
+
+        # 유효한 요일/날짜만 남기기
+        if key == "날짜":
+            parsed = pd.to_datetime(df["날짜"], errors="coerce")
+            valid = parsed.notna()
+            df = df[valid].assign(
+                날짜=parsed[valid].dt.strftime("%Y-%m-%d"),
+                요일=parsed[valid].dt.dayofweek.map(dict(enumerate(WEEKDAY_NAMES))),
+            )
+        else:
+            df = df[df["요일"].astype(str).str.strip().isin(WEEKDAY_NAMES)]
+            df = df.assign(요일=df["요일"].astype(str).str.strip())
+        diagnostics["dropped_rows"][sheet_name] = sheet_rows - len(df)
+        if df.empty:
+            diagnostics["warnings"].append(
+                f"{sheet_name} 시트에 유효한 요일 데이터가 없습니다."
+            )
+            continue
+
+        duplicates = int(df[key].duplicated().sum())
+        if duplicates:
+            diagnostics["duplicate_days"][sheet_name] = duplicates
+        diagnostics["sheets"].append(sheet_name)
+        diagnostics["rows"][sheet_name] = len(df)
+        frames.append((key, df))
+
+    if not frames:
+        return pd.DataFrame(columns=["요일"] + LUNCH_COLUMNS), {
+            **diagnostics,
+            "elapsed": time.perf_counter() - started,
+        }
+
+    # 제공일 기준으로 병합 (날짜가 있는 시트가 하나라도 있으면 날짜 기준)
+    key = "날짜" if any(k == "날짜" for k, _ in frames) else "요일"
+    merged = None
+    for frame_key, df in frames:
+        if frame_key != key:
+            diagnostics["warnings"].append(
+                "요일만 있는 시트는 날짜가 있는 시트와 병합할 수 없어 제외했습니다."
+            )
+            continue
+        df = df.groupby(key, sort=False).first()
+        if merged is None:
+            merged = df
+        else:
+            order = merged.index.append(df.index).unique()
+            merged = merged.combine_first(df).reindex(order)
+    merged = merged.reset_index()
+
+    # 컬럼 정렬 및 누락 컬럼 채우기
+    meal_columns = list(LUNCH_COLUMNS)
+    if "저녁" in diagnostics["sheets"]:
+        meal_columns += DINNER_COLUMNS
+    id_columns = [col for col in PLAN_ID_COLUMNS if col in merged.columns]
+    diagnostics["missing_columns"] = [
+        col for col in meal_columns if col not in merged.columns
+    ]
+    plan_df = merged.reindex(columns=id_columns + meal_columns)
+    plan_df[meal_columns] = (
+        plan_df[meal_columns].fillna("").astype(str).apply(lambda col: col.str.strip())
+    )
+    diagnostics["elapsed"] = time.perf_counter() - started
+    return plan_df, diagnostics
+
+
+def _iso_date(value: Any) -> str:
+    return pd.Timestamp(value).date().isoformat()
+
+
+def _serving_dates(
+    plan_df: pd.DataFrame, week_start: Optional[Any] = None
+) -> pd.Series:
+    """
+    식단표 행별 제공 날짜 (요일만 있으면 week_start가 속한 주, 기본값 이번 주)
+    """
+    if "날짜" in plan_df.columns:
+        return pd.to_datetime(plan_df["날짜"])
+    monday = pd.Timestamp(week_start or date.today()).normalize()
+    monday -= pd.Timedelta(days=monday.dayofweek)
+    offsets = plan_df["요일"].map({name: i for i, name in enumerate(WEEKDAY_NAMES)})
+    return monday + pd.to_timedelta(offsets, unit="D")
+
+
+def save_plan(
+    plan_df: pd.DataFrame,
+    site: str = PLAN_DEFAULT_SITE,
+    source: str = "make_plan",
+    week_start: Optional[Any] = None,
+) -> int:
+    """
+    식단 계획을 식단 이력(plans, plan_items)에 한 번에 저장
+
+    같은 사업장의 같은 제공일에 이미 기록된 메뉴는 새 계획으로 바꿉니다.
+    날짜 없이 요일만 있는 식단은 week_start가 속한 주(기본값 이번 주)의 날짜로
+    기록합니다.
+
+    Args:
+        plan_df (pd.DataFrame): 식단 계획 (make_plan 또는 ingest_menu_board 결과)
+        site (str): 사업장 이름
+        source (str): 식단 출처 ("make_plan", "menu_board" 등)
+        week_start (Optional[Any]): 요일만 있는 식단을 배치할 주의 날짜
+
+    Returns:
+        int: 저장된 계획 번호
+    """
+    long_df = _plan_long_form(plan_df)
+    if long_df.empty:
+        raise ValueError("저장할 식단이 없습니다.")
+
+    dates = _serving_dates(long_df, week_start)
+    # 구분 "점심_메인" → (점심, 메인), "저녁_저녁_메인" → (저녁, 메인)
+    meal_slot = long_df["구분"].str.split("_", n=1, expand=True)
+    items = pd.DataFrame(
+        {
+            "date": dates.dt.strftime("%Y-%m-%d"),
+            "meal": meal_slot[0],
+            "slot": meal_slot[1].str.replace("^저녁_", "", regex=True),
+            "menu": long_df["메뉴"].astype(str).str.strip(),
+        }
+    )
+    # 같은 날짜/식사/슬롯이 여러 번 있으면 마지막 메뉴 사용 (기본 키 중복 방지)
+    items = items.drop_duplicates(["date", "meal", "slot"], keep="last")
+    served_dates = sorted(items["date"].unique())
+    meal_type = "".join(pd.unique(items["meal"]))
+
+    with db_transaction() as conn:
+        conn.executemany(
+            "DELETE FROM plan_items WHERE site = ? AND date = ?",
+            [(site, served_date) for served_date in served_dates],
+        )
+        conn.execute(
+            """
+            DELETE FROM plans WHERE site = ? AND NOT EXISTS (
+                SELECT 1 FROM plan_items WHERE plan_id = plans.id
+            )
+        """,
+            (site,),
+        )
+        plan_id = conn.execute(
+            """
+            INSERT INTO plans (site, source, meal_type, start_date, end_date, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """,
+            (site, source, meal_type, served_dates[0], served_dates[-1], time.time()),
+        ).lastrowid
+        conn.executemany(
+            """
+            INSERT INTO plan_items (plan_id, site, date, meal, slot, menu)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """,
+            [
+                (plan_id, site, *row)
+                for row in items.itertuples(index=False, name=None)
+            ],
+        )
+    return plan_id
+
+
+def _history_filter(
+    site: Optional[str],
+    start_date: Optional[Any],
+    end_date: Optional[Any],
+    menu: Optional[str] = None,
+) -> Tuple[str, tuple]:
+    """
+    식단 이력 조회 조건 (WHERE 절, 매개변수) 생성
+    """
+    conditions, params = [], []
+    if site is not None:
+        conditions.append("site = ?")
+        params.append(site)
+    if menu is not None:
+        conditions.append("menu = ?")
+        params.append(menu)
+    if start_date is not None:
+        conditions.append("date >= ?")
+        params.append(_iso_date(start_date))
+    if end_date is not None:
+        conditions.append("date <= ?")
+        params.append(_iso_date(end_date))
+    clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return clause, tuple(params)
+
+
+def get_plan_history(
+    site: Optional[str] = None,
+    start_date: Optional[Any] = None,
+    end_date: Optional[Any] = None,
+    menu: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    식단 이력에서 기간 안에 제공된 메뉴 조회 (인덱스 범위 조회)
+
+    Args:
+        site (Optional[str]): 사업장 이름 (None이면 전체)
+        start_date (Optional[Any]): 시작 날짜 (포함)
+        end_date (Optional[Any]): 종료 날짜 (포함)
+        menu (Optional[str]): 메뉴 이름 (지정하면 해당 메뉴의 제공 기록만)
+
+    Returns:
+        pd.DataFrame: plan_id, site, date, meal, slot, menu (사업장, 날짜 순)
+    """
+    clause, params = _history_filter(site, start_date, end_date, menu)
+    return pd.read_sql_query(
+        f"""
+        SELECT plan_id, site, date, meal, slot, menu FROM plan_items {clause}
+        ORDER BY site, date
+    """,
+        get_db_connection(),
+        params=params,
+    )
+
+
+def get_menu_usage(
+    site: Optional[str] = None,
+    start_date: Optional[Any] = None,
+    end_date: Optional[Any] = None,
+) -> pd.DataFrame:
+    """
+    기간 안의 메뉴별 제공 횟수와 마지막 제공일
+
+    Args:
+        site (Optional[str]): 사업장 이름 (None이면 전체)
+        start_date (Optional[Any]): 시작 날짜 (포함)
+        end_date (Optional[Any]): 종료 날짜 (포함)
+
+    Returns:
+        pd.DataFrame: menu, count, last_date (제공 횟수 내림차순)
+    """
+    clause, params = _history_filter(site, start_date, end_date)
+    return pd.read_sql_query(
+        f"""
+        SELECT menu, COUNT(*) AS count, MAX(date) AS last_date
+        FROM plan_items {clause}
+        GROUP BY menu ORDER BY count DESC, menu
+    """,
+        get_db_connection(),
+        params=params,
+    )
+
+
+def list_plans(site: Optional[str] = None, limit: int = 20) -> pd.DataFrame:
+    """
+    저장된 식단 계획 목록 (최신순)
+
+    Args:
+        site (Optional[str]): 사업장 이름 (None이면 전체)
+        limit (int): 최대 계획 수
+
+    Returns:
+        pd.DataFrame: id, site, source, meal_type, start_date, end_date, created_at
+    """
+    clause, params = ("WHERE site = ?", (site,)) if site is not None else ("", ())
+    return pd.read_sql_query(
+        f"""
+        SELECT id, site, source, meal_type, start_date, end_date, created_at
+        FROM plans {clause} ORDER BY id DESC LIMIT ?
+    """,
+        get_db_connection(),
+        params=params + (limit,),
+    )
+
+
+def load_plan(
+    site: str = PLAN_DEFAULT_SITE,
+    start_date: Optional[Any] = None,
+    end_date: Optional[Any] = None,
+) -> pd.DataFrame:
+    """
+    식단 이력을 식단표 형식(날짜, 요일, 메뉴 컬럼)으로 불러오기
+
+    Args:
+        site (str): 사업장 이름
+        start_date (Optional[Any]): 시작 날짜 (포함)
+        end_date (Optional[Any]): 종료 날짜 (포함)
+
+    Returns:
+        pd.DataFrame: 식단 계획 (기록이 없는 슬롯은 "")
+    """
+    history = get_plan_history(site, start_date, end_date)
+    columns = list(LUNCH_COLUMNS)
+    if (history["meal"] == "저녁").any():
+        columns += DINNER_COLUMNS
+    history["column"] = history["slot"].where(
+        history["meal"] == "점심", "저녁_" + history["slot"]
+    )
+    plan_df = (
+        history.pivot(index="date", columns="column", values="menu")
+        .reindex(columns=columns)
+        .fillna("")
+    )
+    plan_df.columns.name = None
+    plan_df.insert(
+        0,
+        "요일",
+        [WEEKDAY_NAMES[pd.Timestamp(d).dayofweek] for d in plan_df.index],
+    )
+    return plan_df.rename_axis("날짜").reset_index()
+
+
+def update_menu_nutrition(menu_name: str, nutrition: Dict[str, float]):
+    """
+    메뉴의 영양 정보 업데이트
+
+    Args:
+        menu_name (str): 업데이트할 메뉴 이름
+        nutrition (Dict[str, float]): 새로운 영양 정보
+    """
+    with db_transaction() as conn:
+        conn.execute(
+            """
+            UPDATE menus
+            SET calories = ?, protein = ?, fat = ?, carbs = ?, sodium = ?
+            WHERE name = ?
+        """,
+            (
+                nutrition["calories"],
+                nutrition["protein"],
+                nutrition["fat"],
+                nutrition["carbs"],
+                nutrition["sodium"],
+                menu_name,
+            ),
+        )
+
+
+def update_menu_category(menu_name: str, category: str):
+    """
+    메뉴의 카테고리 업데이트
+
+    Args:
+        menu_name (str): 업데이트할 메뉴 이름
+        category (str): 새로운 카테고리
+    """
+    with db_transaction() as conn:
+        conn.execute(
+            """
+            UPDATE menus
+            SET category = ?
+            WHERE name = ?
+        """,
+            (category, menu_name),
+        )
+
+
+def get_seasonal_menus() -> list:
+    """
+    계절별 메뉴 추천을 위해 AI를 활용하여 메뉴 생성
+    Returns:
+        List[Dict[str, Any]]: 계절별 추천 메뉴 목록
+    """
+    current_month = datetime.now().month
+    season = (
+        "봄"
+        if 3 <= current_month <= 5
+        else (
+            "여름"
+            if 6 <= current_month <= 8
+            else ("가을" if 9 <= current_month <= 11 else "겨울")
+        )
+    )
+    prompt = f"""
+    {season}에 어울리는 한식 메뉴 5개를 추천해주세요.
+    계절에 맞는 제철 식재료를 활용한 메뉴여야 합니다.
+    응답 형식:
+    [
+        {{
+            "name": "메뉴이름",
+            "category": "국/수프|메인|사이드|밥",
+            "calories": 숫자,
+            "protein": 숫자,
+            "fat": 숫자,
+            "carbs": 숫자,
+            "sodium": 숫자,
+            "seasonal_ingredients": ["제철재료1", "제철재료2", ...]
+        }},
+        ...
+    ]
+    """
+    try:
+        menus = list(_iter_json_objects(generate_content_stream(prompt)))
+        # 필수 필드 보정
+        for menu in menus:
+            for field in ["calories", "protein", "fat", "carbs", "sodium"]:
+                try:
+                    menu[field] = int(float(str(menu[field]).replace(",", "")))
+                except Exception:
+                    menu[field] = 0
+        return menus
+    except Exception as e:
+        print(f"계절별 메뉴 생성 중 오류 발생: {str(e)}")
+        return []
+
+
+def optimize_nutrition_balance(plan_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    식단 계획의 영양 균형을 최적화
+    Args:
+        plan_df (pd.DataFrame): 현재 식단 계획
+    Returns:
+        pd.DataFrame: 최적화된 식단 계획
+    """
+    try:
+        catalog = get_menu_catalog()
+
+        # 현재 영양 정보 분석
+        day_column = _day_column(plan_df)
+        id_columns = [col for col in PLAN_ID_COLUMNS if col in plan_df.columns]
+        current_nutrition = analyze_menu_plan(plan_df)
+        daily_nutrition = current_nutrition.groupby(day_column).agg(
+            {nutrient: "sum" for nutrient in TARGET_NUTRITION}
+        )
+        # 영양소 균형이 맞지 않는 요일 찾기
+        imbalanced_days = []
+        for day in daily_nutrition.index:
+            day_nutrition = daily_nutrition.loc[day]
+            if any(
+                abs(day_nutrition[nutrient] - TARGET_NUTRITION[nutrient])
+                / TARGET_NUTRITION[nutrient]
+                > 0.2
+                for nutrient in TARGET_NUTRITION
+            ):
+                imbalanced_days.append(day)
+        # 균형이 맞지 않는 요일의 메뉴 최적화
+        label_columns = {label: j for j, label in enumerate(NUTRIENT_LABELS.values())}
+        for day in imbalanced_days:
+            day_nutrition = daily_nutrition.loc[day]
+            day_mask = plan_df[day_column] == day
+            day_menus = plan_df.loc[day_mask].iloc[0].drop(id_columns)
+            for nutrient in TARGET_NUTRITION:
+                if day_nutrition[nutrient] < TARGET_NUTRITION[nutrient] * 0.8:
+                    j = label_columns[nutrient]
+                    current_values = catalog.gather(day_menus.values)[:, j]
+                    if np.isnan(current_values).all():
+                        continue
+                    # 해당 영양소가 가장 적은 메뉴를 같은 카테고리의 대체 메뉴로 교체
+                    col = day_menus.index[int(np.nanargmin(current_values))]
+                    category = catalog.category_of(day_menus[col])
+                    mask = (catalog.categories == category) & (
+                        catalog.matrix[:, j] > day_nutrition[nutrient] / 3
+                    )
+                    current_menus = set(day_menus.values)
+                    alternative_menus = [
+                        catalog.names[i]
+                        for i in np.flatnonzero(mask)
+                        if catalog.names[i] not in current_menus
+                    ]
+                    if alternative_menus:
+                        new_menu = random.choice(alternative_menus)
+                        plan_df.loc[day_mask, col] = new_menu
+                        day_menus[col] = new_menu
+        return plan_df
+    except Exception as e:
+        print(f"영양 균형 최적화 중 오류 발생: {str(e)}")
+        return plan_df
+
+
+def _slot_category(column: str) -> Optional[str]:
+    """
+    식단표 메뉴 컬럼의 카테고리 (잡곡밥 등 고정 슬롯은 None)
+    """
+    if column.startswith("저녁_"):
+        column = column[len("저녁_") :]
+    return dict(PLAN_SLOTS).get(column)
+
+
+def _last_served(site: str, before: Any) -> Dict[str, int]:
+    """
+    사업장별 메뉴 마지막 제공일 (before 이전 식단 이력 기준, 날짜 서수)
+    """
+    rows = get_db_connection().execute(
+        """
+        SELECT menu, MAX(date) FROM plan_items
+        WHERE site = ? AND date < ? GROUP BY menu
+    """,
+        (site, _iso_date(before)),
+    )
+    return {menu: date.fromisoformat(last).toordinal() for menu, last in rows}
+
+
+class _MenuRotation:
+    """
+    카테고리별로 가장 오래전에 제공한 메뉴를 고르는 순환 스케줄러
+
+    메뉴마다 마지막 제공일을 두고, 카테고리별 힙에서 (마지막 제공일, 순서) 기준으로
+    후보를 꺼냅니다 (슬롯당 O(log n)). 제공일이 바뀐 메뉴는 새 항목을 넣고 오래된
+    항목은 꺼낼 때 버립니다.
+    """
+
+    NEVER = -1  # 제공 기록이 없는 메뉴의 마지막 제공일
+
+    def __init__(
+        self,
+        catalog: MenuCatalog,
+        last_served: Dict[str, int],
+        rng: random.Random,
+    ):
+        self.catalog = catalog
+        self.last_served = last_served
+        self.rng = rng
+        self.heaps: Dict[str, List[Tuple[int, float, str]]] = {}
+
+    def _heap(self, category: str) -> List[Tuple[int, float, str]]:
+        heap = self.heaps.get(category)
+        if heap is None:
+            heap = [
+                (self.last_served.get(name, self.NEVER), self.rng.random(), name)
+                for name in self.catalog.names_in_category(category)
+            ]
+            heapq.heapify(heap)
+            self.heaps[category] = heap
+        return heap
+
+    def serve(self, menu: str, category: str, day: int):
+        """
+        menu를 day(날짜 서수)에 제공한 것으로 기록
+        """
+        self.last_served[menu] = day
+        if self.catalog.category_of(menu) == category:
+            heapq.heappush(self._heap(category), (day, self.rng.random(), menu))
+
+    def is_due(self, menu: str, day: int, min_interval: int) -> bool:
+        """
+        menu를 day에 다시 제공해도 되는지 (마지막 제공일로부터 min_interval일 경과)
+        """
+        last = self.last_served.get(menu, self.NEVER)
+        return last == self.NEVER or day - last >= min_interval
+
+    def pick(self, category: str, day: int, exclude: set) -> Optional[str]:
+        """
+        카테고리에서 가장 오래전에 제공한 메뉴를 골라 day에 제공한 것으로 기록
+        """
+        heap = self._heap(category)
+        skipped = []
+        chosen = None
+        while heap:
+            last, _, name = heapq.heappop(heap)
+            if self.last_served.get(name, self.NEVER) != last:
+                continue  # 오래된 항목
+            if name in exclude:
+                skipped.append((last, self.rng.random(), name))
+                continue
+            chosen = name
+            break
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+        if chosen is not None:
+            self.serve(chosen, category, day)
+        return chosen
+
+
+def manage_menu_diversity(
+    plan_df: pd.DataFrame,
+    site: str = PLAN_DEFAULT_SITE,
+    min_interval: int = DIVERSITY_MIN_INTERVAL_DAYS,
+    week_start: Optional[Any] = None,
+    seed: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    메뉴의 다양성을 관리하고 중복을 최소화
+
+    사업장의 식단 이력에서 메뉴별 마지막 제공일을 읽어, 날짜 순으로 슬롯을 확인하면서
+    min_interval일 안에 다시 나온 메뉴를 같은 카테고리에서 가장 오래전에 제공한
+    메뉴로 바꿉니다. 메뉴가 부족하면 간격을 채우지 못해도 가장 오래된 메뉴를 씁니다.
+    Args:
+        plan_df (pd.DataFrame): 현재 식단 계획
+        site (str): 식단 이력을 참조할 사업장 이름
+        min_interval (int): 같은 메뉴 반복 최소 간격(일)
+        week_start (Optional[Any]): 요일만 있는 식단을 배치할 주의 날짜
+        seed (Optional[int]): 제공 기록이 같은 후보 사이의 순서를 정할 난수 시드
+    Returns:
+        pd.DataFrame: 다양성이 개선된 식단 계획
+    """
+    try:
+        if plan_df.empty:
+            return plan_df
+        dates = _serving_dates(plan_df, week_start)
+        slots = [
+            (j, _slot_category(col))
+            for j, col in enumerate(plan_df.columns)
+            if _slot_category(col) is not None
+        ]
+        rotation = _MenuRotation(
+            get_menu_catalog(),
+            _last_served(site, dates.min()),
+            random.Random(seed),
+        )
+        values = plan_df.to_numpy(dtype=object)
+        for i in np.argsort(dates.to_numpy(), kind="stable"):
+            day = dates.iloc[i].toordinal()
+            served_today = set()
+            for j, category in slots:
+                menu = values[i, j]
+                if not isinstance(menu, str) or not menu.strip():
+                    continue
+                if menu not in served_today and rotation.is_due(
+                    menu, day, min_interval
+                ):
+                    rotation.serve(menu, category, day)
+                else:
+                    menu = rotation.pick(category, day, served_today) or menu
+                    values[i, j] = menu
+                served_today.add(menu)
+        for j, _ in slots:
+            plan_df.iloc[:, j] = values[:, j]
+        return plan_df
+    except Exception as e:
+        print(f"메뉴 다양성 관리 중 오류 발생: {str(e)}")
+        return plan_df
+
+
+def generate_monthly_report(
+    plan_df: Optional[pd.DataFrame] = None,
+    site: str = PLAN_DEFAULT_SITE,
+    start_date: Optional[Any] = None,
+    end_date: Optional[Any] = None,
+) -> str:
+    """
+    월간 식단 보고서 생성
+    Args:
+        plan_df (Optional[pd.DataFrame]): 식단 계획 데이터
+            (None이면 식단 이력에서 site의 기간 식단을 불러옴)
+        site (str): 식단 이력에서 불러올 사업장 이름
+        start_date (Optional[Any]): 시작 날짜 (기본값 이번 달 1일)
+        end_date (Optional[Any]): 종료 날짜 (기본값 이번 달 말일)
+    Returns:
+        str: 생성된 보고서 파일 경로
+    """
+    try:
+        if plan_df is None:
+            month_start = pd.Timestamp(date.today()).replace(day=1)
+            plan_df = load_plan(
+                site,
+                start_date or month_start,
+                end_date or month_start + pd.offsets.MonthEnd(0),
+            )
+            if plan_df.empty:
+                raise ValueError(f"'{site}' 사업장의 식단 이력이 없습니다.")
+        os.makedirs("reports", exist_ok=True)
+        filepath = os.path.join(
+            "reports", f"월간_식단_보고서_{datetime.now().strftime('%Y%m')}.xlsx"
+        )
+        with pd.ExcelWriter(filepath, engine="xlsxwriter") as writer:
+            plan_df.to_excel(writer, sheet_name="식단 계획", index=False)
+            nutrition_df = analyze_menu_plan(plan_df)
+            nutrition_df.to_excel(writer, sheet_name="영양 정보", index=False)
+            menu_stats = pd.DataFrame()
+            for col in plan_df.columns:
+                if col not in PLAN_ID_COLUMNS:
+                    menu_counts = plan_df[col].value_counts()
+                    menu_stats[col] = menu_counts
+            menu_stats.to_excel(writer, sheet_name="메뉴 사용 통계")
+            daily_nutrition = nutrition_df.groupby(_day_column(plan_df)).agg(
+                {nutrient: "sum" for nutrient in TARGET_NUTRITION}
+            )
+            achievement_rate = pd.DataFrame()
+            for nutrient in TARGET_NUTRITION:
+                achievement_rate[nutrient] = (
+                    daily_nutrition[nutrient] / TARGET_NUTRITION[nutrient] * 100
+                ).round(1)
+            achievement_rate.to_excel(writer, sheet_name="영양소 목표 달성률")
+        return filepath
+    except Exception as e:
+        print(f"월간 보고서 생성 중 오류 발생: {str(e)}")
+        return ""
+
 
+def auto_update_menu_db() -> List[str]:
+    """
+    메뉴 데이터베이스 자동 업데이트
+    - 새로운 트렌드 메뉴 추가
+    - 계절별 메뉴 업데이트
+    - 오래 제공하지 않은 메뉴 확인 (삭제하지 않음, 정리는 prune_menus로 따로 실행)
 
-def init_db():
+    Returns:
+        List[str]: 정리 대상 메뉴 이름 목록 (prune_menus(dry_run=True) 결과)
     """
-    SQLite 데이터베이스 초기화 및 menus 테이블 생성
+    try:
+        seasonal_menus = get_seasonal_menus()
+        add_menus(seasonal_menus, replace=False)
+        prompt = """
+        최근 인기 있는 한식 메뉴 5개를 추천해주세요.
+        트렌디하고 현대적인 메뉴여야 합니다.
+        응답 형식:
+        [
+            {{
+                "name": "메뉴이름",
+                "category": "국/수프|메인|사이드|밥",
+                "calories": 숫자,
+                "protein": 숫자,
+                "fat": 숫자,
+                "carbs": 숫자,
+                "sodium": 숫자,
+                "trend_reason": "인기 이유"
+            }},
+            ...
+        ]
+        """
+        trend_menus = _iter_json_objects(generate_content_stream(prompt))
+        add_menus(trend_menus, replace=False)
+        return prune_menus(dry_run=True)
+    except Exception as e:
+        print(f"메뉴 DB 자동 업데이트 중 오류 발생: {str(e)}")
+        return []
+
+
+def get_menu_usage_counters(menu_names: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    메뉴별 누적 제공 횟수와 마지막 제공일 (식단 이력 저장 시 갱신되는 카운터)
+
+    Args:
+        menu_names (Optional[Iterable[str]]): 조회할 메뉴 이름 (None이면 전체)
+
+    Returns:
+        pd.DataFrame: menu, serve_count, last_served, last_active
     """
+    query = "SELECT menu, serve_count, last_served, last_active FROM menu_usage"
     conn = get_db_connection()
-    cursor = conn.cursor()
+    if menu_names is None:
+        return pd.read_sql_query(query, conn)
+    names = list(dict.fromkeys(menu_names))
+    return pd.read_sql_query(
+        f"{query} WHERE menu IN ({', '.join('?' * len(names))})", conn, params=names
+    )
 
-    # menus 테이블 생성 (없는 경우에만)
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS menus (
-            name TEXT PRIMARY KEY,
-            category TEXT,
-            calories REAL,
-            protein REAL,
-            fat REAL,
-            carbs REAL,
-            sodium REAL
+
+def prune_menus(
+    unused_days: int = MENU_PRUNE_UNUSED_DAYS,
+    dry_run: bool = False,
+    names: Optional[Iterable[str]] = None,
+) -> List[str]:
+    """
+    오래 제공하지 않은 메뉴를 menus_archive로 옮기고 메뉴 DB에서 삭제
+
+    마지막 제공일(제공 기록이 없으면 추가일)이 unused_days일보다 오래된 메뉴를
+    menu_usage.last_active 인덱스로 찾으므로, 비용은 정리 대상 메뉴 수에 비례합니다.
+    잡곡밥(PLAN_RICE)은 정리하지 않습니다. 보관한 메뉴는 restore_menus로 되돌립니다.
+
+    Args:
+        unused_days (int): 사용하지 않은 기간(일)
+        dry_run (bool): True면 대상 메뉴만 반환하고 삭제하지 않음
+        names (Optional[Iterable[str]]): 정리할 메뉴 (미리 확인한 대상 목록,
+            None이면 대상 전체). 그 사이 다시 쓰인 메뉴는 정리하지 않습니다.
+
+    Returns:
+        List[str]: 정리된 (dry_run이면 정리할) 메뉴 이름 목록
+    """
+    cutoff = (date.today() - timedelta(days=unused_days)).isoformat()
+    selected = None if names is None else set(names)
+    with db_transaction() as conn:
+        names = [
+            name
+            for (name,) in conn.execute(
+                """
+                SELECT u.menu FROM menu_usage AS u
+                JOIN menus AS m ON m.name = u.menu
+                WHERE u.last_active < ? AND u.menu != ?
+            """,
+                (cutoff, PLAN_RICE),
+            )
+            if selected is None or name in selected
+        ]
+        if dry_run or not names:
+            return names
+        params = [(name,) for name in names]
+        conn.executemany(
+            """
+            INSERT OR REPLACE INTO menus_archive (
+                name, category, calories, protein, fat, carbs, sodium,
+                serve_count, last_served, archived_at
+            )
+            SELECT m.name, m.category, m.calories, m.protein, m.fat, m.carbs, m.sodium,
+                u.serve_count, u.last_served, ?
+            FROM menus AS m JOIN menu_usage AS u ON u.menu = m.name
+            WHERE m.name = ?
+        """,
+            [(time.time(), name) for name in names],
         )
+        conn.executemany("DELETE FROM menus WHERE name = ?", params)
+    return names
+
+
+def restore_menus(names: Optional[Iterable[str]] = None) -> List[str]:
     """
-    )
+    prune_menus로 보관한 메뉴를 메뉴 DB로 되돌리기
+
+    이미 메뉴 DB에 같은 이름이 있으면 그 메뉴를 그대로 두고 보관 기록만 지웁니다.
+    제공 횟수는 식단 이력에서 유지되므로 되돌린 메뉴의 카운터도 이어집니다.
+
+    Args:
+        names (Optional[Iterable[str]]): 되돌릴 메뉴 이름 (None이면 보관된 메뉴 전체)
+
+    Returns:
+        List[str]: 보관 목록에서 되돌린 메뉴 이름 목록
+    """
+    query = "SELECT name FROM menus_archive"
+    params: tuple = ()
+    if names is not None:
+        names = list(dict.fromkeys(names))
+        if not names:
+            return []
+        query += f" WHERE name IN ({', '.join('?' * len(names))})"
+        params = tuple(names)
+    with db_transaction() as conn:
+        restored = [name for (name,) in conn.execute(query, params)]
+        conn.executemany(
+            """
+            INSERT OR IGNORE INTO menus
+                (name, category, calories, protein, fat, carbs, sodium)
+            SELECT name, category, calories, protein, fat, carbs, sodium
+            FROM menus_archive WHERE name = ?
+        """,
+            [(name,) for name in restored],
+        )
+        conn.executemany(
+            "DELETE FROM menus_archive WHERE name = ?", [(name,) for name in restored]
+        )
+    return restored
+
+
+def get_archived_menus() -> pd.DataFrame:
+    """
+    prune_menus로 보관된 메뉴 목록 (최근 보관순)
 
-    conn.commit()
-    conn.close()
+    Returns:
+        pd.DataFrame: name, category, serve_count, last_served, archived_at
+    """
+    return pd.read_sql_query(
+        """
+        SELECT name, category, serve_count, last_served, archived_at
+        FROM menus_archive ORDER BY archived_at DESC, name
+    """,
+        get_db_connection(),
+    )
 
 
-def get_db_connection():
+def _job_idempotency_key(kind: str, params: Dict[str, Any], items: List[str]) -> str:
     """
-    데이터베이스 연결 객체 반환
+    작업 종류, 매개변수, 항목으로 중복 제출 판별 키 생성
     """
-    return sqlite3.connect("meal.db")
+    payload = json.dumps([kind, params, sorted(items)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
 
-def add_menu(menu_info: Dict[str, Any]):
+def submit_job(
+    kind: str,
+    params: Optional[Dict[str, Any]] = None,
+    items: Optional[Iterable[str]] = None,
+) -> int:
     """
-    단일 메뉴 정보를 데이터베이스에 추가
+    백그라운드 작업 등록
+
+    같은 작업(종류, 매개변수, 항목)이 이미 대기 중이거나 실행 중이면 그 작업 번호를
+    반환하고, 실패한 작업이 있으면 완료되지 않은 항목부터 다시 실행하도록 대기열에
+    넣습니다. 빈 항목(None, 공백)은 처리할 수 없으므로 등록하지 않습니다.
 
     Args:
-        menu_info (Dict[str, Any]): 메뉴 정보를 담은 딕셔너리
+        kind (str): 작업 종류 ("bulk_add", "default_menus", "auto_update",
+            "prune_menus")
+        params (Optional[Dict[str, Any]]): 작업 매개변수
+        items (Optional[Iterable[str]]): 항목 목록 (bulk_add는 메뉴 이름)
+
+    Returns:
+        int: 작업 번호
+
+    Raises:
+        ValueError: 알 수 없는 작업 종류이거나 처리할 항목이 없는 경우
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    if kind not in _JOB_RUNNERS:
+        raise ValueError(f"알 수 없는 작업 종류입니다: {kind}")
+    params = params or {}
+    if items is None:
+        items = [kind]
+    items = list(
+        dict.fromkeys(
+            str(item)
+            for item in items
+            if not (item is None or (isinstance(item, float) and pd.isna(item)))
+            and str(item).strip()
+        )
+    )
+    if not items:
+        raise ValueError("처리할 항목이 없습니다.")
+    key = _job_idempotency_key(kind, params, items)
 
-    try:
-        cursor.execute(
+    with db_transaction() as conn:
+        row = conn.execute(
             """
-            INSERT OR REPLACE INTO menus (name, category, calories, protein, fat, carbs, sodium)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            SELECT id, status FROM jobs
+            WHERE idempotency_key = ? AND status IN ('queued', 'running', 'failed')
+            ORDER BY id DESC LIMIT 1
         """,
-            (
-                menu_info["name"],
-                menu_info["category"],
-                menu_info["calories"],
-                menu_info["protein"],
-                menu_info["fat"],
-                menu_info["carbs"],
-                menu_info["sodium"],
-            ),
+            (key,),
+        ).fetchone()
+        if row is not None:
+            job_id, status = row
+            if status == "failed":
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', error = NULL WHERE id = ?",
+                    (job_id,),
+                )
+                conn.execute(
+                    """
+                    UPDATE job_items SET status = 'pending', error = NULL
+                    WHERE job_id = ? AND status = 'failed'
+                """,
+                    (job_id,),
+                )
+            return job_id
+
+        try:
+            cursor = conn.execute(
+                """
+                INSERT INTO jobs (kind, params, idempotency_key, total, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            """,
+                (
+                    kind,
+                    json.dumps(params, ensure_ascii=False),
+                    key,
+                    len(items),
+                    time.time(),
+                ),
+            )
+        except sqlite3.IntegrityError:
+            # 다른 사용자가 같은 작업을 먼저 등록한 경우
+            return conn.execute(
+                """
+                SELECT id FROM jobs
+                WHERE idempotency_key = ? AND status IN ('queued', 'running')
+            """,
+                (key,),
+            ).fetchone()[0]
+        job_id = cursor.lastrowid
+        conn.executemany(
+            "INSERT INTO job_items (job_id, item) VALUES (?, ?)",
+            [(job_id, item) for item in items],
         )
-        conn.commit()
-    except Exception as e:
-        st.error(f"메뉴 추가 중 오류 발생: {str(e)}")
-    finally:
-        conn.close()
+    return job_id
 
 
-def classify_menu(menu_name: str) -> Dict[str, Any]:
+def get_job(job_id: int) -> Optional[Dict[str, Any]]:
     """
-    Gemini API를 사용하여 메뉴를 분류하고 영양 정보 추출
+    작업 상태 조회
 
     Args:
-        menu_name (str): 분류할 메뉴 이름
+        job_id (int): 작업 번호
 
     Returns:
-        Dict[str, Any]: 메뉴의 카테고리와 영양 정보
+        Optional[Dict[str, Any]]: id, kind, status, total, done, failed, pending,
+            result, error, created_at, started_at, finished_at (없으면 None)
     """
-    prompt = f"""
-    다음 메뉴의 카테고리와 영양 정보를 JSON 형식으로 반환해주세요:
-    메뉴: {menu_name}
-    
-    응답 형식:
-    {{
-        "name": "{menu_name}",
-        "category": "국/수프|메인|사이드|밥",
-        "calories": 숫자,
-        "protein": 숫자,
-        "fat": 숫자,
-        "carbs": 숫자,
-        "sodium": 숫자
-    }}
+    jobs = _fetch_jobs("WHERE id = ?", (job_id,))
+    return jobs[0] if jobs else None
 
-    주의사항:
-    1. 모든 숫자는 정수여야 합니다.
-    2. category는 반드시 "국/수프", "메인", "사이드", "밥" 중 하나여야 합니다.
-    3. calories는 50-1000 사이의 값이어야 합니다.
-    4. protein, fat, carbs는 0-100 사이의 값이어야 합니다.
-    5. sodium은 0-2000 사이의 값이어야 합니다.
-    6. 1인분을 기준으로 합니다.
+
+def list_jobs(limit: int = 10) -> List[Dict[str, Any]]:
     """
+    최근 작업 목록 (최신순)
 
-    try:
-        response = model.generate_content(prompt)
+    Args:
+        limit (int): 최대 작업 수
 
-        # 응답에서 JSON 추출
-        import re
+    Returns:
+        List[Dict[str, Any]]: get_job()과 같은 형식의 작업 목록
+    """
+    return _fetch_jobs("ORDER BY id DESC LIMIT ?", (limit,))
 
-        json_str = re.search(r"```json\n(.*?)\n```", response.text, re.DOTALL)
-        if not json_str:
-            json_str = re.search(r"\{.*\}", response.text, re.DOTALL)
 
-        if json_str:
-            menu_info = json.loads(
-                json_str.group(0)
-                if json_str.group(0).startswith("{")
-                else json_str.group(1)
-            )
+def _fetch_jobs(clause: str, params: tuple) -> List[Dict[str, Any]]:
+    """
+    jobs 테이블 조회 결과에 항목별 상태 개수를 붙여 반환
+    """
+    conn = get_db_connection()
+    columns = [
+        "id",
+        "kind",
+        "status",
+        "total",
+        "result",
+        "error",
+        "created_at",
+        "started_at",
+        "finished_at",
+    ]
+    jobs = [
+        dict(zip(columns, row))
+        for row in conn.execute(
+            f"SELECT {', '.join(columns)} FROM jobs {clause}", params
+        )
+    ]
+    for job in jobs:
+        counts = dict(
+            conn.execute(
+                "SELECT status, COUNT(*) FROM job_items WHERE job_id = ? GROUP BY status",
+                (job["id"],),
+            ).fetchall()
+        )
+        job["done"] = counts.get("done", 0)
+        job["failed"] = counts.get("failed", 0)
+        job["pending"] = counts.get("pending", 0)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+    return jobs
 
-            # 필수 필드 검증
-            required_fields = [
-                "name",
-                "category",
-                "calories",
-                "protein",
-                "fat",
-                "carbs",
-                "sodium",
-            ]
-            if not all(field in menu_info for field in required_fields):
-                raise ValueError("API 응답에 필수 필드가 누락되었습니다.")
 
-            # 값 검증
-            if menu_info["category"] not in ["국/수프", "메인", "사이드", "밥"]:
-                menu_info["category"] = "메인"  # 기본값 설정
+class JobLeaseLost(RuntimeError):
+    """
+    실행 중인 작업이 다른 실행 스레드에 다시 배정되어 결과를 기록할 수 없음
+    """
 
-            # 숫자 값 검증 및 변환
-            for field in ["calories", "protein", "fat", "carbs", "sodium"]:
-                try:
-                    menu_info[field] = int(
-                        float(str(menu_info[field]).replace(",", ""))
-                    )
-                except (ValueError, TypeError):
-                    # 기본값 설정
-                    defaults = {
-                        "calories": 300,
-                        "protein": 10,
-                        "fat": 5,
-                        "carbs": 50,
-                        "sodium": 500,
-                    }
-                    menu_info[field] = defaults[field]
 
-            return menu_info
-        else:
-            raise ValueError("API 응답에서 JSON을 찾을 수 없습니다.")
+def _claim_next_job() -> Optional[Dict[str, Any]]:
+    """
+    대기 중인 작업 하나를 실행 상태로 바꾸어 가져오기 (오래 멈춘 작업은 먼저 되돌림)
 
-    except Exception as e:
-        print(f"메뉴 분류 중 오류 발생: {str(e)}")
-        # 기본값 반환
-        return {
-            "name": menu_name,
-            "category": "메인",
-            "calories": 300,
-            "protein": 10,
-            "fat": 5,
-            "carbs": 50,
-            "sodium": 500,
-        }
+    배정 시각(started_at)을 임대 토큰(lease)으로 돌려주며, 항목/결과를 기록할 때
+    토큰이 그대로인지 확인하여 다시 배정된 작업을 두 번 기록하지 않습니다.
+    """
+    now = time.time()
+    with db_transaction() as conn:
+        conn.execute(
+            """
+            UPDATE jobs SET status = 'queued'
+            WHERE status = 'running' AND heartbeat_at < ?
+        """,
+            (now - JOB_STALE_SECONDS,),
+        )
+        row = conn.execute(
+            "SELECT id, kind, params FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return None
+        claimed = conn.execute(
+            """
+            UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ?
+            WHERE id = ? AND status = 'queued'
+        """,
+            (now, now, row[0]),
+        ).rowcount
+    if not claimed:
+        return None
+    return {"id": row[0], "kind": row[1], "params": json.loads(row[2]), "lease": now}
 
 
-def add_default_korean_menus():
-    existing_menus = get_all_menus()
-    existing_menu_names = (
-        set(existing_menus["name"].tolist()) if not existing_menus.empty else set()
-    )
+def _check_job_lease(conn: sqlite3.Connection, job: Dict[str, Any]):
+    """
+    작업이 아직 이 실행 스레드에 배정되어 있는지 확인 (아니면 JobLeaseLost)
+    """
+    held = conn.execute(
+        "SELECT 1 FROM jobs WHERE id = ? AND status = 'running' AND started_at = ?",
+        (job["id"], job["lease"]),
+    ).fetchone()
+    if held is None:
+        raise JobLeaseLost(f"작업 #{job['id']}이(가) 다시 배정되었습니다.")
 
-    # AI를 통해 한식 메뉴 생성
-    prompt = """
-    다음 조건에 맞는 한식 메뉴 15개를 생성해주세요:
-    1. 구내식당에서 제공하는 메뉴여야 합니다.
-    2. 국/수프, 메인, 사이드, 밥 카테고리 중 하나여야 합니다.
-    3. 각 메뉴는 기존 메뉴와 중복되지 않아야 합니다.
-    4. 각 메뉴의 영양 정보(칼로리, 단백질, 지방, 탄수화물, 나트륨)를 포함해야 합니다.
-    5. JSON 형식으로 응답해주세요.
-    6. 1인분을 기준으로 합니다.
-    7. 구체적인 메뉴 이름을 작성해주세요.
-    8. 메뉴 이름은 한국어로 작성해주세요.
-    9. 김치를 활용한 음식은 괜찮지만, 김치 자체를 메뉴로 추가하지 말아주세요.
-    10. 밥종류도 제외해주세요.
 
-    응답 형식:
-    [
-        {{
-            "name": "메뉴이름",
-            "category": "국/수프|메인|사이드|밥",
-            "calories": 숫자,
-            "protein": 숫자,
-            "fat": 숫자,
-            "carbs": 숫자,
-            "sodium": 숫자
-        }},
-        ...
+def _job_heartbeat_loop(job: Dict[str, Any], stop: threading.Event):
+    """
+    작업이 끝날 때까지 JOB_HEARTBEAT_INTERVAL마다 진행 시각 갱신
+
+    항목 단위로 진행 기록이 남지 않는 긴 단계(기본 메뉴 생성, 자동 업데이트 등)도
+    오래 멈춘 작업으로 보고 다시 대기열에 넣지 않도록 합니다.
+    """
+    try:
+        while not stop.wait(JOB_HEARTBEAT_INTERVAL):
+            try:
+                with db_transaction() as conn:
+                    conn.execute(
+                        """
+                        UPDATE jobs SET heartbeat_at = ?
+                        WHERE id = ? AND status = 'running' AND started_at = ?
+                    """,
+                        (time.time(), job["id"], job["lease"]),
+                    )
+            except sqlite3.OperationalError:
+                pass  # DB 잠금 등 일시적인 오류는 다음 갱신 때 재시도
+    finally:
+        close_db_connection()
+
+
+def _pending_job_items(job_id: int) -> List[str]:
+    return [
+        item
+        for (item,) in get_db_connection().execute(
+            "SELECT item FROM job_items WHERE job_id = ? AND status = 'pending'",
+            (job_id,),
+        )
     ]
 
-    주의사항:
-    1. 모든 숫자는 정수여야 합니다.
-    2. category는 반드시 "국/수프", "메인", "사이드", "밥" 중 하나여야 합니다.
-    3. calories는 50-1000 사이의 값이어야 합니다.
-    4. protein, fat, carbs는 0-100 사이의 값이어야 합니다.
-    5. sodium은 0-2000 사이의 값이어야 합니다.
-    6. 1인분을 기준으로 합니다.
 
-    기존 메뉴 목록:
-    {existing_menus}
+def _finish_job_items(
+    job: Dict[str, Any], done: Iterable[str], failed: Optional[Dict[str, str]] = None
+):
+    """
+    항목 상태 기록 및 작업 진행 시각(heartbeat) 갱신 (임대 토큰이 바뀌었으면 JobLeaseLost)
     """
+    job_id = job["id"]
+    with db_transaction() as conn:
+        _check_job_lease(conn, job)
+        conn.executemany(
+            "UPDATE job_items SET status = 'done' WHERE job_id = ? AND item = ?",
+            [(job_id, item) for item in done],
+        )
+        conn.executemany(
+            """
+            UPDATE job_items SET status = 'failed', error = ?
+            WHERE job_id = ? AND item = ?
+        """,
+            [(error, job_id, item) for item, error in (failed or {}).items()],
+        )
+        conn.execute(
+            "UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id)
+        )
 
-    try:
-        # Gemini API를 사용하여 메뉴 생성
-        response = model.generate_content(
-            prompt.format(existing_menus=list(existing_menu_names))
+
+def _run_bulk_add_job(job: Dict[str, Any]) -> Dict[str, int]:
+    counts = {"inserted": 0, "updated": 0, "skipped": 0}
+    pending = _pending_job_items(job["id"])
+    for i in range(0, len(pending), JOB_CHUNK_SIZE):
+        chunk = pending[i : i + JOB_CHUNK_SIZE]
+        # 분류하지 못한 메뉴는 기본값 대신 실패로 남겨 재제출 때 다시 분류
+        classified = classify_menus(chunk, fallback=False)
+        for key, value in add_menus(classified.values()).items():
+            counts[key] += value
+        _finish_job_items(
+            job,
+            classified,
+            {name: "분류 실패" for name in chunk if name not in classified},
         )
+    return counts
 
-        # 응답에서 JSON 추출
-        import re
-        import json
-
-        # 응답 텍스트 정리
-        response_text = response.text.strip()
-        print("API 응답 원본:", response_text)  # 디버깅용
-
-        # JSON 문자열 추출 시도
-        json_str = None
-
-        # 방법 1: ```json 블록에서 추출
-        json_match = re.search(r"```json\n(.*?)\n```", response_text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(1).strip()
-            print("방법 1로 추출된 JSON:", json_str)  # 디버깅용
-
-        # 방법 2: 일반 JSON 배열에서 추출
-        if not json_str:
-            json_match = re.search(r"\[\s*\{.*?\}\s*\]", response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0).strip()
-                print("방법 2로 추출된 JSON:", json_str)  # 디버깅용
-
-        # 방법 3: 여러 JSON 객체를 배열로 결합
-        if not json_str:
-            json_objects = re.findall(r"\{[^{}]*\}", response_text)
-            if json_objects:
-                json_str = f"[{','.join(json_objects)}]"
-                print("방법 3으로 추출된 JSON:", json_str)  # 디버깅용
-
-        if json_str:
-            try:
-                # JSON 문자열 정리
-                json_str = re.sub(r"\s+", " ", json_str)  # 여러 공백을 하나로
-                json_str = re.sub(r",\s*}", "}", json_str)  # 마지막 쉼표 제거
-                json_str = re.sub(r",\s*]", "]", json_str)  # 배열 마지막 쉼표 제거
-
-                print("정리된 JSON 문자열:", json_str)  # 디버깅용
-
-                # JSON 파싱
-                menus = json.loads(json_str)
-                print("파싱된 메뉴 목록:", menus)  # 디버깅용
-
-                # 메뉴 추가
-                added_count = 0
-                for menu in menus:
-                    if menu["name"] not in existing_menu_names:
-                        # 값 검증 및 변환
-                        if menu["category"] not in ["국/수프", "메인", "사이드", "밥"]:
-                            menu["category"] = "메인"
-
-                        for field in ["calories", "protein", "fat", "carbs", "sodium"]:
-                            try:
-                                menu[field] = int(
-                                    float(str(menu[field]).replace(",", ""))
-                                )
-                            except (ValueError, TypeError):
-                                defaults = {
-                                    "calories": 300,
-                                    "protein": 10,
-                                    "fat": 5,
-                                    "carbs": 50,
-                                    "sodium": 500,
-                                }
-                                menu[field] = defaults[field]
-
-                        add_menu(menu)
-                        added_count += 1
-                        existing_menu_names.add(menu["name"])
-
-                return added_count
-            except json.JSONDecodeError as e:
-                print(f"JSON 파싱 오류: {str(e)}")
-                print(f"문제가 있는 JSON 문자열: {json_str}")
-                print(f"오류 위치: {e.pos}")
-                print(f"오류 라인: {e.lineno}")
-                print(f"오류 컬럼: {e.colno}")
-                return 0
-        else:
-            print("메뉴 생성 실패: JSON 형식의 응답을 찾을 수 없습니다.")
-            print(f"API 응답: {response_text}")
-            return 0
 
-    except Exception as e:
-        print(f"메뉴 생성 중 오류 발생: {str(e)}")
-        print(f"오류 타입: {type(e)}")
-        import traceback
+def _run_default_menus_job(job: Dict[str, Any]) -> Dict[str, int]:
+    added = add_default_korean_menus()
+    _finish_job_items(job, _pending_job_items(job["id"]))
+    return {"inserted": added}
 
-        print(f"상세 오류 정보:\n{traceback.format_exc()}")
-        return 0
 
+def _run_auto_update_job(job: Dict[str, Any]) -> Dict[str, int]:
+    candidates = auto_update_menu_db()
+    _finish_job_items(job, _pending_job_items(job["id"]))
+    return {"prune_candidates": len(candidates)}
 
-def bulk_add(menu_names: List[str]):
-    """
-    여러 메뉴를 일괄 추가
 
-    Args:
-        menu_names (List[str]): 추가할 메뉴 이름 리스트
-    """
-    for menu_name in menu_names:
-        menu_info = classify_menu(menu_name)
-        if menu_info:
-            add_menu(menu_info)
+def _run_prune_menus_job(job: Dict[str, Any]) -> Dict[str, int]:
+    pruned = prune_menus(**job["params"])
+    _finish_job_items(job, _pending_job_items(job["id"]))
+    return {"pruned": len(pruned)}
 
 
-def get_all_menus() -> pd.DataFrame:
-    """
-    데이터베이스의 모든 메뉴 정보를 DataFrame으로 반환
-    """
-    conn = get_db_connection()
-    df = pd.read_sql_query("SELECT * FROM menus", conn)
-    conn.close()
-    return df
+_JOB_RUNNERS: Dict[str, Callable[[Dict[str, Any]], Dict[str, int]]] = {
+    "bulk_add": _run_bulk_add_job,
+    "default_menus": _run_default_menus_job,
+    "auto_update": _run_auto_update_job,
+    "prune_menus": _run_prune_menus_job,
+}
 
 
-def delete_menu(menu_name: str):
+def _run_job(job: Dict[str, Any]):
     """
-    특정 메뉴 삭제
+    작업 하나를 실행하고 결과 기록
 
-    Args:
-        menu_name (str): 삭제할 메뉴 이름
+    실행하는 동안 별도 스레드가 진행 시각을 갱신하고, 실행 후에도 처리되지 않은
+    항목은 실패로 기록합니다. 작업이 다른 실행 스레드에 다시 배정되었으면
+    (임대 토큰이 바뀌었으면) 아무것도 기록하지 않습니다.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM menus WHERE name = ?", (menu_name,))
-    conn.commit()
-    conn.close()
+    stop = threading.Event()
+    heartbeat = threading.Thread(
+        target=_job_heartbeat_loop,
+        args=(job, stop),
+        name=f"meal-job-heartbeat-{job['id']}",
+        daemon=True,
+    )
+    heartbeat.start()
+    try:
+        result = _JOB_RUNNERS[job["kind"]](job)
+    except JobLeaseLost:
+        return
+    except Exception as e:
+        status, result, error = "failed", None, str(e)
+    else:
+        status, error = "done", None
+    finally:
+        stop.set()
+        heartbeat.join()
+    result_json = json.dumps(result, ensure_ascii=False) if result is not None else None
+    try:
+        with db_transaction() as conn:
+            _check_job_lease(conn, job)
+            conn.execute(
+                """
+                UPDATE job_items SET status = 'failed', error = '처리되지 않음'
+                WHERE job_id = ? AND status = 'pending'
+            """,
+                (job["id"],),
+            )
+            failed = conn.execute(
+                "SELECT COUNT(*) FROM job_items WHERE job_id = ? AND status = 'failed'",
+                (job["id"],),
+            ).fetchone()[0]
+            if failed and status == "done":
+                status, error = "failed", f"{failed}개 항목 처리 실패"
+            conn.execute(
+                """
+                UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?
+                WHERE id = ?
+            """,
+                (status, result_json, error, time.time(), job["id"]),
+            )
+    except JobLeaseLost:
+        pass
+
+
+_job_workers: List[threading.Thread] = []
+_job_stop = threading.Event()
+_job_workers_lock = threading.Lock()
 
 
-def make_plan(meal_type: str = "점심", days: int = 5) -> pd.DataFrame:
+def _job_worker_loop():
+    while not _job_stop.is_set():
+        try:
+            job = _claim_next_job()
+        except sqlite3.OperationalError:
+            job = None  # DB 잠금 등 일시적인 오류는 다음 확인 때 재시도
+        if job is None:
+            _job_stop.wait(JOB_POLL_INTERVAL)
+            continue
+        _run_job(job)
+    close_db_connection()
+
+
+def start_job_workers(num_workers: Optional[int] = None) -> int:
     """
-    주간 식단 계획 생성
+    백그라운드 작업 실행 스레드 시작 (이미 실행 중이면 그대로 둠)
 
     Args:
-        meal_type (str): 식사 유형 ("점심" 또는 "점심저녁")
-        days (int): 계획할 일수 (5 또는 7)
+        num_workers (Optional[int]): 스레드 수 (기본값 JOB_WORKERS)
 
     Returns:
-        pd.DataFrame: 생성된 식단 계획
+        int: 실행 중인 스레드 수
     """
-    # 데이터베이스에서 모든 메뉴 가져오기
-    all_menus = get_all_menus()
-
-    # 요일 리스트 생성
-    weekdays = ["월", "화", "수", "목", "금", "토", "일"][:days]
-
-    # 메뉴 카테고리별 분류
-    available_soup = all_menus[all_menus["category"] == "국/수프"]["name"].tolist()
-    available_main = all_menus[all_menus["category"] == "메인"]["name"].tolist()
-    available_side = all_menus[all_menus["category"] == "사이드"]["name"].tolist()
-
-    # 사용된 메뉴 추적
-    used_menus = set()
+    with _job_workers_lock:
+        if not _job_workers:
+            _job_stop.clear()
+            for i in range(num_workers or JOB_WORKERS):
+                worker = threading.Thread(
+                    target=_job_worker_loop, name=f"meal-job-worker-{i}", daemon=True
+                )
+                worker.start()
+                _job_workers.append(worker)
+        return len(_job_workers)
 
-    # 식단 계획 데이터 저장
-    plan_data = []
 
-    for day in weekdays:
-        day_plan = {"요일": day}
+def stop_job_workers(timeout: Optional[float] = None):
+    """
+    백그라운드 작업 실행 스레드 종료 (실행 중인 작업이 끝나면 멈춤)
 
-        # 점심 메뉴 선택
-        day_plan["잡곡밥"] = "잡곡밥"  # 항상 잡곡밥 포함
+    Args:
+        timeout (Optional[float]): 스레드마다 기다릴 최대 시간 (초)
+    """
+    with _job_workers_lock:
+        _job_stop.set()
+        for worker in _job_workers:
+            worker.join(timeout)
+        _job_workers.clear()
 
-        # 국/수프 선택
-        available_soup_filtered = [s for s in available_soup if s not in used_menus]
-        if available_soup_filtered:
-            day_plan["국/수프"] = random.choice(available_soup_filtered)
-        else:
-            day_plan["국/수프"] = random.choice(available_soup)
-        used_menus.add(day_plan["국/수프"])
 
-        # 메인 메뉴 선택
-        available_main_filtered = [m for m in available_main if m not in used_menus]
-        if available_main_filtered:
-            day_plan["메인"] = random.choice(available_main_filtered)
-        else:
-            day_plan["메인"] = random.choice(available_main)
-        used_menus.add(day_plan["메인"])
-
-        # 사이드 메뉴 선택 (2개)
-        for i in range(2):
-            available_side_filtered = [s for s in available_side if s not in used_menus]
-            if available_side_filtered:
-                day_plan[f"사이드{i+1}"] = random.choice(available_side_filtered)
-            else:
-                day_plan[f"사이드{i+1}"] = random.choice(available_side)
-            used_menus.add(day_plan[f"사이드{i+1}"])
+# 명령줄 종료 코드
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
 
-        # 저녁 메뉴 선택 (점심저녁 타입인 경우)
-        if meal_type == "점심저녁":
-            day_plan["저녁_잡곡밥"] = "잡곡밥"
 
-            # 저녁 국/수프
-            available_soup_filtered = [s for s in available_soup if s not in used_menus]
-            if available_soup_filtered:
-                day_plan["저녁_국/수프"] = random.choice(available_soup_filtered)
-            else:
-                day_plan["저녁_국/수프"] = random.choice(available_soup)
-            used_menus.add(day_plan["저녁_국/수프"])
+def _read_plan_file(path: str) -> pd.DataFrame:
+    """
+    식단 계획 파일 읽기 (xlsx/xls 메뉴판, CSV, JSON)
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".xlsx", ".xls"):
+        plan_df, diagnostics = ingest_menu_board(path)
+        for warning in diagnostics["warnings"]:
+            print(warning, file=sys.stderr)
+        return plan_df
+    if extension == ".csv":
+        return pd.read_csv(path, dtype=str, keep_default_na=False)
+    if extension == ".json":
+        with open(path, encoding="utf-8") as f:
+            return pd.DataFrame(json.load(f)).fillna("")
+    raise ValueError(f"지원하지 않는 파일 형식입니다: {path}")
 
-            # 저녁 메인
-            available_main_filtered = [m for m in available_main if m not in used_menus]
-            if available_main_filtered:
-                day_plan["저녁_메인"] = random.choice(available_main_filtered)
-            else:
-                day_plan["저녁_메인"] = random.choice(available_main)
-            used_menus.add(day_plan["저녁_메인"])
-
-            # 저녁 사이드 (2개)
-            for i in range(2):
-                available_side_filtered = [
-                    s for s in available_side if s not in used_menus
-                ]
-                if available_side_filtered:
-                    day_plan[f"저녁_사이드{i+1}"] = random.choice(
-                        available_side_filtered
-                    )
-                else:
-                    day_plan[f"저녁_사이드{i+1}"] = random.choice(available_side)
-                used_menus.add(day_plan[f"저녁_사이드{i+1}"])
 
-        plan_data.append(day_plan)
+def _write_output(data: Any, output_format: str, output: Optional[str]):
+    """
+    명령 결과를 JSON 또는 CSV로 출력 (output이 없으면 표준 출력)
+    """
+    if output_format == "csv":
+        frame = data if isinstance(data, pd.DataFrame) else pd.DataFrame([data])
+        text = frame.to_csv(index=False)
+    else:
+        if isinstance(data, pd.DataFrame):
+            # NaN/날짜 변환은 pandas에 맡기고 출력 형식만 통일
+            data = json.loads(data.to_json(orient="records", force_ascii=False))
+        text = json.dumps(data, ensure_ascii=False, indent=2, default=str) + "\n"
+
+    if output:
+        with open(output, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+
+def _cli_plan(args) -> Any:
+    plan_df, score = plan_menus(
+        meal_type=args.meal_type,
+        days=args.days,
+        start_date=args.start,
+        end_date=args.end,
+        holidays=args.holiday,
+        repeat_window=args.repeat_window,
+        time_budget=args.time_budget,
+        seed=args.seed,
+    )
+    print(f"영양 목표 편차 점수: {score:.3f}", file=sys.stderr)
+    if args.site:
+        save_plan(plan_df, args.site)
+    return plan_df
 
-    return pd.DataFrame(plan_data)
 
+def _cli_analyze(args) -> Any:
+    return analyze_menu_plan(_read_plan_file(args.board))
 
-def export_plan(plan_df: pd.DataFrame, filename: str) -> str:
-    """
-    식단 계획을 Excel 파일로 내보내기
 
-    Args:
-        plan_df (pd.DataFrame): 식단 계획 데이터
-        filename (str): 저장할 파일 이름
+def _cli_import(args) -> Any:
+    menus_df = pd.read_excel(args.menus)
+    if "name" not in menus_df.columns:
+        raise ValueError("엑셀 파일에 'name' 열이 필요합니다.")
+    menu_names = menus_df["name"].dropna().astype(str).tolist()
+    return bulk_add(menu_names)
 
-    Returns:
-        str: 저장된 파일 경로
-    """
-    # exports 디렉토리 생성
-    os.makedirs("exports", exist_ok=True)
 
-    # 파일 경로 설정
-    filepath = os.path.join(
-        "exports", f"{filename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    )
+def _cli_dedupe(args) -> Any:
+    return find_duplicate_menus(args.threshold)
 
-    # Excel 작성기 생성
-    with pd.ExcelWriter(filepath, engine="xlsxwriter") as writer:
-        # 점심 시트 작성
-        lunch_df = plan_df[["요일", "잡곡밥", "국/수프", "메인", "사이드1", "사이드2"]]
-        lunch_df = lunch_df.set_index("요일").T  # 요일을 열로 변경
-        lunch_df.to_excel(writer, sheet_name="점심")
-
-        # 저녁 시트 작성 (있는 경우)
-        if "저녁_잡곡밥" in plan_df.columns:
-            dinner_df = plan_df[
-                [
-                    "요일",
-                    "저녁_잡곡밥",
-                    "저녁_국/수프",
-                    "저녁_메인",
-                    "저녁_사이드1",
-                    "저녁_사이드2",
-                ]
-            ]
-            dinner_df = dinner_df.set_index("요일").T  # 요일을 열로 변경
-            dinner_df.to_excel(writer, sheet_name="저녁")
-
-        # 영양 정보 분석 및 저장
-        nutrition_df = analyze_menu_plan(plan_df)
-
-        # 영양소 컬럼명을 한국어로 변경
-        nutrition_df = nutrition_df.rename(
-            columns={
-                "calories": "칼로리",
-                "protein": "단백질",
-                "fat": "지방",
-                "carbs": "탄수화물",
-                "sodium": "나트륨",
-            }
-        )
 
-        # 영양 정보 피벗 테이블 생성
-        nutrition_pivot = nutrition_df.pivot_table(
-            index="구분",
-            columns="요일",
-            values=["칼로리", "단백질", "지방", "탄수화물", "나트륨"],
-            aggfunc="sum",
-        )
-        nutrition_pivot.to_excel(writer, sheet_name="영양 정보")
-
-        # 일일 영양소 합계 계산 및 저장
-        daily_nutrition = nutrition_df.groupby("요일").agg(
-            {
-                "칼로리": "sum",
-                "단백질": "sum",
-                "지방": "sum",
-                "탄수화물": "sum",
-                "나트륨": "sum",
-            }
+def _cli_merge(args) -> Any:
+    if not args.yes:
+        raise ValueError(
+            "합친 메뉴는 메뉴 DB에서 삭제됩니다. 확인했다면 --yes를 함께 지정하세요."
         )
-        daily_nutrition = daily_nutrition.T  # 요일을 열로 변경
-        daily_nutrition.to_excel(writer, sheet_name="일일 영양소 합계")
+    return {"keep": args.keep, "merged": merge_menus(args.keep, args.names)}
 
-    return filepath
-
-
-def analyze_menu_plan(plan_df: pd.DataFrame) -> pd.DataFrame:
-    """
-    식단 계획의 영양 정보 분석
 
-    Args:
-        plan_df (pd.DataFrame): 식단 계획 데이터
+def _cli_prune(args) -> Any:
+    names = prune_menus(args.days, dry_run=not args.apply)
+    return {"pruned" if args.apply else "candidates": names}
 
-    Returns:
-        pd.DataFrame: 영양 정보 분석 결과
-    """
-    # 데이터베이스의 기존 메뉴 가져오기
-    existing_menus = set(get_all_menus()["name"])
 
-    # 영양 정보 데이터 저장
-    nutrition_data = []
+def _cli_restore(args) -> Any:
+    return {"restored": restore_menus(args.names or None)}
 
-    # 점심 메뉴 분석
-    lunch_columns = ["잡곡밥", "국/수프", "메인", "사이드1", "사이드2"]
-    for _, row in plan_df.iterrows():
-        for col in lunch_columns:
-            menu_name = row[col]
-            if menu_name not in existing_menus:
-                menu_info = classify_menu(menu_name)
-                if menu_info:
-                    add_menu(menu_info)
 
-            menu_data = get_all_menus()[get_all_menus()["name"] == menu_name].iloc[0]
-            nutrition_data.append(
-                {
-                    "요일": row["요일"],
-                    "구분": f"점심_{col}",
-                    "메뉴": menu_name,
-                    "칼로리": menu_data["calories"],
-                    "단백질": menu_data["protein"],
-                    "지방": menu_data["fat"],
-                    "탄수화물": menu_data["carbs"],
-                    "나트륨": menu_data["sodium"],
-                }
-            )
+def _cli_report(args) -> Any:
+    if args.plan:
+        filepath = generate_monthly_report(_read_plan_file(args.plan))
+    else:
+        filepath = generate_monthly_report(
+            site=args.site, start_date=args.start, end_date=args.end
+        )
+    if not filepath:
+        raise RuntimeError("월간 보고서를 생성하지 못했습니다.")
+    return {"report": filepath}
 
-    # 저녁 메뉴 분석 (있는 경우)
-    if "저녁_잡곡밥" in plan_df.columns:
-        dinner_columns = [
-            "저녁_잡곡밥",
-            "저녁_국/수프",
-            "저녁_메인",
-            "저녁_사이드1",
-            "저녁_사이드2",
-        ]
-        for _, row in plan_df.iterrows():
-            for col in dinner_columns:
-                menu_name = row[col]
-                if menu_name not in existing_menus:
-                    menu_info = classify_menu(menu_name)
-                    if menu_info:
-                        add_menu(menu_info)
-
-                menu_data = get_all_menus()[get_all_menus()["name"] == menu_name].iloc[
-                    0
-                ]
-                nutrition_data.append(
-                    {
-                        "요일": row["요일"],
-                        "구분": f"저녁_{col}",
-                        "메뉴": menu_name,
-                        "칼로리": menu_data["calories"],
-                        "단백질": menu_data["protein"],
-                        "지방": menu_data["fat"],
-                        "탄수화물": menu_data["carbs"],
-                        "나트륨": menu_data["sodium"],
-                    }
-                )
 
-    return pd.DataFrame(nutrition_data)
+def _cli_export(args) -> Any:
+    plan_df = _read_plan_file(args.plan)
+    if args.output_xlsx:
+        with open(args.output_xlsx, "wb") as f:
+            f.write(export_plan(plan_df, to_disk=False))
+        return {"export": args.output_xlsx}
+    return {"export": export_plan(plan_df, args.name)}
 
 
-def update_menu_nutrition(menu_name: str, nutrition: Dict[str, float]):
+def _add_common_arguments(parser: argparse.ArgumentParser, defaults: bool = True):
     """
-    메뉴의 영양 정보 업데이트
+    모든 명령에 공통인 옵션 추가 (--db, --format, -o/--output, --metrics)
 
-    Args:
-        menu_name (str): 업데이트할 메뉴 이름
-        nutrition (Dict[str, float]): 새로운 영양 정보
+    하위 명령용 파서는 defaults=False로 만들어 기본값을 두지 않으므로, 명령 앞에
+    준 옵션 값이 하위 명령의 기본값으로 덮어써지지 않습니다.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
 
-    cursor.execute(
-        """
-        UPDATE menus
-        SET calories = ?, protein = ?, fat = ?, carbs = ?, sodium = ?
-        WHERE name = ?
-    """,
-        (
-            nutrition["calories"],
-            nutrition["protein"],
-            nutrition["fat"],
-            nutrition["carbs"],
-            nutrition["sodium"],
-            menu_name,
-        ),
-    )
+    def default(value: Any) -> Any:
+        return value if defaults else argparse.SUPPRESS
 
-    conn.commit()
-    conn.close()
+    parser.add_argument(
+        "--db",
+        default=default(None),
+        help="SQLite 데이터베이스 파일 경로 (기본값 MEAL_DB_PATH 또는 meal.db)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["json", "csv"],
+        default=default("json"),
+        help="출력 형식",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=default(None),
+        help="결과를 저장할 파일 (기본값 표준 출력)",
+    )
+    parser.add_argument(
+        "--metrics",
+        default=default(None),
+        help="성능 지표를 저장할 파일 (.json이면 JSON, 그 외 Prometheus)",
+    )
 
 
-def update_menu_category(menu_name: str, category: str):
+def build_arg_parser() -> argparse.ArgumentParser:
     """
-    메뉴의 카테고리 업데이트
+    python -m meal_ai 명령줄 인자 파서 생성
 
-    Args:
-        menu_name (str): 업데이트할 메뉴 이름
-        category (str): 새로운 카테고리
+    공통 옵션은 명령 앞과 뒤 어디에 주어도 됩니다
+    (예: python -m meal_ai --format csv analyze 메뉴판.xlsx -o nutrition.csv).
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    parser = argparse.ArgumentParser(
+        prog="python -m meal_ai", description="식단 계획 및 영양 분석 (명령줄)"
+    )
+    _add_common_arguments(parser)
+    common = argparse.ArgumentParser(add_help=False)
+    _add_common_arguments(common, defaults=False)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    plan = subparsers.add_parser("plan", help="식단 계획 생성", parents=[common])
+    plan.add_argument("--meal-type", choices=["점심", "점심저녁"], default="점심")
+    plan.add_argument(
+        "--days", type=int, default=5, help="제공일 수 (7일을 넘고 --start가 없으면 오늘부터)"
+    )
+    plan.add_argument("--start", help="시작 날짜 (YYYY-MM-DD)")
+    plan.add_argument("--end", help="종료 날짜 (YYYY-MM-DD)")
+    plan.add_argument(
+        "--holiday", action="append", help="제외할 날짜 (YYYY-MM-DD, 여러 번 지정 가능)"
+    )
+    plan.add_argument("--repeat-window", type=int, help="같은 메뉴 반복 금지 기간 (일)")
+    plan.add_argument("--time-budget", type=float, help="최적화 시간 (초)")
+    plan.add_argument("--seed", type=int, help="난수 시드")
+    plan.add_argument("--site", help="식단 이력에 저장할 사업장 이름")
+    plan.set_defaults(handler=_cli_plan)
+
+    analyze = subparsers.add_parser("analyze", help="메뉴판 영양 정보 분석", parents=[common])
+    analyze.add_argument("board", help="메뉴판 파일 (xlsx, csv, json)")
+    analyze.set_defaults(handler=_cli_analyze)
+
+    import_ = subparsers.add_parser(
+        "import", help="엑셀 파일의 메뉴를 DB에 추가", parents=[common]
+    )
+    import_.add_argument("menus", help="'name' 열이 있는 엑셀 파일")
+    import_.set_defaults(handler=_cli_import)
 
-    cursor.execute(
-        """
-        UPDATE menus
-        SET category = ?
-        WHERE name = ?
-    """,
-        (category, menu_name),
+    dedupe = subparsers.add_parser("dedupe", help="이름이 비슷한 중복 메뉴 찾기", parents=[common])
+    dedupe.add_argument(
+        "--threshold", type=float, help="최소 유사도 (기본값 MENU_MERGE_THRESHOLD)"
     )
+    dedupe.set_defaults(handler=_cli_dedupe)
 
-    conn.commit()
-    conn.close()
+    merge = subparsers.add_parser(
+        "merge", help="지정한 중복 메뉴를 한 메뉴로 합치기", parents=[common]
+    )
+    merge.add_argument("keep", help="남길 메뉴 이름")
+    merge.add_argument("names", nargs="+", help="합친 뒤 삭제할 메뉴 이름")
+    merge.add_argument(
+        "--yes", action="store_true", help="메뉴 삭제를 확인 (없으면 합치지 않음)"
+    )
+    merge.set_defaults(handler=_cli_merge)
+
+    prune = subparsers.add_parser("prune", help="오래 제공하지 않은 메뉴 정리", parents=[common])
+    prune.add_argument(
+        "--days",
+        type=int,
+        default=MENU_PRUNE_UNUSED_DAYS,
+        help="사용하지 않은 기간 (일, 기본값 MEAL_MENU_PRUNE_UNUSED_DAYS)",
+    )
+    prune.add_argument(
+        "--apply",
+        action="store_true",
+        help="대상 메뉴를 보관 후 삭제 (없으면 대상만 출력)",
+    )
+    prune.set_defaults(handler=_cli_prune)
 
+    restore = subparsers.add_parser(
+        "restore", help="정리(보관)한 메뉴를 메뉴 DB로 되돌리기", parents=[common]
+    )
+    restore.add_argument(
+        "names", nargs="*", help="되돌릴 메뉴 이름 (생략하면 보관된 메뉴 전체)"
+    )
+    restore.set_defaults(handler=_cli_restore)
 
-def get_seasonal_menus() -> list:
-    """
-    계절별 메뉴 추천을 위해 AI를 활용하여 메뉴 생성
-    Returns:
-        List[Dict[str, Any]]: 계절별 추천 메뉴 목록
-    """
-    current_month = datetime.now().month
-    season = (
-        "봄"
-        if 3 <= current_month <= 5
-        else (
-            "여름"
-            if 6 <= current_month <= 8
-            else ("가을" if 9 <= current_month <= 11 else "겨울")
-        )
+    report = subparsers.add_parser("report", help="월간 식단 보고서 생성", parents=[common])
+    report.add_argument(
+        "plan", nargs="?", help="식단 계획 파일 (생략하면 식단 이력에서 불러옴)"
     )
-    prompt = f"""
-    {season}에 어울리는 한식 메뉴 5개를 추천해주세요.
-    계절에 맞는 제철 식재료를 활용한 메뉴여야 합니다.
-    응답 형식:
-    [
-        {{
-            "name": "메뉴이름",
-            "category": "국/수프|메인|사이드|밥",
-            "calories": 숫자,
-            "protein": 숫자,
-            "fat": 숫자,
-            "carbs": 숫자,
-            "sodium": 숫자,
-            "seasonal_ingredients": ["제철재료1", "제철재료2", ...]
-        }},
-        ...
-    ]
-    """
-    try:
-        response = model.generate_content(prompt)
-        import re
+    report.add_argument(
+        "--site", default=PLAN_DEFAULT_SITE, help="식단 이력의 사업장 이름"
+    )
+    report.add_argument("--start", help="식단 이력 시작 날짜 (기본값 이번 달 1일)")
+    report.add_argument("--end", help="식단 이력 종료 날짜 (기본값 이번 달 말일)")
+    report.set_defaults(handler=_cli_report)
 
-        json_str = re.search(r"```json\\n(.*?)\\n```", response.text, re.DOTALL)
-        if json_str:
-            menus = json.loads(json_str.group(1))
-        else:
-            menus = json.loads(response.text)
-        # 필수 필드 보정
-        for menu in menus:
-            for field in ["calories", "protein", "fat", "carbs", "sodium"]:
-                try:
-                    menu[field] = int(float(str(menu[field]).replace(",", "")))
-                except Exception:
-                    menu[field] = 0
-        return menus
-    except Exception as e:
-        print(f"계절별 메뉴 생성 중 오류 발생: {str(e)}")
-        return []
+    export = subparsers.add_parser(
+        "export", help="식단 계획을 Excel 파일로 내보내기", parents=[common]
+    )
+    export.add_argument("plan", help="식단 계획 파일 (xlsx, csv, json)")
+    export.add_argument(
+        "--xlsx", dest="output_xlsx", help="저장할 Excel 파일 경로 (기본값 exports/)"
+    )
+    export.add_argument("--name", default="식단_계획", help="exports/ 파일 이름")
+    export.set_defaults(handler=_cli_export)
+    return parser
 
 
-def optimize_nutrition_balance(plan_df: pd.DataFrame) -> pd.DataFrame:
-    """
-    식단 계획의 영양 균형을 최적화
-    Args:
-        plan_df (pd.DataFrame): 현재 식단 계획
-    Returns:
-        pd.DataFrame: 최적화된 식단 계획
+def main(argv: Optional[List[str]] = None) -> int:
     """
-    try:
-        # 현재 영양 정보 분석
-        current_nutrition = analyze_menu_plan(plan_df)
-        daily_nutrition = current_nutrition.groupby("요일").agg(
-            {
-                "칼로리": "sum",
-                "단백질": "sum",
-                "지방": "sum",
-                "탄수화물": "sum",
-                "나트륨": "sum",
-            }
-        )
-        # 목표 영양소 기준
-        target_nutrition = {
-            "칼로리": 2000,
-            "단백질": 60,
-            "지방": 65,
-            "탄수화물": 250,
-            "나트륨": 2000,
-        }
-        # 영양소 균형이 맞지 않는 요일 찾기
-        imbalanced_days = []
-        for day in daily_nutrition.index:
-            day_nutrition = daily_nutrition.loc[day]
-            if any(
-                abs(day_nutrition[nutrient] - target_nutrition[nutrient])
-                / target_nutrition[nutrient]
-                > 0.2
-                for nutrient in target_nutrition
-            ):
-                imbalanced_days.append(day)
-        # 균형이 맞지 않는 요일의 메뉴 최적화
-        for day in imbalanced_days:
-            day_nutrition = daily_nutrition.loc[day]
-            for nutrient in target_nutrition:
-                if day_nutrition[nutrient] < target_nutrition[nutrient] * 0.8:
-                    alternative_menus = get_all_menus()
-                    alternative_menus = alternative_menus[
-                        alternative_menus[nutrient] > day_nutrition[nutrient] / 3
-                    ]
-                    if not alternative_menus.empty:
-                        current_categories = set(
-                            plan_df.loc[plan_df["요일"] == day]
-                            .iloc[0]
-                            .drop("요일")
-                            .values
-                        )
-                        alternative_menus = alternative_menus[
-                            ~alternative_menus["category"].isin(current_categories)
-                        ]
-                        if not alternative_menus.empty:
-                            new_menu = alternative_menus.sample(1).iloc[0]
-                            for col in plan_df.columns:
-                                if (
-                                    col != "요일"
-                                    and plan_df.loc[plan_df["요일"] == day, col].iloc[0]
-                                    in current_categories
-                                ):
-                                    plan_df.loc[plan_df["요일"] == day, col] = new_menu[
-                                        "name"
-                                    ]
-                                    break
-        return plan_df
-    except Exception as e:
-        print(f"영양 균형 최적화 중 오류 발생: {str(e)}")
-        return plan_df
-
+    python -m meal_ai 명령줄 진입점
 
-def manage_menu_diversity(plan_df: pd.DataFrame) -> pd.DataFrame:
-    """
-    메뉴의 다양성을 관리하고 중복을 최소화
     Args:
-        plan_df (pd.DataFrame): 현재 식단 계획
-    Returns:
-        pd.DataFrame: 다양성이 개선된 식단 계획
-    """
-    try:
-        menu_counts = {}
-        for col in plan_df.columns:
-            if col != "요일":
-                for menu in plan_df[col]:
-                    menu_counts[menu] = menu_counts.get(menu, 0) + 1
-        overused_menus = {
-            menu: count for menu, count in menu_counts.items() if count >= 2
-        }
-        for menu, count in overused_menus.items():
-            menu_category = get_all_menus()[get_all_menus()["name"] == menu][
-                "category"
-            ].iloc[0]
-            alternative_menus = get_all_menus()[
-                (get_all_menus()["category"] == menu_category)
-                & (get_all_menus()["name"] != menu)
-            ]
-            if not alternative_menus.empty:
-                for col in plan_df.columns:
-                    if col != "요일":
-                        for idx in plan_df[plan_df[col] == menu].index:
-                            new_menu = alternative_menus.sample(1).iloc[0]["name"]
-                            plan_df.at[idx, col] = new_menu
-        return plan_df
-    except Exception as e:
-        print(f"메뉴 다양성 관리 중 오류 발생: {str(e)}")
-        return plan_df
-
+        argv (Optional[List[str]]): 명령줄 인자 (기본값 sys.argv[1:])
 
-def generate_monthly_report(plan_df: pd.DataFrame) -> str:
-    """
-    월간 식단 보고서 생성
-    Args:
-        plan_df (pd.DataFrame): 식단 계획 데이터
     Returns:
-        str: 생성된 보고서 파일 경로
+        int: 종료 코드 (0 성공, 1 실행 오류, 2 잘못된 인자 또는 입력)
     """
+    parser = build_arg_parser()
     try:
-        os.makedirs("reports", exist_ok=True)
-        filepath = os.path.join(
-            "reports", f"월간_식단_보고서_{datetime.now().strftime('%Y%m')}.xlsx"
-        )
-        with pd.ExcelWriter(filepath, engine="xlsxwriter") as writer:
-            plan_df.to_excel(writer, sheet_name="식단 계획", index=False)
-            nutrition_df = analyze_menu_plan(plan_df)
-            nutrition_df.to_excel(writer, sheet_name="영양 정보", index=False)
-            menu_stats = pd.DataFrame()
-            for col in plan_df.columns:
-                if col != "요일":
-                    menu_counts = plan_df[col].value_counts()
-                    menu_stats[col] = menu_counts
-            menu_stats.to_excel(writer, sheet_name="메뉴 사용 통계")
-            daily_nutrition = nutrition_df.groupby("요일").agg(
-                {
-                    "칼로리": "sum",
-                    "단백질": "sum",
-                    "지방": "sum",
-                    "탄수화물": "sum",
-                    "나트륨": "sum",
-                }
-            )
-            target_nutrition = {
-                "칼로리": 2000,
-                "단백질": 60,
-                "지방": 65,
-                "탄수화물": 250,
-                "나트륨": 2000,
-            }
-            achievement_rate = pd.DataFrame()
-            for nutrient in target_nutrition:
-                achievement_rate[nutrient] = (
-                    daily_nutrition[nutrient] / target_nutrition[nutrient] * 100
-                ).round(1)
-            achievement_rate.to_excel(writer, sheet_name="영양소 목표 달성률")
-        return filepath
-    except Exception as e:
-        print(f"월간 보고서 생성 중 오류 발생: {str(e)}")
-        return ""
-
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return EXIT_OK if e.code == 0 else EXIT_USAGE
 
-def auto_update_menu_db():
-    """
-    메뉴 데이터베이스 자동 업데이트
-    - 새로운 트렌드 메뉴 추가
-    - 계절별 메뉴 업데이트
-    - 인기도 기반 메뉴 관리
-    """
+    if args.db:
+        set_db_path(args.db)
     try:
-        seasonal_menus = get_seasonal_menus()
-        for menu in seasonal_menus:
-            if menu["name"] not in set(get_all_menus()["name"]):
-                add_menu(menu)
-        prompt = """
-        최근 인기 있는 한식 메뉴 5개를 추천해주세요.
-        트렌디하고 현대적인 메뉴여야 합니다.
-        응답 형식:
-        [
-            {{
-                "name": "메뉴이름",
-                "category": "국/수프|메인|사이드|밥",
-                "calories": 숫자,
-                "protein": 숫자,
-                "fat": 숫자,
-                "carbs": 숫자,
-                "sodium": 숫자,
-                "trend_reason": "인기 이유"
-            }},
-            ...
-        ]
-        """
-        response = model.generate_content(prompt)
-        import re
-
-        json_str = re.search(r"```json\\n(.*?)\\n```", response.text, re.DOTALL)
-        if json_str:
-            trend_menus = json.loads(json_str.group(1))
-        else:
-            trend_menus = json.loads(response.text)
-        for menu in trend_menus:
-            if menu["name"] not in set(get_all_menus()["name"]):
-                add_menu(menu)
-        menu_usage = pd.DataFrame()
-        for col in get_all_menus().columns:
-            if col != "name":
-                menu_usage[col] = get_all_menus()[col].value_counts()
-        unused_menus = menu_usage[menu_usage.sum(axis=1) == 0].index
-        for menu in unused_menus:
-            delete_menu(menu)
+        init_db()
+        result = args.handler(args)
+        _write_output(result, args.format, args.output)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"오류: {str(e)}", file=sys.stderr)
+        return EXIT_USAGE
     except Exception as e:
-        print(f"메뉴 DB 자동 업데이트 중 오류 발생: {str(e)}")
-        return
+        print(f"실행 중 오류 발생: {str(e)}", file=sys.stderr)
+        return EXIT_ERROR
+    finally:
+        if args.metrics:
+            export_metrics(
+                args.metrics, "json" if args.metrics.endswith(".json") else "prometheus"
+            )
+    return EXIT_OK
 
 
 if __name__ == "__main__":
-    # 데이터베이스 초기화
-    init_db()
-
-    # Streamlit UI 설정
-    st.title("식단 계획 및 영양 분석 시스템")
-
-    # 기본 한식 메뉴 추가 버튼
-    if st.button("기본 한식 메뉴 추가"):
-        added_count = add_default_korean_menus()
-        st.success(f"{added_count}개의 새로운 한식 메뉴가 추가되었습니다.")
-
-    # 메뉴판 업로드 섹션
-    st.header("메뉴판 분석")
-    st.markdown(
-        """
-    엑셀 파일을 업로드하여 메뉴판을 분석하세요.
-    파일은 '점심'과 '저녁' 시트를 포함해야 합니다.
-    """
-    )
-
-    uploaded_file = st.file_uploader("엑셀 파일 선택", type=["xlsx", "xls"])
-
-    if uploaded_file:
-        try:
-            # 엑셀 파일 파싱
-            excel_file = pd.ExcelFile(uploaded_file)
-            sheet_names = excel_file.sheet_names
-
-            if not any(sheet in sheet_names for sheet in ["점심", "저녁"]):
-                st.error("'점심' 또는 '저녁' 시트가 필요합니다.")
-            else:
-                # 데이터 병합을 위한 준비
-                final_columns = [
-                    "요일",
-                    "잡곡밥",
-                    "국/수프",
-                    "메인",
-                    "사이드1",
-                    "사이드2",
-                    "저녁_잡곡밥",
-                    "저녁_국/수프",
-                    "저녁_메인",
-                    "저녁_사이드1",
-                ]
-
-                valid_days = ["월", "화", "수", "목", "금", "토", "일"]
-                merged_df = pd.DataFrame(columns=final_columns)
-
-                # 각 시트 처리
-                for sheet_name in ["점심", "저녁"]:
-                    if sheet_name in sheet_names:
-                        df = pd.read_excel(uploaded_file, sheet_name=sheet_name)
-
-                        # 컬럼명 정리
-                        if sheet_name == "저녁":
-                            df = df.rename(
-                                columns={
-                                    "잡곡밥": "저녁_잡곡밥",
-                                    "국/수프": "저녁_국/수프",
-                                    "메인": "저녁_메인",
-                                    "사이드1": "저녁_사이드1",
-                                }
-                            )
-
-                        # 요일 필터링
-                        df = df[df["요일"].isin(valid_days)]
-
-                        # 데이터 병합
-                        for _, row in df.iterrows():
-                            day = row["요일"]
-                            if day not in merged_df["요일"].values:
-                                merged_df = pd.concat(
-                                    [merged_df, pd.DataFrame([row])], ignore_index=True
-                                )
-                            else:
-                                idx = merged_df[merged_df["요일"] == day].index[0]
-                                for col in df.columns:
-                                    if pd.isna(merged_df.at[idx, col]):
-                                        merged_df.at[idx, col] = row[col]
-
-                # NaN 값 처리 및 컬럼 정렬
-                merged_df = merged_df.fillna("")
-                merged_df = merged_df[final_columns]
-
-                if not merged_df.empty:
-                    st.dataframe(merged_df)
-
-                    if st.button("영양 정보 분석"):
-                        nutrition_df = analyze_menu_plan(merged_df)
-                        st.success("영양 정보 분석이 완료되었습니다.")
-                        st.dataframe(nutrition_df)
-
-                        # Excel 파일로 내보내기
-                        filepath = export_plan(merged_df, "식단_계획")
-                        with open(filepath, "rb") as f:
-                            st.download_button(
-                                label="Excel 파일 다운로드",
-                                data=f,
-                                file_name=os.path.basename(filepath),
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                            )
-                else:
-                    st.error("유효한 데이터가 없습니다.")
-
-        except Exception as e:
-            st.error(f"파일 처리 중 오류 발생: {str(e)}")
+    sys.exit(main())
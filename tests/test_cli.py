@@ -0,0 +1,69 @@
+"""
+python -m meal_ai 명령줄 테스트 (README에 적힌 실행 예시)
+"""
+
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import meal_ai  # noqa: E402
+
+
+def run_cli(*args: str, cwd: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.run(
+        [sys.executable, "-m", "meal_ai", *args],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+
+
+@pytest.fixture
+def workdir(tmp_path):
+    """
+    메뉴 DB(meal.db)와 메뉴판(메뉴판.xlsx)이 있는 작업 디렉터리
+    """
+    meal_ai.set_db_path(str(tmp_path / "meal.db"))
+    meal_ai.init_db()
+    nutrition = {"calories": 300, "protein": 10, "fat": 5, "carbs": 40, "sodium": 500}
+    for category in meal_ai.MENU_CATEGORIES:
+        for i in range(8):
+            meal_ai.add_menu(dict(nutrition, name=f"{category} {i}", category=category))
+    meal_ai.add_menu(dict(nutrition, name=meal_ai.PLAN_RICE, category="밥"))
+    plan_df, _ = meal_ai.plan_menus(days=5, time_budget=0, seed=1)
+    with open(tmp_path / "메뉴판.xlsx", "wb") as f:
+        f.write(meal_ai.export_plan(plan_df, to_disk=False))
+    meal_ai.close_db_connection()
+    return tmp_path
+
+
+def test_readme_analyze_invocation(workdir):
+    result = run_cli(
+        "--format", "csv", "analyze", "메뉴판.xlsx", "-o", "nutrition.csv", cwd=workdir
+    )
+    assert result.returncode == 0, result.stderr
+    nutrition = pd.read_csv(workdir / "nutrition.csv")
+    assert list(nutrition["요일"].unique()) == ["월", "화", "수", "목", "금"]
+    assert nutrition["칼로리"].notna().all()
+
+
+def test_common_options_before_and_after_command(workdir):
+    result = run_cli(
+        "analyze", "메뉴판.xlsx", "--format", "csv", "--db", "meal.db", cwd=workdir
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines()[0].startswith("요일")
+
+    # 명령 앞에 준 옵션이 하위 명령의 기본값으로 덮어써지지 않아야 함
+    args = meal_ai.build_arg_parser().parse_args(
+        ["--format", "csv", "-o", "out.csv", "dedupe"]
+    )
+    assert (args.format, args.output) == ("csv", "out.csv")